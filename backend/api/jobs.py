@@ -0,0 +1,145 @@
+import os
+import time
+import uuid
+import asyncio
+
+from ingest import metrics
+
+# Concurrent jobs (default: keep every extraction worker busy)
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", os.cpu_count() or 1))
+# Jobs waiting to start; submissions beyond this get 429
+JOB_QUEUE_SIZE = int(os.environ.get("JOB_QUEUE_SIZE", "64"))
+# ...and the uploads they hold in memory, in total (default 512 MB)
+JOB_QUEUE_MB = int(os.environ.get("JOB_QUEUE_MB", "512"))
+# How long finished jobs (and their results) are kept
+JOB_TTL_SECONDS = float(os.environ.get("JOB_TTL_SECONDS", "3600"))
+
+
+class QueueFull(Exception):
+    pass
+
+
+def _payload_size(args, kwargs):
+    return sum(
+        len(v) for v in (*args, *kwargs.values())
+        if isinstance(v, (bytes, bytearray, memoryview))
+    )
+
+
+class JobManager:
+    """
+    Bounded background job queue for long-running analyses.
+
+    submit() returns a job id immediately; a fixed number of asyncio
+    workers pull jobs off the queue and await the handler (which itself
+    dispatches the heavy work to the extraction process pool).
+
+    The queue is bounded both in jobs and in the bytes their arguments
+    hold (the raw uploads), so a backlog of large files can't pile up
+    gigabytes before the count limit is reached.
+    """
+
+    def __init__(self, handler, workers=JOB_WORKERS, max_queue=JOB_QUEUE_SIZE, ttl=JOB_TTL_SECONDS,
+                 max_queue_bytes=JOB_QUEUE_MB * 1024 * 1024):
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_queue = max(1, max_queue)
+        self.max_queue_bytes = max_queue_bytes
+        self.queued_bytes = 0
+        self.ttl = ttl
+        self._jobs = {}
+        self._queue = None
+        self._tasks = []
+
+    def start(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        return self
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    def _expire(self):
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job["finished_at"] is not None and now - job["finished_at"] > self.ttl
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def submit(self, *args, **kwargs):
+        """
+        Queue a job; raises QueueFull when the backlog is at capacity.
+        """
+        if self._queue is None:
+            self.start()
+        self._expire()
+
+        size = _payload_size(args, kwargs)
+        # one job is always accepted, even if it is bigger than the bound
+        if self.queued_bytes and self.queued_bytes + size > self.max_queue_bytes:
+            metrics.inc("jobs_total", status="rejected")
+            raise QueueFull(f"Job queue is full ({self.queued_bytes // (1024 * 1024)} MB of uploads waiting)")
+
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+        }
+
+        try:
+            self._queue.put_nowait((job_id, size, args, kwargs))
+        except asyncio.QueueFull:
+            metrics.inc("jobs_total", status="rejected")
+            raise QueueFull(f"Job queue is full ({self.max_queue} waiting)")
+        self.queued_bytes += size
+
+        self._jobs[job_id] = job
+        metrics.inc("jobs_total", status="queued")
+        return job_id
+
+    def get(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+
+        view = {k: v for k, v in job.items() if k != "result"}
+        if job["status"] == "queued":
+            view["queue_depth"] = self._queue.qsize() if self._queue else 0
+        if job["status"] == "done":
+            view["result"] = job["result"]
+        return view
+
+    async def _worker(self):
+        while True:
+            job_id, size, args, kwargs = await self._queue.get()
+            self.queued_bytes -= size
+            job = self._jobs.get(job_id)
+            try:
+                if job is None:
+                    continue
+                job.update(status="running", started_at=time.time())
+                job["result"] = await self.handler(*args, **kwargs)
+                job["status"] = "done"
+                metrics.inc("jobs_total", status="done")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # HTTPException (e.g. an undecodable upload) carries its message in .detail
+                job.update(status="failed", error=getattr(e, "detail", None) or str(e) or type(e).__name__)
+                metrics.inc("jobs_total", status="failed")
+            finally:
+                if job is not None and job["finished_at"] is None and job["status"] in ("done", "failed"):
+                    job["finished_at"] = time.time()
+                self._queue.task_done()
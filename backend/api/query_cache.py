@@ -0,0 +1,123 @@
+import os
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from ingest import metrics
+
+# Bump when extraction or scoring changes in a way that makes old entries wrong
+CACHE_VERSION = 2
+
+# QUERY_CACHE_SIZE entries in memory; QUERY_CACHE_PATH (optional) persists them
+QUERY_CACHE_SIZE = int(os.environ.get("QUERY_CACHE_SIZE", "256"))
+QUERY_CACHE_PATH = os.environ.get("QUERY_CACHE_PATH") or None
+
+
+def make_key(y, sr, params):
+    """
+    Content hash of the decoded audio + the extraction parameters, so the
+    same clip re-encoded or re-uploaded under another name still hits.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"v{CACHE_VERSION}|{sr}|{params!r}|".encode())
+    h.update(y.tobytes())
+    return h.hexdigest()
+
+
+class QueryCache:
+    """
+    Bounded LRU of per-clip query features and ranked results.
+
+    Features depend only on the audio, so they stay valid forever.
+    Results are tagged with the feature store generation they were
+    ranked against and are ignored once the track DB has changed.
+    """
+
+    def __init__(self, max_entries=QUERY_CACHE_SIZE, persist_path=QUERY_CACHE_PATH):
+        self.max_entries = max(1, max_entries)
+        self.persist_path = Path(persist_path) if persist_path else None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _entry(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def get_features(self, key):
+        with self._lock:
+            entry = self._entry(key)
+            if entry is None:
+                self.misses += 1
+                metrics.inc("query_cache_total", result="miss")
+                return None
+            self.hits += 1
+            metrics.inc("query_cache_total", result="hit")
+            return entry["features"]
+
+    def put_features(self, key, features):
+        with self._lock:
+            self._entries[key] = {"features": features, "results": {}}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_results(self, key, name, generation):
+        with self._lock:
+            entry = self._entry(key)
+            if entry is None:
+                return None
+            cached = entry["results"].get(name)
+            if cached is None or cached[0] != generation:
+                return None
+            return cached[1]
+
+    def put_results(self, key, name, generation, results):
+        with self._lock:
+            entry = self._entry(key)
+            if entry is not None:
+                entry["results"][name] = (generation, results)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    # ======================================
+    # OPTIONAL DISK PERSISTENCE
+    # ======================================
+    def load(self):
+        if self.persist_path is None or not self.persist_path.exists():
+            return 0
+        try:
+            with open(self.persist_path, "rb") as f:
+                version, entries = pickle.load(f)
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable query cache {self.persist_path}: {e}")
+            return 0
+        if version != CACHE_VERSION:
+            return 0
+
+        with self._lock:
+            # results were ranked against a DB we can't vouch for anymore
+            for key, entry in list(entries.items())[-self.max_entries:]:
+                self._entries[key] = {"features": entry["features"], "results": {}}
+        return len(self._entries)
+
+    def save(self):
+        if self.persist_path is None:
+            return
+        self.persist_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.persist_path.with_suffix(".tmp")
+        with self._lock:
+            snapshot = OrderedDict(self._entries)
+        with open(tmp, "wb") as f:
+            pickle.dump((CACHE_VERSION, snapshot), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.persist_path)
@@ -0,0 +1,94 @@
+import os
+import asyncio
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+
+from ingest.preprocess import load_audio
+
+# Hard cap on accepted upload size (MAX_UPLOAD_MB env var, default 50 MB)
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_MB", "50")) * 1024 * 1024
+
+# Multipart framing around the file (boundaries, part headers, query
+# fields) allowed on top of MAX_UPLOAD_BYTES for the whole request body
+BODY_OVERHEAD = 64 * 1024
+
+# Read the (already spooled) upload in 1 MB chunks
+CHUNK_SIZE = 1024 * 1024
+
+
+def _too_large(max_bytes):
+    return HTTPException(
+        status_code=413,
+        detail=f"Upload too large (limit {max_bytes // (1024 * 1024)} MB)"
+    )
+
+
+class BodyLimitMiddleware:
+    """
+    ASGI middleware that stops oversized request bodies before Starlette
+    spools them: 413 straight from Content-Length, or, for bodies sent
+    without one, as soon as the bytes received pass the limit.
+    """
+
+    def __init__(self, app, max_bytes=MAX_UPLOAD_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        limit = self.max_bytes + BODY_OVERHEAD
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > limit:
+            exc = _too_large(self.max_bytes)
+            response = JSONResponse({"detail": exc.detail}, status_code=exc.status_code)
+            return await response(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # surfaces from the form parser as a normal 413
+                    raise _too_large(self.max_bytes)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+async def decode_upload(audio_bytes, **kwargs):
+    """
+    load_audio on an upload, off the event loop. Anything the decoders
+    can't read is the client's problem: 400, not 500.
+    """
+    try:
+        return await asyncio.to_thread(load_audio, audio_bytes, **kwargs)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Could not decode audio: {type(e).__name__}")
+
+
+async def read_upload(file: UploadFile, max_bytes=MAX_UPLOAD_BYTES):
+    """
+    Read an upload into memory in chunks, rejecting it with 413 as soon
+    as it passes max_bytes. Returns the encoded file as bytes.
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise _too_large(max_bytes)
+
+    buf = bytearray()
+    while True:
+        chunk = await file.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        if len(buf) + len(chunk) > max_bytes:
+            raise _too_large(max_bytes)
+        buf.extend(chunk)
+
+    if not buf:
+        raise HTTPException(status_code=400, detail="Empty upload")
+
+    return bytes(buf)
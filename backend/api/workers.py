@@ -0,0 +1,134 @@
+import os
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from ingest.preprocess import preprocess_audio
+from ingest.extract_features import extract_feature_set
+from ingest.models import warm_up, model_status
+from ingest.summary import feature_summary, summary_vector
+from ingest import metrics
+
+# Number of extraction processes (defaults to one per core)
+ANALYZE_WORKERS = int(os.environ.get("ANALYZE_WORKERS", os.cpu_count() or 1))
+
+# Models to load in every worker before it takes its first job
+# (names from ingest.models: "crepe", "openl3", "yamnet", "embeddings", "all")
+ANALYZE_PRELOAD = tuple(
+    name.strip() for name in os.environ.get("ANALYZE_PRELOAD", "crepe").split(",") if name.strip()
+)
+
+# What each endpoint actually scores on (see ingest.extract_features.FEATURE_PROFILES)
+ANALYZE_FEATURES = "fast"
+EMBED_FEATURES = ("embedding",)
+HYBRID_FEATURES = ("mfcc", "chroma", "embedding")
+
+
+# ======================================
+# WORKER SIDE (runs in the child processes)
+# ======================================
+def _init_worker(preload):
+    # stage timings recorded here are shipped back with each result
+    metrics.enable_export()
+    warm_up(preload)
+
+
+def _call_with_metrics(fn, *args):
+    result = fn(*args)
+    return result, metrics.drain()
+
+
+def worker_model_status():
+    return model_status()
+
+
+def analyze_waveform(y, sr):
+    """
+    Tempo + median pitch for /analyze, from audio the server has already
+    decoded. Returns plain floats so the result pickles cheaply back to
+    the server process.
+    """
+    f = extract_feature_set(y, sr, ANALYZE_FEATURES)
+    return float(f["tempo"]), float(f["pitch_median"])
+
+
+def embed_file(source):
+    """
+    Fused (OpenL3 + YAMNet) embedding of the ingest-style preprocessed clip.
+    """
+    y, _, sr = preprocess_audio(source)
+    return extract_feature_set(y, sr, EMBED_FEATURES)["embedding"]
+
+
+
+def hybrid_file(source):
+    """
+    Embedding + MFCC / chroma summary vectors of the ingest-style
+    preprocessed clip, i.e. everything the hybrid score needs (the same
+    summaries ingest stores, see ingest.summary).
+    """
+    y, _, sr = preprocess_audio(source)
+    f = extract_feature_set(y, sr, HYBRID_FEATURES)
+    mfcc_mean, mfcc_std, chroma_mean, chroma_std = feature_summary(f["mfcc"], f["chroma"])
+    return {
+        "embedding": f["embedding"],
+        "mfcc": summary_vector(mfcc_mean, mfcc_std),
+        "chroma": summary_vector(chroma_mean, chroma_std)
+    }
+
+
+# ======================================
+# SERVER SIDE
+# ======================================
+class ExtractionPool:
+    """
+    Process pool that CPU-bound extraction is dispatched to, so the
+    uvicorn event loop never blocks on librosa / TensorFlow.
+
+    Uses the "spawn" start method: forking a process that already has
+    TensorFlow initialised is not safe.
+    """
+
+    def __init__(self, workers=ANALYZE_WORKERS, preload=ANALYZE_PRELOAD):
+        self.workers = max(1, workers)
+        self.preload = preload
+        self._executor = None
+
+    def start(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.preload,)
+            )
+        return self
+
+    async def warm_up(self):
+        """
+        Make sure every worker process is started (its initializer loads
+        the preload models) and return the model status they report.
+        """
+        statuses = await asyncio.gather(
+            *(self.run(worker_model_status) for _ in range(self.workers))
+        )
+        merged = {}
+        for status in statuses:
+            for name, s in status.items():
+                # a model counts as ready only if it is ready everywhere
+                if name not in merged or s["state"] != "ready":
+                    merged[name] = s
+        return merged
+
+    async def run(self, fn, *args):
+        if self._executor is None:
+            self.start()
+        loop = asyncio.get_running_loop()
+        result, events = await loop.run_in_executor(self._executor, _call_with_metrics, fn, *args)
+        metrics.merge(events)
+        return result
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -1,95 +1,127 @@
 # backend/app.py
 
 import uvicorn
-from fastapi import FastAPI, UploadFile, File
+import time
+from fastapi import FastAPI, UploadFile, File, Request, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 import numpy as np
-import librosa
-import sqlite3
-from pathlib import Path
-import tempfile
 import os
-from similarity.similarity import tempo_similarity, pitch_similarity, hybrid_basic_score
-from similarity.db_utils import load_audio_features
+import asyncio
+from contextlib import asynccontextmanager
+from ingest.db import DB_PATH, get_connection, close_pool
+from similarity.feature_store import FeatureStore
+from search.search_similar import EmbeddingIndex
+from similarity.hybrid import HybridStore, DEFAULT_WEIGHTS
+from api.workers import (
+    ExtractionPool, analyze_waveform, embed_file, hybrid_file,
+    ANALYZE_FEATURES, EMBED_FEATURES, HYBRID_FEATURES
+)
+from api.uploads import read_upload, decode_upload, BodyLimitMiddleware
+from api.query_cache import QueryCache, make_key
+from api.jobs import JobManager, QueueFull
 
 
 # Import your pipeline
-from ingest.preprocess import preprocess_audio
-from ingest.extract_features import extract_audio_features
-from ingest.extract_embeddings import extract_openl3_embedding
+from ingest import metrics
+from ingest.snapshot import load_snapshot, read_embeddings
+from ingest.blobs import unpack_array
 
 # ======================================
-# DB PATH
+# RESIDENT FEATURE STORE
 # ======================================
-DB_PATH = Path(__file__).resolve().parents[1] / "database" / "music.db"
-
+FEATURE_STORE = FeatureStore()
+TOP_K = 5
 
-# ======================================
-# FASTAPI APP
-# ======================================
-app = FastAPI()
+# Full hybrid library (embeddings + MFCC + chroma); loaded on first hybrid query
+HYBRID_STORE = HybridStore(DB_PATH)
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# FAISS index over fused_embeddings (flat / ivf / hnsw, or compressed fp16 / sq8 / pq), built by search.build_index
+EMBEDDING_INDEX = EmbeddingIndex(kind=os.environ.get("EMBEDDING_INDEX_KIND", "flat"))
 
-# ======================================
-# SIMILARITY FUNCTIONS
-# ======================================
-from numpy.linalg import norm
+# Worker processes for CPU-bound extraction (size: ANALYZE_WORKERS env var)
+EXTRACTION_POOL = ExtractionPool()
 
-def cosine_similarity(a, b):
-    return float(np.dot(a, b) / (norm(a) * norm(b)))
+# Repeated uploads (retries, re-submits, probes) skip extraction entirely
+QUERY_CACHE = QueryCache()
 
-def euclidean_similarity(a, b):
-    dist = np.linalg.norm(a - b)
-    return 1 / (1 + dist)
+# Model warm-up runs in the background at startup; /ready reports it.
+# With WARMUP_ON_START=0 models load on first use ("lazy")
+WARMUP_ON_START = os.environ.get("WARMUP_ON_START", "1") != "0"
+WARMUP = {"state": "pending" if WARMUP_ON_START else "lazy", "models": {}}
 
-def mfcc_similarity(q_mfcc, db_mfcc):
-    min_len = min(len(q_mfcc), len(db_mfcc)) 
-    return cosine_similarity(q_mfcc[:min_len], db_mfcc[:min_len])
 
-def chroma_similarity(q_chroma, db_chroma):  
-    min_len = min(len(q_chroma), len(db_chroma)) 
-    return cosine_similarity(q_chroma[:min_len], db_chroma[:min_len])
+async def warm_up_models():
+    WARMUP["state"] = "warming"
+    try:
+        WARMUP["models"] = await EXTRACTION_POOL.warm_up()
+        failed = [n for n, s in WARMUP["models"].items() if s["state"] == "failed"]
+        WARMUP["state"] = "failed" if failed else "ready"
+    except Exception as e:
+        WARMUP.update(state="failed", error=str(e))
+    print(f"🔥 Model warm-up: {WARMUP['state']}")
 
 
 # ======================================
-# HYBRID SCORE
+# FASTAPI APP
 # ======================================
-def hybrid_score(cos_emb, euc_emb, mfcc_sim, chroma_sim,
-                 w_cos=0.45, w_euc=0.25, w_mfcc=0.20, w_chroma=0.10):
-    return (
-        w_cos * cos_emb +
-        w_euc * euc_emb +
-        w_mfcc * mfcc_sim +
-        w_chroma * chroma_sim
-    )
-
+@asynccontextmanager
+async def lifespan(app):
+    EXTRACTION_POOL.start()
+    print(f"⚙️ Extraction pool: {EXTRACTION_POOL.workers} workers")
+
+    JOBS.start()
+
+    # Don't block startup on TensorFlow; models load lazily otherwise
+    warmup_task = asyncio.create_task(warm_up_models()) if WARMUP_ON_START else None
+
+    # Load the library once; later requests only reload on DB change
+    FEATURE_STORE.refresh(force=True)
+    print(f"📚 Feature store loaded: {len(FEATURE_STORE)} tracks")
+
+    if QUERY_CACHE.load():
+        print(f"🗃️ Query cache restored: {len(QUERY_CACHE)} clips")
+    if not EMBEDDING_INDEX.available:
+        print("ℹ️ No FAISS index found — embedding search disabled until search.build_index runs")
+    yield
+    if warmup_task is not None:
+        warmup_task.cancel()
+    await JOBS.stop()
+    QUERY_CACHE.save()
+    EXTRACTION_POOL.shutdown()
+    FEATURE_STORE.close()
+    HYBRID_STORE.close()
+    close_pool()
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Oversized uploads are refused before they are spooled (inside CORS,
+# so the 413 still carries CORS headers)
+app.add_middleware(BodyLimitMiddleware)
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
 
 # ======================================
 # LOAD DB
 # ======================================
 def load_db_embeddings():
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("SELECT track_id, embedding FROM embeddings")
-
-    ids, vecs = [], []
-    for track_id, blob in cur.fetchall():
-        ids.append(track_id)
-        vecs.append(np.frombuffer(blob, dtype=np.float32))
-
-    conn.close()
-    return ids, vecs
+    """
+    (track ids, (n, dim) matrix): the memory-mapped snapshot when one
+    has been exported (ingest.snapshot), else read from the DB.
+    """
+    snapshot = load_snapshot("embeddings")
+    if snapshot is not None:
+        return snapshot
+    return read_embeddings(get_connection(), "embeddings")
 
 
 def load_db_features():
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
+    cur = get_connection().cursor()
     cur.execute("SELECT track_id, tempo, mfcc, chroma FROM audio_features")
 
     rows = []
@@ -97,57 +129,203 @@ def load_db_features():
         rows.append((
             track_id,
             tempo,
-            np.frombuffer(mfcc_blob, dtype=np.float32),
-            np.frombuffer(chroma_blob, dtype=np.float32)
+            unpack_array(mfcc_blob, dtype=np.float32).ravel(),
+            unpack_array(chroma_blob, dtype=np.float32).ravel()
         ))
 
-    conn.close()
     return rows
 
 
 
 # ======================================
-# API ROUTE — UPLOAD AUDIO
+# METRICS
 # ======================================
-@app.post("/analyze")
-async def analyze_song(file: UploadFile = File(...)):
+def route_label(request):
+    # the route template (/jobs/{job_id}), never the raw URL: one series
+    # per endpoint instead of one per job id; known only after routing
+    route = request.scope.get("route")
+    return getattr(route, "path", "unmatched")
 
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
-    temp_file.write(await file.read())
-    temp_file.close()
 
-    # Load audio
-    y, sr = librosa.load(temp_file.name, sr=None, mono=True)
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    except Exception:
+        metrics.inc("request_failures_total", path=route_label(request))
+        raise
+    finally:
+        metrics.observe("request_seconds", time.perf_counter() - start, path=route_label(request))
 
-    # Extract features (reuse your function)
-    tempo, _, _, _, _, _, pitch_median = extract_audio_features(y, sr)
+    path = route_label(request)
+    metrics.inc("requests_total", path=path, status=response.status_code)
+    if response.status_code >= 500:
+        metrics.inc("request_failures_total", path=path)
+    return response
 
-    db_rows = load_audio_features()
-    results = []
 
-    for track_id, db_tempo, db_pitch in db_rows:
-        t_sim = tempo_similarity(tempo, db_tempo)
-        p_sim = pitch_similarity(pitch_median, db_pitch)
-        score = hybrid_basic_score(t_sim, p_sim)
+@app.get("/metrics")
+async def get_metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
 
-        results.append({
-            "track_id": track_id,
-            "tempo_similarity": round(t_sim * 100, 2),
-            "pitch_similarity": round(p_sim * 100, 2),
-            "overall_score": round(score * 100, 2)
-        })
 
-    results.sort(key=lambda x: x["overall_score"], reverse=True)
+# ======================================
+# API ROUTE — READINESS
+# ======================================
+@app.get("/ready")
+async def ready():
+    # Server can always answer (models load lazily); this reports warm-up,
+    # and without one there is nothing to wait for
+    body = {"ready": WARMUP["state"] in ("ready", "lazy"), **WARMUP}
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
 
-    return {
+# ======================================
+# ANALYSIS (shared by /analyze and /jobs)
+# ======================================
+SCORING_MODES = ("basic", "hybrid")
+
+
+async def run_analysis(audio_bytes, use_embeddings=False, scoring="basic", weights=None):
+    # Decode off the event loop; the decoded samples key the query cache
+    y, sr = await decode_upload(audio_bytes, sr=None, mono=True)
+    cache_key = make_key(y, sr, ANALYZE_FEATURES)
+
+    features = QUERY_CACHE.get_features(cache_key)
+    if features is None:
+        # Extract features in a worker process (keeps the event loop free)
+        tempo, pitch_median = await EXTRACTION_POOL.run(analyze_waveform, y, sr)
+        features = {"tempo": tempo, "pitch_median": pitch_median}
+        QUERY_CACHE.put_features(cache_key, features)
+    tempo, pitch_median = features["tempo"], features["pitch_median"]
+
+    # Vectorized scoring against the resident library (cached until the DB changes);
+    # a reload reads the DB, so keep it off the event loop
+    await asyncio.to_thread(FEATURE_STORE.refresh)
+    top_matches = QUERY_CACHE.get_results(cache_key, "top_matches", FEATURE_STORE.generation)
+    if top_matches is None:
+        top_matches = FEATURE_STORE.top_k(tempo, pitch_median, k=TOP_K)
+        QUERY_CACHE.put_results(cache_key, "top_matches", FEATURE_STORE.generation, top_matches)
+
+    response = {
         "query": {
             "tempo": round(float(tempo), 2),
             "pitch_median": round(float(pitch_median), 2)
         },
-        "top_matches": results[:5],
+        "top_matches": top_matches,
         "status": "success"
     }
 
+    # Hybrid query features include the fused embedding: extract them
+    # first so an embedding search in the same request reuses it
+    if scoring == "hybrid":
+        hybrid_key = make_key(y, sr, HYBRID_FEATURES)
+        q = QUERY_CACHE.get_features(hybrid_key)
+        if q is None:
+            q = await EXTRACTION_POOL.run(hybrid_file, audio_bytes)
+            QUERY_CACHE.put_features(hybrid_key, q)
+
+    # Optional ANN search over fused embeddings (same preprocessing as ingest);
+    # the first .available loads the index from disk
+    if use_embeddings and await asyncio.to_thread(lambda: EMBEDDING_INDEX.available):
+        if scoring == "hybrid":
+            query_emb = q["embedding"]
+        else:
+            emb_key = make_key(y, sr, EMBED_FEATURES)
+            cached = QUERY_CACHE.get_features(emb_key)
+            if cached is None:
+                cached = {"embedding": await EXTRACTION_POOL.run(embed_file, audio_bytes)}
+                QUERY_CACHE.put_features(emb_key, cached)
+            query_emb = cached["embedding"]
+
+        response["embedding_matches"] = [
+            {"track_id": track_id, "embedding_similarity": round(score * 100, 2)}
+            for track_id, score in await asyncio.to_thread(EMBEDDING_INDEX.search, query_emb, TOP_K)
+        ]
+
+    # Full hybrid score (similarity.hybrid.HybridStore), batched over the whole library
+    if scoring == "hybrid":
+        weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        result_name = f"hybrid:{sorted(weights.items())}"
+
+        # matrix ops release the GIL; keep them off the event loop
+        await asyncio.to_thread(HYBRID_STORE.refresh)
+        hybrid_matches = QUERY_CACHE.get_results(hybrid_key, result_name, HYBRID_STORE.generation)
+        if hybrid_matches is None:
+            hybrid_matches = await asyncio.to_thread(
+                HYBRID_STORE.top_k, q["embedding"], q["mfcc"], q["chroma"], TOP_K, weights
+            )
+            QUERY_CACHE.put_results(hybrid_key, result_name, HYBRID_STORE.generation, hybrid_matches)
+
+        response["hybrid_matches"] = hybrid_matches
+
+    return response
+
+
+# Background analyses: bounded queue feeding the extraction pool
+JOBS = JobManager(run_analysis, workers=int(os.environ.get("JOB_WORKERS", EXTRACTION_POOL.workers)))
+
+
+# ======================================
+# API ROUTE — UPLOAD AUDIO
+# ======================================
+@app.post("/analyze")
+async def analyze_song(
+    file: UploadFile = File(...),
+    use_embeddings: bool = False,
+    scoring: str = "basic",
+    w_cos: float = DEFAULT_WEIGHTS["cos"],
+    w_euc: float = DEFAULT_WEIGHTS["euc"],
+    w_mfcc: float = DEFAULT_WEIGHTS["mfcc"],
+    w_chroma: float = DEFAULT_WEIGHTS["chroma"]
+):
+    if scoring not in SCORING_MODES:
+        raise HTTPException(status_code=400, detail=f"scoring must be one of {SCORING_MODES}")
+
+    # Upload stays in memory (size-capped); nothing is written to disk
+    audio_bytes = await read_upload(file)
+
+    weights = {"cos": w_cos, "euc": w_euc, "mfcc": w_mfcc, "chroma": w_chroma}
+    return await run_analysis(audio_bytes, use_embeddings, scoring, weights)
+
+
+# ======================================
+# API ROUTES — ASYNC JOBS
+# Submit returns at once; poll GET /jobs/{job_id} for the result.
+# ======================================
+@app.post("/jobs", status_code=202)
+async def submit_job(
+    file: UploadFile = File(...),
+    use_embeddings: bool = False,
+    scoring: str = "basic",
+    w_cos: float = DEFAULT_WEIGHTS["cos"],
+    w_euc: float = DEFAULT_WEIGHTS["euc"],
+    w_mfcc: float = DEFAULT_WEIGHTS["mfcc"],
+    w_chroma: float = DEFAULT_WEIGHTS["chroma"]
+):
+    if scoring not in SCORING_MODES:
+        raise HTTPException(status_code=400, detail=f"scoring must be one of {SCORING_MODES}")
+
+    audio_bytes = await read_upload(file)
+    weights = {"cos": w_cos, "euc": w_euc, "mfcc": w_mfcc, "chroma": w_chroma}
+
+    try:
+        job_id = JOBS.submit(audio_bytes, use_embeddings, scoring, weights)
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+    return {"job_id": job_id, "status": "queued"}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job id")
+    return job
+
 
 # ======================================
 # RUN SERVER
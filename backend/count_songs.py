@@ -1,11 +1,7 @@
-import sqlite3
-from pathlib import Path
-
-# Path to your database
-DB_PATH = Path(__file__).resolve().parent.parent / "database" / "music.db"
+from ingest.db import DB_PATH, connect
 
 def count_tracks():
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH)
     cur = conn.cursor()
 
     # Count total tracks
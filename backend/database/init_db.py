@@ -1,8 +1,13 @@
-import sqlite3
+import sys
 from pathlib import Path
 
-DB_PATH = Path(__file__).resolve().parents[2] / "database" / "music.db"
-DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+if not __package__:
+    # run as a script: make backend/ importable
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from ingest.db import DB_PATH, connect
+from ingest.manifest import ensure_schema
+
 
 schema = """
 PRAGMA foreign_keys = ON;
@@ -12,7 +17,8 @@ CREATE TABLE IF NOT EXISTS tracks (
     title TEXT NOT NULL,
     file_path TEXT NOT NULL,
     duration REAL,
-    dataset TEXT NOT NULL
+    dataset TEXT NOT NULL,
+    content_hash TEXT          -- blake2b of the audio file bytes (dedup)
 );
 
 CREATE TABLE IF NOT EXISTS audio_features (
@@ -25,6 +31,11 @@ CREATE TABLE IF NOT EXISTS audio_features (
     pitch_freqs BLOB,     -- frequencies (float32 array), 0.0 where no pitch
     pitch_conf BLOB,      -- confidences (float32 array)
     pitch_median REAL,
+    -- per-coefficient summaries over frames (float32 blobs, see ingest.summary)
+    mfcc_mean BLOB,
+    mfcc_std BLOB,
+    chroma_mean BLOB,
+    chroma_std BLOB,
     FOREIGN KEY(track_id) REFERENCES tracks(id) ON DELETE CASCADE
 );
 
@@ -58,12 +69,25 @@ CREATE TABLE IF NOT EXISTS fused_embeddings (
     FOREIGN KEY(track_id) REFERENCES tracks(id) ON DELETE CASCADE
 );
 
+-- one row per file ingest has seen; lets interrupted runs resume
+CREATE TABLE IF NOT EXISTS ingest_manifest (
+    file_path TEXT PRIMARY KEY,
+    dataset TEXT NOT NULL,
+    content_hash TEXT,
+    status TEXT NOT NULL,      -- pending | done | failed | duplicate
+    track_id INTEGER,          -- the stored track (or the one it duplicates)
+    error TEXT,
+    run_id TEXT,
+    updated_at REAL
+);
+
 """
 
 def initialize_db():
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH)
     cursor = conn.cursor()
     cursor.executescript(schema)
+    ensure_schema(conn)
     conn.commit()
     conn.close()
     print("🎉 Database initialized at:", DB_PATH)
@@ -0,0 +1,184 @@
+import os
+import zlib
+import struct
+import argparse
+import numpy as np
+
+from .db import DB_PATH, connect
+
+# ------------------------------------------------------
+# Self-describing array blobs
+# Every array column (MFCC, chroma, pitch) is stored as a small header
+# followed by the raw C-order data:
+#
+#   magic    4s   b"\x93ARR"
+#   version  u8   1
+#   dtype    u8   code from DTYPES
+#   flags    u8   FLAG_ZLIB: data is zlib-compressed
+#   ndim     u8
+#   shape    ndim x u32
+#   padding  to a multiple of 8 bytes, so the data is aligned
+#
+# unpack_array() returns a read-only view straight onto the blob (no
+# copy unless it is compressed), already in its stored shape. Blobs
+# written before this format are bare float32 with no shape; readers
+# pass legacy_rows (MFCC_ROWS / CHROMA_ROWS) to get them back 2-D.
+# ------------------------------------------------------
+MAGIC = b"\x93ARR"
+VERSION = 1
+FLAG_ZLIB = 1
+
+_HEAD = struct.Struct("<4sBBBB")
+
+DTYPES = {
+    1: np.dtype("<f4"),
+    2: np.dtype("<f2"),
+    3: np.dtype("i1"),
+    4: np.dtype("<f8"),
+    5: np.dtype("<i4"),
+    6: np.dtype("<i8"),
+}
+_CODES = {dtype: code for code, dtype in DTYPES.items()}
+
+# Shapes the extractors produce, for legacy (headerless) blobs
+MFCC_ROWS = 20
+CHROMA_ROWS = 12
+
+# Storage for MFCC / chroma: float16 halves them (pitch always stays
+# float32, times need the precision), zlib trades CPU for a bit more
+FEATURE_BLOB_DTYPE = os.environ.get("FEATURE_BLOB_DTYPE", "float32")
+FEATURE_BLOB_COMPRESS = os.environ.get("FEATURE_BLOB_COMPRESS", "0") == "1"
+
+# Feature rows rewritten per transaction by upgrade_feature_blobs (each
+# carries the full MFCC / chroma / pitch arrays, a few hundred KB)
+UPGRADE_BATCH = 256
+
+
+def _header_size(ndim):
+    return -(-(_HEAD.size + 4 * ndim) // 8) * 8
+
+
+def pack_array(a, dtype=None, compress=False):
+    a = np.ascontiguousarray(a, dtype=dtype)
+    dt = a.dtype.newbyteorder("<") if a.dtype.byteorder == ">" else a.dtype
+    if dt not in _CODES:
+        raise ValueError(f"Unsupported blob dtype: {a.dtype}")
+
+    data = a.astype(dt, copy=False).tobytes()
+    flags = 0
+    if compress:
+        data = zlib.compress(data)
+        flags |= FLAG_ZLIB
+
+    head = _HEAD.pack(MAGIC, VERSION, _CODES[dt], flags, a.ndim) + struct.pack(f"<{a.ndim}I", *a.shape)
+    return head.ljust(_header_size(a.ndim), b"\0") + data
+
+
+def pack_feature(a):
+    """
+    pack_array() with the FEATURE_BLOB_* storage settings (MFCC, chroma).
+    """
+    return pack_array(a, dtype=FEATURE_BLOB_DTYPE, compress=FEATURE_BLOB_COMPRESS)
+
+
+def is_packed(blob):
+    return blob is not None and len(blob) >= _HEAD.size and bytes(blob[:4]) == MAGIC
+
+
+def read_header(blob):
+    """
+    (dtype, shape, flags, data offset) of a packed blob.
+    """
+    magic, version, code, flags, ndim = _HEAD.unpack_from(blob)
+    if magic != MAGIC:
+        raise ValueError("Not a packed array blob")
+    if version != VERSION:
+        raise ValueError(f"Unsupported array blob version {version}")
+    shape = struct.unpack_from(f"<{ndim}I", blob, _HEAD.size)
+    return DTYPES[code], shape, flags, _header_size(ndim)
+
+
+def unpack_array(blob, legacy_rows=None, dtype=None):
+    """
+    ndarray for a stored blob (None stays None). Packed blobs come back
+    in their own dtype and shape as a zero-copy view; legacy ones as
+    float32, reshaped to (legacy_rows, -1) when given. dtype casts the
+    result (no copy when it already matches).
+    """
+    if blob is None:
+        return None
+
+    if is_packed(blob):
+        dt, shape, flags, offset = read_header(blob)
+        if flags & FLAG_ZLIB:
+            a = np.frombuffer(zlib.decompress(memoryview(blob)[offset:]), dtype=dt)
+        else:
+            a = np.frombuffer(blob, dtype=dt, offset=offset)
+        a = a.reshape(shape)
+    else:
+        a = np.frombuffer(blob, dtype=np.float32)
+        if legacy_rows:
+            a = a.reshape(legacy_rows, -1)
+
+    return a if dtype is None else a.astype(dtype, copy=False)
+
+
+# ======================================
+# UPGRADE LEGACY BLOBS
+# ======================================
+def upgrade_feature_blobs(db_path=DB_PATH, batch=UPGRADE_BATCH):
+    """
+    Rewrite headerless audio_features arrays in the packed format (MFCC
+    and chroma with the FEATURE_BLOB_* settings). Safe to re-run.
+    """
+    def upgrade(blob, pack, legacy_rows=None):
+        if blob is None or is_packed(blob):
+            return blob
+        return pack(unpack_array(blob, legacy_rows))
+
+    conn = connect(db_path)
+    total = changed = 0
+    last = -1
+    while True:
+        # UPGRADE_BATCH rows at a time by track id, one transaction each,
+        # so memory stays flat however big the table is
+        rows = conn.execute("""
+            SELECT track_id, mfcc, chroma, pitch_times, pitch_freqs, pitch_conf FROM audio_features
+            WHERE track_id > ? ORDER BY track_id LIMIT ?
+        """, (last, batch)).fetchall()
+        if not rows:
+            break
+        last = rows[-1][0]
+
+        updates = []
+        for track_id, mfcc, chroma, times, freqs, conf in rows:
+            new = (
+                upgrade(mfcc, pack_feature, MFCC_ROWS),
+                upgrade(chroma, pack_feature, CHROMA_ROWS),
+                upgrade(times, pack_array),
+                upgrade(freqs, pack_array),
+                upgrade(conf, pack_array),
+            )
+            if new != (mfcc, chroma, times, freqs, conf):
+                updates.append(new + (track_id,))
+
+        conn.executemany("""
+            UPDATE audio_features
+            SET mfcc = ?, chroma = ?, pitch_times = ?, pitch_freqs = ?, pitch_conf = ?
+            WHERE track_id = ?
+        """, updates)
+        conn.commit()
+        total += len(rows)
+        changed += len(updates)
+
+    conn.close()
+    print(f"🎉 Upgraded {changed} of {total} feature rows to packed array blobs.")
+    return changed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rewrite legacy feature blobs in the self-describing format")
+    parser.add_argument("--db", default=DB_PATH)
+    args = parser.parse_args()
+
+    upgrade_feature_blobs(args.db)
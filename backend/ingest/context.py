@@ -0,0 +1,102 @@
+import numpy as np
+import librosa
+
+from .metrics import timer
+
+# ------------------------------------------------------
+# Per-track analysis context
+# Wraps one waveform and lazily caches what several extractors need,
+# so each transform runs at most once per track:
+#   y16       16 kHz float32 audio (CREPE, YAMNet)
+#   stft      complex STFT
+#   power     |STFT|^2
+#   mel       mel power spectrogram
+#   mel_db    mel in dB
+#   onset_env onset strength envelope as used by beat tracking
+# Parameters are librosa's defaults, so results match the direct
+# librosa.* calls on y.
+# ------------------------------------------------------
+MODEL_SR = 16000
+
+N_FFT = 2048
+HOP_LENGTH = 512
+N_MELS = 128
+
+
+class AnalysisContext:
+
+    def __init__(self, y, sr):
+        # mono float32, as every extractor expects
+        if y.ndim > 1:
+            y = np.mean(y, axis=1)
+        self.y = y.astype(np.float32, copy=False)
+        self.sr = sr
+        self._cache = {}
+
+    @classmethod
+    def wrap(cls, y, sr):
+        """
+        Accept either a waveform or an existing context.
+        """
+        return y if isinstance(y, cls) else cls(y, sr)
+
+    @classmethod
+    def wrap_many(cls, ys, sr):
+        """
+        wrap() for a batch; sr is one rate for all tracks or one per track.
+        """
+        srs = sr if isinstance(sr, (list, tuple)) else [sr] * len(ys)
+        return [cls.wrap(y, s) for y, s in zip(ys, srs)]
+
+    def clear(self, keep=()):
+        """
+        Drop cached representations (except those named in keep) to free
+        memory while the context waits for a later batched stage.
+        """
+        self._cache = {k: v for k, v in self._cache.items() if k in keep}
+
+    def _get(self, name, compute):
+        value = self._cache.get(name)
+        if value is None:
+            value = self._cache[name] = compute()
+        return value
+
+    @property
+    def y16(self):
+        def compute():
+            if self.sr == MODEL_SR:
+                return self.y
+            with timer("resample"):
+                return librosa.resample(self.y, orig_sr=self.sr, target_sr=MODEL_SR).astype(np.float32)
+        return self._get("y16", compute)
+
+    @property
+    def stft(self):
+        def compute():
+            with timer("stft"):
+                return librosa.stft(self.y, n_fft=N_FFT, hop_length=HOP_LENGTH, center=True, pad_mode="constant")
+        return self._get("stft", compute)
+
+    @property
+    def power(self):
+        return self._get("power", lambda: np.abs(self.stft) ** 2)
+
+    @property
+    def mel(self):
+        def compute():
+            with timer("mel"):
+                return librosa.feature.melspectrogram(S=self.power, sr=self.sr, n_mels=N_MELS)
+        return self._get("mel", compute)
+
+    @property
+    def mel_db(self):
+        return self._get("mel_db", lambda: librosa.power_to_db(self.mel))
+
+    @property
+    def onset_env(self):
+        def compute():
+            with timer("onset"):
+                return librosa.onset.onset_strength(
+                    S=self.mel_db, sr=self.sr, n_fft=N_FFT, hop_length=HOP_LENGTH, aggregate=np.median
+                )
+        return self._get("onset_env", compute)
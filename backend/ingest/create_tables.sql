@@ -6,9 +6,13 @@ CREATE TABLE IF NOT EXISTS tracks (
     title TEXT NOT NULL,
     file_path TEXT NOT NULL,
     duration REAL,
-    dataset TEXT NOT NULL
+    dataset TEXT NOT NULL,
+    content_hash TEXT
 );
 
+CREATE INDEX IF NOT EXISTS idx_tracks_content_hash ON tracks(content_hash);
+CREATE INDEX IF NOT EXISTS idx_tracks_file_path ON tracks(file_path);
+
 CREATE TABLE IF NOT EXISTS audio_features (
     track_id INTEGER PRIMARY KEY,
     tempo REAL,
@@ -32,3 +36,16 @@ CREATE TABLE IF NOT EXISTS faiss_index_meta (
     dim INTEGER NOT NULL,
     total_vectors INTEGER DEFAULT 0
 );
+
+CREATE TABLE IF NOT EXISTS ingest_manifest (
+    file_path TEXT PRIMARY KEY,
+    dataset TEXT NOT NULL,
+    content_hash TEXT,
+    status TEXT NOT NULL,
+    track_id INTEGER,
+    error TEXT,
+    run_id TEXT,
+    updated_at REAL
+);
+
+CREATE INDEX IF NOT EXISTS idx_manifest_status ON ingest_manifest(dataset, status);
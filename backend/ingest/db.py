@@ -0,0 +1,83 @@
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+# ------------------------------------------------------
+# The one place that knows where the database lives and how to open it
+#
+# Every connection runs in WAL mode, so readers (the API) never wait
+# for a writer (ingest, backfills) and a writer never waits for them.
+# Reads go through a memory map and a larger page cache; with WAL,
+# synchronous=NORMAL only syncs at checkpoints, which is still safe
+# against corruption (a power cut can lose the last commits, no more).
+#
+# connect()         a new connection, caller closes it (scripts, writers)
+# get_connection()  a pooled connection for the calling thread, kept
+#                   open across calls so its page cache stays warm
+# ------------------------------------------------------
+DB_PATH = Path(os.environ.get("MUSIC_DB_PATH") or Path(__file__).resolve().parents[2] / "database" / "music.db")
+
+# Seconds a connection waits on a lock before "database is locked"
+BUSY_TIMEOUT = float(os.environ.get("SQLITE_BUSY_TIMEOUT", "30"))
+
+# Bytes of the file read through mmap instead of read() (0 disables)
+SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", str(1 << 30)))
+
+# Page cache per connection, in KiB
+SQLITE_CACHE_KB = int(os.environ.get("SQLITE_CACHE_KB", str(64 * 1024)))
+
+# OFF | NORMAL | FULL
+SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL").upper()
+
+_pool = {}   # (thread id, path) -> connection
+_pool_lock = threading.Lock()
+
+
+def configure(conn):
+    """
+    Apply the WAL + tuning pragmas to an open connection.
+    """
+    try:
+        # persistent in the file; a no-op once the database is in WAL
+        conn.execute("PRAGMA journal_mode=WAL")
+    except sqlite3.OperationalError:
+        # read-only file or directory: keep whatever mode it has
+        pass
+    conn.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size={-SQLITE_CACHE_KB}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+def connect(db_path=DB_PATH, **kwargs):
+    """
+    New tuned connection. Extra kwargs go to sqlite3.connect
+    (isolation_level, check_same_thread, ...).
+    """
+    Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+    kwargs.setdefault("timeout", BUSY_TIMEOUT)
+    return configure(sqlite3.connect(str(db_path), **kwargs))
+
+
+def get_connection(db_path=DB_PATH):
+    """
+    Pooled connection owned by the calling thread. Don't close it;
+    close_pool() does that at shutdown.
+    """
+    key = (threading.get_ident(), str(db_path))
+    with _pool_lock:
+        conn = _pool.get(key)
+        if conn is None:
+            # only ever used by this thread, but close_pool() runs elsewhere
+            conn = _pool[key] = connect(db_path, check_same_thread=False)
+    return conn
+
+
+def close_pool():
+    with _pool_lock:
+        conns = list(_pool.values())
+        _pool.clear()
+    for conn in conns:
+        conn.close()
@@ -0,0 +1,132 @@
+import os
+import argparse
+import numpy as np
+
+from .db import DB_PATH, connect
+
+# ------------------------------------------------------
+# Compact encodings for stored embeddings
+# Embedding rows carry their dim, so the blob size alone tells how a
+# vector was stored:
+#   float32  dim * 4 bytes (the original format)
+#   float16  dim * 2 bytes
+#   int8     4-byte float32 scale + dim bytes, v ≈ q * scale
+# (sizes only collide at dim = 4; stored embeddings are 512+ wide)
+#
+# EMBEDDING_ENCODING picks what new rows are written as; readers decode
+# any of them, so a DB can hold a mix while it is being converted.
+# ------------------------------------------------------
+EMBEDDING_ENCODINGS = ("float32", "float16", "int8")
+EMBEDDING_ENCODING = os.environ.get("EMBEDDING_ENCODING", "float32")
+
+# Rows re-encoded per transaction by recode_embeddings
+RECODE_BATCH = 4096
+
+_SCALE = np.dtype("<f4")
+
+
+def quantize_int8(x):
+    """
+    Symmetric per-row int8 quantization of a vector or (n, d) matrix.
+    Returns (codes, scales) with x ≈ codes * scales.
+    """
+    x = np.asarray(x, dtype=np.float32)
+    peak = np.abs(x).max(axis=-1, keepdims=True)
+    scales = np.where(peak > 0, peak / 127.0, 1.0).astype(np.float32)
+    codes = np.clip(np.rint(x / scales), -127, 127).astype(np.int8)
+    return codes, scales
+
+
+def encode_embedding(v, encoding=EMBEDDING_ENCODING):
+    v = np.asarray(v, dtype=np.float32).ravel()
+    if encoding == "float32":
+        return v.tobytes()
+    if encoding == "float16":
+        return v.astype(np.float16).tobytes()
+    if encoding == "int8":
+        codes, scale = quantize_int8(v)
+        return scale.astype(_SCALE).tobytes() + codes.tobytes()
+    raise ValueError(f"Unknown embedding encoding: {encoding} (expected one of {EMBEDDING_ENCODINGS})")
+
+
+def embedding_encoding(blob, dim):
+    size = len(blob)
+    if size == dim * 4:
+        return "float32"
+    if size == dim * 2:
+        return "float16"
+    if size == dim + _SCALE.itemsize:
+        return "int8"
+    raise ValueError(f"Embedding blob of {size} bytes doesn't match dim={dim}")
+
+
+def decode_embedding(blob, dim):
+    """
+    float32 vector for a stored embedding; a zero-copy view when the
+    row is already float32.
+    """
+    encoding = embedding_encoding(blob, dim)
+    if encoding == "float32":
+        return np.frombuffer(blob, dtype=np.float32)
+    if encoding == "float16":
+        return np.frombuffer(blob, dtype=np.float16).astype(np.float32)
+    scale = np.frombuffer(blob, dtype=_SCALE, count=1)[0]
+    codes = np.frombuffer(blob, dtype=np.int8, offset=_SCALE.itemsize)
+    return codes.astype(np.float32) * scale
+
+
+# ======================================
+# RE-ENCODE STORED EMBEDDINGS
+# ======================================
+def recode_embeddings(db_path=DB_PATH, encoding=EMBEDDING_ENCODING, table="fused_embeddings",
+                      batch=RECODE_BATCH):
+    """
+    Rewrite every row of `table` in `encoding`. Converting to float16 or
+    int8 is lossy; converting back only changes the storage size.
+    """
+    if encoding not in EMBEDDING_ENCODINGS:
+        raise ValueError(f"Unknown embedding encoding: {encoding} (expected one of {EMBEDDING_ENCODINGS})")
+
+    conn = connect(db_path)
+    total = changed = 0
+    last = -1
+    while True:
+        # RECODE_BATCH rows at a time by track id, one transaction each,
+        # so memory stays flat however big the table is
+        rows = conn.execute(f"""
+            SELECT track_id, embedding, dim FROM {table}
+            WHERE track_id > ? ORDER BY track_id LIMIT ?
+        """, (last, batch)).fetchall()
+        if not rows:
+            break
+        last = rows[-1][0]
+
+        updates = [
+            (encode_embedding(decode_embedding(blob, dim), encoding), track_id)
+            for track_id, blob, dim in rows
+            if embedding_encoding(blob, dim) != encoding
+        ]
+        conn.executemany(f"UPDATE {table} SET embedding = ? WHERE track_id = ?", updates)
+        conn.commit()
+        total += len(rows)
+        changed += len(updates)
+
+    size = conn.execute(f"SELECT COALESCE(SUM(LENGTH(embedding)), 0) FROM {table}").fetchone()[0]
+    conn.close()
+
+    print(f"🎉 Re-encoded {changed} of {total} rows in {table} as {encoding} "
+          f"({size / 2**20:.1f} MB of vectors).")
+    return changed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-encode stored embeddings")
+    parser.add_argument("encoding", choices=EMBEDDING_ENCODINGS)
+    parser.add_argument("--table", default="fused_embeddings",
+                        choices=("fused_embeddings", "embeddings", "yamnet_embeddings"))
+    args = parser.parse_args()
+
+    if recode_embeddings(encoding=args.encoding, table=args.table):
+        # the rewrites bump the table version, so snapshots rebuild
+        from .snapshot import refresh_snapshots
+        refresh_snapshots()
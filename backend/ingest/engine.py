@@ -0,0 +1,344 @@
+import os
+import time
+import uuid
+import multiprocessing
+from collections import deque
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from . import metrics
+from .models import warm_up
+from .preprocess import preprocess_audio, load_resampler
+from .context import AnalysisContext
+from .extract_features import extract_feature_set, resolve_features
+from .extract_embeddings import extract_fused_embeddings
+from .writer import TrackWriter
+from .manifest import FINISHED, ensure_schema, load_manifest, find_track, file_hash
+from .snapshot import refresh_snapshots
+from .db import DB_PATH, connect
+
+# ------------------------------------------------------
+# Shared ingest engine
+# Datasets only differ in how files are found and labeled (plug-ins
+# below). Each file then flows through three stages, all running at
+# once, each with its own parallelism and a bounded queue in front:
+#
+#   decode    INGEST_DECODE_THREADS threads (content hash, file I/O +
+#             resample release the GIL), at most INGEST_DECODE_QUEUE clips
+#             decoded ahead of the workers
+#   extract   INGEST_WORKERS processes, each with its own OpenL3 /
+#             YAMNet / CREPE models, taking INGEST_BATCH clips per task
+#             (embedded together) and INGEST_WORKER_QUEUE tasks each
+#   write     one TrackWriter thread (see writer.py), the only SQLite
+#             writer, batching many tracks per transaction
+#
+# New embeddings are appended to the matrix snapshot (snapshot.py) at
+# the end of the run.
+# A full queue stalls the stage before it, so memory stays bounded.
+# ------------------------------------------------------
+# Worker processes (defaults to one per core)
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", os.cpu_count() or 1))
+
+# Models every worker loads before its first file (names from ingest.models)
+INGEST_PRELOAD = tuple(
+    name.strip() for name in os.environ.get("INGEST_PRELOAD", "all").split(",") if name.strip()
+)
+
+# Files handed to a worker per task (embedded together)
+INGEST_BATCH = int(os.environ.get("INGEST_BATCH", "8"))
+
+# Tasks queued per worker (one running + the next one ready)
+INGEST_WORKER_QUEUE = int(os.environ.get("INGEST_WORKER_QUEUE", "2"))
+
+# Decode threads, and how many decoded clips (~11.5 MB each) may wait
+# for a worker (defaults to one full batch per worker)
+INGEST_DECODE_THREADS = int(os.environ.get("INGEST_DECODE_THREADS", "4"))
+INGEST_DECODE_QUEUE = int(os.environ.get("INGEST_DECODE_QUEUE", "0")) or None
+
+# Ingest stores everything: tempo, MFCC, chroma, CREPE pitch and fused embedding
+INGEST_FEATURES = "full"
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".flac", ".m4a")
+
+
+# ======================================
+# DATASET PLUG-INS
+# ======================================
+class DatasetPlugin:
+    """
+    discover(root) yields audio files; label(file) gives the title
+    stored in tracks. Subclasses override whichever differs.
+    """
+
+    name = None
+
+    def folders(self, root):
+        return (d for d in sorted(root.iterdir()) if d.is_dir())
+
+    def discover(self, root):
+        for folder in self.folders(root):
+            for file in sorted(folder.iterdir()):
+                if file.suffix.lower() in AUDIO_EXTENSIONS:
+                    yield file
+
+    def label(self, file):
+        return file.stem
+
+
+class FmaPlugin(DatasetPlugin):
+    # fma_small/<000..155>/<track>.mp3 (any depth)
+    name = "fma"
+
+    def folders(self, root):
+        return (d for d in sorted(root.rglob("*")) if d.is_dir())
+
+
+class GtzanPlugin(DatasetPlugin):
+    # genres/<genre>/<track>.wav
+    name = "gtzan"
+
+
+class Covers80Plugin(DatasetPlugin):
+    # covers32k/<song>/<artist+album+track>.mp3
+    name = "covers80"
+
+
+PLUGINS = {p.name: p for p in (FmaPlugin(), GtzanPlugin(), Covers80Plugin())}
+
+
+# ======================================
+# WORKER SIDE (runs in the child processes)
+# ======================================
+def _init_worker(preload):
+    metrics.enable_export()
+    warm_up(preload)
+
+
+def extract_clips(clips):
+    """
+    Extract every ingest feature for a few preprocessed clips
+    [(y, duration, sr)], embedding them in one batch. Returns (results,
+    metrics events); each result is (duration, feats) or an error
+    string, so one bad file never takes the worker (or the rest of its
+    batch) down.
+    """
+    per_track = resolve_features(INGEST_FEATURES) - {"embedding"}
+    results = []
+    ready = []   # (result index, context) waiting for embeddings
+
+    for y, duration, sr in clips:
+        try:
+            ctx = AnalysisContext(y, sr)
+            results.append((duration, extract_feature_set(ctx, sr, per_track)))
+            # only the waveforms are needed from here on
+            ctx.clear(keep=("y16",))
+            ready.append((len(results) - 1, ctx))
+        except Exception as e:
+            results.append(str(e) or type(e).__name__)
+
+    if "embedding" in resolve_features(INGEST_FEATURES) and ready:
+        try:
+            vectors = extract_fused_embeddings([ctx for _, ctx in ready], [ctx.sr for _, ctx in ready])
+            for (i, _), vector in zip(ready, vectors):
+                results[i][1]["embedding"] = vector
+        except Exception as e:
+            for i, _ in ready:
+                results[i] = str(e) or type(e).__name__
+
+    return results, metrics.drain()
+
+
+# ======================================
+# PARENT SIDE
+# ======================================
+def new_files(plugin, root_folder, conn, writer, run_id, retry_failed=False):
+    """
+    Yield files that may still need extracting. Finished manifest
+    entries and paths already stored are skipped without touching the
+    file; content hashes are checked later, in the decode threads
+    (hash_and_decode), so no file is read here.
+    """
+    manifest = load_manifest(conn, plugin.name)
+    skip = FINISHED if retry_failed else FINISHED + ("failed",)
+
+    for file in plugin.discover(root_folder):
+        path = str(file)
+        if manifest.get(path) in skip:
+            continue
+
+        # tracks ingested before the manifest existed
+        track_id = find_track(conn, file_path=path)
+        if track_id is not None:
+            writer.mark(path, plugin.name, "done", track_id=track_id, run_id=run_id)
+            continue
+
+        yield file
+
+
+def hash_and_decode(file, db_path=DB_PATH):
+    """
+    Decode-stage task: hash the file and, unless the same bytes are
+    already stored, preprocess it. Returns (content_hash, track_id of
+    the stored copy or None, clip or None). Runs in the decode threads,
+    so hashing overlaps with decoding instead of reading the whole
+    dataset up front.
+    """
+    content_hash = file_hash(file)
+    # its own short-lived connection: pooled ones would outlive the
+    # decode threads (opening one is cheap next to hashing the file)
+    conn = connect(db_path)
+    try:
+        track_id = find_track(conn, content_hash=content_hash)
+    finally:
+        conn.close()
+    if track_id is not None:
+        return content_hash, track_id, None
+    return content_hash, None, preprocess_audio(str(file))
+
+
+def run_ingest(dataset, root_folder, max_songs, workers=INGEST_WORKERS, db_path=DB_PATH,
+               preload=INGEST_PRELOAD, batch=INGEST_BATCH, retry_failed=False,
+               decode_threads=INGEST_DECODE_THREADS, decode_queue=INGEST_DECODE_QUEUE,
+               worker_queue=INGEST_WORKER_QUEUE):
+    """
+    Ingest up to max_songs new files of `dataset` ("fma", "gtzan",
+    "covers80" or a DatasetPlugin) through the decode → extract → write
+    pipeline described at the top of this module. Progress is kept in
+    ingest_manifest, so a rerun picks up where an interrupted one
+    stopped; files that failed are retried only with retry_failed=True.
+    """
+    plugin = PLUGINS[dataset] if isinstance(dataset, str) else dataset
+    root_folder = Path(root_folder)
+    workers = max(1, workers)
+    batch = max(1, batch)
+    max_tasks = workers * max(1, worker_queue)
+    decode_queue = max(1, decode_queue or workers * batch)
+
+    run_id = uuid.uuid4().hex[:12]
+    print(f"\n🎵 Starting {plugin.name} ingestion from: {root_folder} "
+          f"({decode_threads} decoders, {workers} workers, run {run_id})\n")
+
+    processed_count = 0
+    failed_count = 0
+    start = time.perf_counter()
+
+    # read-only lookups (manifest, hashes); the writer does all writes
+    conn = connect(db_path)
+    ensure_schema(conn)
+    writer = TrackWriter(db_path).start()
+    files = new_files(plugin, root_folder, conn, writer, run_id, retry_failed)
+
+    load_resampler()
+    decoder = ThreadPoolExecutor(max_workers=max(1, decode_threads), thread_name_prefix="ingest-decode")
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(preload,)
+    )
+    decoding = deque()   # (file, future) in discovery order
+    pending = {}         # extraction future -> [(file, content_hash)]
+    in_flight = 0        # files in the extract stage
+    exhausted = False
+    seen = {}            # content_hash -> file extracted earlier in this run
+
+    def fail(file, content_hash, error):
+        nonlocal failed_count
+        failed_count += 1
+        metrics.inc("ingest_failures_total", dataset=plugin.name)
+        writer.mark(str(file), plugin.name, "failed", content_hash=content_hash,
+                    error=error, run_id=run_id)
+        print(f"❌ ERROR processing {file} — {error}")
+
+    try:
+        while True:
+            # --- decode stage: keep it fed up to its queue limit,
+            # never past what max_songs still needs ---
+            while (not exhausted and len(decoding) < decode_queue
+                   and processed_count + in_flight + len(decoding) < max_songs):
+                file = next(files, None)
+                if file is None:
+                    exhausted = True
+                    break
+                writer.mark(str(file), plugin.name, "pending", run_id=run_id)
+                print(f"▶ Processing {file}")
+                decoding.append((file, decoder.submit(hash_and_decode, file, db_path)))
+
+            # --- extract stage: hand decoded clips to free worker slots ---
+            while len(pending) < max_tasks and decoding and decoding[0][1].done():
+                needed = max_songs - processed_count - in_flight
+                # spread small runs across workers instead of one big batch
+                size = max(1, min(batch, -(-needed // workers)))
+
+                chunk, clips = [], []
+                while decoding and decoding[0][1].done() and len(chunk) < size:
+                    file, future = decoding.popleft()
+                    try:
+                        content_hash, track_id, clip = future.result()
+                    except Exception as e:
+                        fail(file, None, str(e) or type(e).__name__)
+                        continue
+
+                    if track_id is not None:
+                        writer.mark(str(file), plugin.name, "duplicate", content_hash=content_hash,
+                                    track_id=track_id, run_id=run_id)
+                        print(f"⏭ Skipping duplicate of track {track_id}: {file}")
+                        continue
+                    if content_hash in seen:
+                        # pending in the manifest: the next run resolves it
+                        # against the DB, or extracts it if the first copy failed
+                        print(f"⏭ Skipping duplicate of {seen[content_hash]}: {file}")
+                        continue
+
+                    seen[content_hash] = file
+                    clips.append(clip)
+                    chunk.append((file, content_hash))
+
+                if chunk:
+                    pending[executor.submit(extract_clips, clips)] = chunk
+                    in_flight += len(chunk)
+
+            if not pending and not decoding:
+                break
+
+            # wake on a finished task, or on the next clip if a slot is free
+            waiting = list(pending)
+            if decoding and len(pending) < max_tasks:
+                waiting.append(decoding[0][1])
+            done, _ = wait(waiting, return_when=FIRST_COMPLETED)
+
+            # --- write stage: results go to the writer's bounded queue ---
+            for future in done:
+                chunk = pending.pop(future, None)
+                if chunk is None:
+                    continue   # a decode finished; picked up above
+                in_flight -= len(chunk)
+                results, events = future.result()
+                metrics.merge(events)
+
+                for (file, content_hash), result in zip(chunk, results):
+                    if isinstance(result, str):
+                        fail(file, content_hash, result)
+                        continue
+
+                    duration, feats = result
+                    writer.put(plugin.label(file), str(file), duration, plugin.name, feats,
+                               content_hash=content_hash, run_id=run_id)
+                    processed_count += 1
+    finally:
+        decoder.shutdown(wait=True, cancel_futures=True)
+        executor.shutdown(wait=True, cancel_futures=True)
+        saved, write_failures = writer.close()
+        conn.close()
+        metrics.write_textfile()
+
+    if saved:
+        refresh_snapshots(db_path)
+
+    elapsed = time.perf_counter() - start
+    rate = saved / elapsed if elapsed > 0 else 0.0
+    if processed_count >= max_songs:
+        print(f"🚫 Stopping – processed {max_songs} new songs.")
+    print(f"\n🎉 Finished {plugin.name} ingestion: {saved} saved, "
+          f"{failed_count + write_failures} failed in {elapsed:.1f}s ({rate:.2f} tracks/s).\n")
+    return saved
@@ -1,15 +1,28 @@
+import os
 import numpy as np
 import librosa
-import crepe
-import sqlite3
+from numpy.lib.stride_tricks import as_strided
+
+from .models import get_model, CREPE_CAPACITY
+from .metrics import timer, timed
+from .db import connect
+from .blobs import pack_array
 
 TARGET_SR = 16000
 MAX_SECONDS = 20
 CONF_THRESHOLD = 0.2
+STEP_SIZE = 5           # ms between pitch frames
+
+# CREPE's fixed input framing (see crepe.core.get_activation)
+FRAME_LENGTH = 1024
+
+# Frames per model.predict batch when many tracks are stacked together
+CREPE_BATCH_FRAMES = int(os.environ.get("CREPE_BATCH_FRAMES", "1024"))
 
 
 def preprocess_for_crepe(y, sr):
-    y = librosa.resample(y, orig_sr=sr, target_sr=TARGET_SR)
+    with timer("resample"):
+        y = librosa.resample(y, orig_sr=sr, target_sr=TARGET_SR)
 
     max_samples = TARGET_SR * MAX_SECONDS
     if len(y) > max_samples:
@@ -19,16 +32,20 @@ def preprocess_for_crepe(y, sr):
 
 
 def extract_crepe_pitch(y, sr):
+    import crepe
+
     y32 = y.astype(np.float32)
 
     try:
-        time, frequency, confidence, _ = crepe.predict(
-            audio=y32,
-            sr=sr,
-            model_capacity='small',
-            step_size=5,
-            viterbi=False
-        )
+        get_model("crepe")
+        with timer("crepe"):
+            time, frequency, confidence, _ = crepe.predict(
+                audio=y32,
+                sr=sr,
+                model_capacity=CREPE_CAPACITY,
+                step_size=STEP_SIZE,
+                viterbi=False
+            )
     except Exception:
         return (
             np.array([], dtype=np.float32),
@@ -54,8 +71,68 @@ def extract_crepe_pitch(y, sr):
     )
 
 
+def crepe_frames(y, step_size=STEP_SIZE):
+    """
+    Same frames crepe.predict(center=True) builds from 16 kHz audio:
+    1024-sample windows every step_size ms, zero-mean / unit-variance.
+    """
+    y = np.pad(y.astype(np.float32), FRAME_LENGTH // 2, mode="constant")
+    hop = int(TARGET_SR * step_size / 1000)
+    n_frames = 1 + int((len(y) - FRAME_LENGTH) / hop)
+
+    frames = as_strided(
+        y, shape=(FRAME_LENGTH, n_frames), strides=(y.itemsize, hop * y.itemsize)
+    ).transpose().copy()
+
+    frames -= np.mean(frames, axis=1)[:, np.newaxis]
+    frames /= np.clip(np.std(frames, axis=1)[:, np.newaxis], 1e-8, None)
+    return frames
+
+
+def extract_crepe_pitch_batch(waves, step_size=STEP_SIZE, batch_frames=CREPE_BATCH_FRAMES):
+    """
+    extract_crepe_pitch for many 16 kHz waveforms at once: frames from all
+    tracks go through one model.predict, then each track's activations
+    are decoded and filtered exactly like the single-track path.
+    Returns one (times, freqs, conf, pitch_median) tuple per wave.
+    """
+    import crepe
+
+    frames = [crepe_frames(y, step_size) for y in waves]
+    counts = [len(f) for f in frames]
+
+    model = get_model("crepe")
+    with timer("crepe"):
+        activation = model.predict(np.concatenate(frames), batch_size=batch_frames, verbose=0)
+
+    out = []
+    start = 0
+    for n in counts:
+        act = activation[start:start + n]
+        start += n
+
+        confidence = act.max(axis=1)
+        cents = crepe.core.to_local_average_cents(act)
+        frequency = 10 * 2 ** (cents / 1200)
+        frequency[np.isnan(frequency)] = 0
+        time = np.arange(n) * step_size / 1000.0
+
+        mask = confidence >= CONF_THRESHOLD
+        time, frequency, confidence = time[mask], frequency[mask], confidence[mask]
+        pitch_median = float(np.median(frequency)) if frequency.size else 0.0
+
+        out.append((
+            time.astype(np.float32),
+            frequency.astype(np.float32),
+            confidence.astype(np.float32),
+            pitch_median
+        ))
+    return out
+
+
+@timed("db_write")
 def update_crepe_features(db_path, track_id, pitch_times, pitch_freqs, pitch_conf, pitch_median):
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path)
     cur = conn.cursor()
 
     cur.execute("""
@@ -63,9 +140,9 @@ def update_crepe_features(db_path, track_id, pitch_times, pitch_freqs, pitch_con
         SET pitch_times = ?, pitch_freqs = ?, pitch_conf = ?, pitch_median = ?
         WHERE track_id = ?
     """, (
-        pitch_times.tobytes(),
-        pitch_freqs.tobytes(),
-        pitch_conf.tobytes(),
+        pack_array(pitch_times, "float32"),
+        pack_array(pitch_freqs, "float32"),
+        pack_array(pitch_conf, "float32"),
         float(pitch_median),
         track_id
     ))
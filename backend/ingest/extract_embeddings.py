@@ -1,38 +1,46 @@
+import os
+import time
+import argparse
 import numpy as np
-import sqlite3
 import librosa
-import openl3
 from pathlib import Path
 
 # Import your existing YAMNet extractor
-from .extract_yamnet import extract_yamnet_embedding
-
-DB_PATH = str(Path(__file__).resolve().parents[2] / "database" / "music.db")
+from .extract_yamnet import extract_yamnet_embedding, extract_yamnet_embeddings
+from .models import get_model
+from .metrics import timer, timed
+from .context import AnalysisContext
+from .db import DB_PATH, connect
+from .embedding_codec import encode_embedding
 
 
 # -----------------------------------------------------
-# Load OpenL3 model ONCE — using your local model
+# OpenL3 model is loaded ONCE, on first use (see models.py)
 # -----------------------------------------------------
 MODEL_DIR = Path(__file__).resolve().parents[2] / "models" / "openl3"
 MODEL_PATH = str(MODEL_DIR / "openl3_music_mel256_512.h5")
 
-OPENL3_MODEL = openl3.models.load_audio_embedding_model(
-    input_repr="mel256",
-    content_type="music",
-    embedding_size=512
-)
+# Frames per OpenL3 model.predict call when embedding several tracks
+OPENL3_BATCH_SIZE = int(os.environ.get("OPENL3_BATCH_SIZE", "256"))
+
+# Tracks loaded + embedded together by the bulk re-embed job
+EMBED_BATCH_TRACKS = int(os.environ.get("EMBED_BATCH_TRACKS", "16"))
 
 
 # -----------------------------------------------------
 # OpenL3 embedding
 # -----------------------------------------------------
+@timed("openl3")
 def extract_openl3_embedding(y, sr):
-    y = y.astype(np.float32)
+    import openl3
+
+    ctx = AnalysisContext.wrap(y, sr)
+    y, sr = ctx.y, ctx.sr
 
     emb, ts = openl3.get_audio_embedding(
         y,
         sr,
-        model=OPENL3_MODEL,
+        model=get_model("openl3"),
         hop_size=0.1,
         center=True
     )
@@ -40,6 +48,32 @@ def extract_openl3_embedding(y, sr):
     return emb.mean(axis=0).astype(np.float32)   # (512,)
 
 
+@timed("openl3")
+def extract_openl3_embeddings(ys, sr, batch_size=OPENL3_BATCH_SIZE):
+    """
+    Batched extract_openl3_embedding: openl3 frames every track, runs all
+    frames through the model in batches of batch_size and hands back
+    per-track outputs, which are mean-pooled here.
+    """
+    import openl3
+
+    ctxs = AnalysisContext.wrap_many(ys, sr)
+    if not ctxs:
+        return []
+
+    embs, _ = openl3.get_audio_embedding(
+        [ctx.y for ctx in ctxs],
+        [ctx.sr for ctx in ctxs],
+        model=get_model("openl3"),
+        hop_size=0.1,
+        center=True,
+        batch_size=batch_size,
+        verbose=False
+    )
+
+    return [emb.mean(axis=0).astype(np.float32) for emb in embs]
+
+
 # -----------------------------------------------------
 # Fused embedding (OpenL3 + YAMNet)
 # -----------------------------------------------------
@@ -47,19 +81,36 @@ def extract_fused_embedding(y, sr):
     """
     Returns 1536-dimensional vector: [512 OpenL3 | 1024 YAMNet]
     """
-    emb_openl3 = extract_openl3_embedding(y, sr)
-    emb_yamnet = extract_yamnet_embedding(y, sr)
+    ctx = AnalysisContext.wrap(y, sr)
+    emb_openl3 = extract_openl3_embedding(ctx, sr)
+    emb_yamnet = extract_yamnet_embedding(ctx, sr)
 
     fused = np.concatenate([emb_openl3, emb_yamnet]).astype(np.float32)
     return fused
 
 
+def extract_fused_embeddings(ys, sr):
+    """
+    Batched extract_fused_embedding for a list of waveforms (or
+    AnalysisContexts). Returns one 1536-d vector per track, in order.
+    """
+    ctxs = AnalysisContext.wrap_many(ys, sr)
+    emb_openl3 = extract_openl3_embeddings(ctxs, sr)
+    emb_yamnet = extract_yamnet_embeddings(ctxs, sr)
+
+    return [
+        np.concatenate([o, y]).astype(np.float32)
+        for o, y in zip(emb_openl3, emb_yamnet)
+    ]
+
+
 # -----------------------------------------------------
 # Insert ONLY fused embeddings
 # -----------------------------------------------------
+@timed("db_write")
 def insert_fused_embedding(track_id, vector):
 
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH)
     cur = conn.cursor()
 
     cur.execute("""
@@ -67,7 +118,7 @@ def insert_fused_embedding(track_id, vector):
         VALUES (?, ?, ?)
     """, (
         track_id,
-        vector.tobytes(),
+        encode_embedding(vector),
         vector.shape[0]
     ))
 
@@ -88,3 +139,76 @@ def process_track(file_path: str, track_id: int):
     insert_fused_embedding(track_id, emb_fused)
 
     print(f"✔ Saved FUSED embedding for track {track_id}")
+
+
+# -----------------------------------------------------
+# Bulk re-embedding (batched across tracks)
+# -----------------------------------------------------
+def reembed_tracks(db_path=DB_PATH, missing_only=False, batch_tracks=EMBED_BATCH_TRACKS):
+    """
+    Recompute fused embeddings for every track (or only those without
+    one), EMBED_BATCH_TRACKS at a time. Audio is preprocessed exactly
+    like ingest (read from the waveform cache when enabled) so the
+    vectors stay comparable with the rest of the DB.
+    """
+    from .waveform_cache import get_preprocessed
+
+    conn = connect(db_path)
+    cur = conn.cursor()
+    query = "SELECT id, file_path FROM tracks"
+    if missing_only:
+        query += " WHERE id NOT IN (SELECT track_id FROM fused_embeddings)"
+    cur.execute(query + " ORDER BY id")
+    rows = cur.fetchall()
+
+    print(f"\n🎵 Tracks to embed: {len(rows)}")
+    done = 0
+    start = time.perf_counter()
+
+    for i in range(0, len(rows), batch_tracks):
+        ids, waves = [], []
+        for track_id, file_path in rows[i:i + batch_tracks]:
+            try:
+                y, _, sr = get_preprocessed(track_id, file_path)
+            except Exception as e:
+                print(f"❌ ERROR loading track {track_id}: {e}")
+                continue
+            ids.append(track_id)
+            waves.append(y)
+
+        if not waves:
+            continue
+
+        vectors = extract_fused_embeddings(waves, sr)
+
+        # one transaction per batch
+        with timer("db_write"):
+            cur.executemany("""
+                INSERT OR REPLACE INTO fused_embeddings (track_id, embedding, dim)
+                VALUES (?, ?, ?)
+            """, [
+                (track_id, encode_embedding(v), v.shape[0])
+                for track_id, v in zip(ids, vectors)
+            ])
+            conn.commit()
+
+        done += len(ids)
+        rate = done / (time.perf_counter() - start)
+        print(f"✔ Embedded {done}/{len(rows)} tracks ({rate:.2f} tracks/s)")
+
+    conn.close()
+    print("🎉 Finished re-embedding.")
+
+    if done:
+        # vectors changed in place, so appending isn't enough
+        from .snapshot import refresh_snapshots
+        refresh_snapshots(db_path, full=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute fused embeddings in batches")
+    parser.add_argument("--missing", action="store_true", help="only tracks without an embedding")
+    parser.add_argument("--batch", type=int, default=EMBED_BATCH_TRACKS, help="tracks per batch")
+    args = parser.parse_args()
+
+    reembed_tracks(missing_only=args.missing, batch_tracks=args.batch)
@@ -1,25 +1,61 @@
+import os
 import numpy as np
 import librosa
-import sqlite3
-from pathlib import Path
 
-# CREPE
-import crepe
+# CREPE (imported lazily — it pulls in TensorFlow)
+from .models import get_model, CREPE_CAPACITY
+from .metrics import timer, timed
+from .context import AnalysisContext, N_FFT, HOP_LENGTH
+from .db import connect
+from .blobs import pack_array, pack_feature
+from .summary import summary_blobs
 
 TARGET_SR = None  # keep librosa default behavior with sr=None to preserve original
 
-def extract_audio_features(y, sr):
-    # Tempo
-    tempo, _ = librosa.beat.beat_track(y=y, sr=sr)
-
-    # MFCC
-    mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=20)
-
-    # Chroma
-    chroma = librosa.feature.chroma_cqt(y=y, sr=sr)
+# Chroma front end: "cqt" (default, what the stored library uses) or
+# "stft" (reuses the shared STFT — much faster, slightly different values).
+# Keep one mode per database; chroma from the two isn't interchangeable.
+CHROMA_MODES = ("cqt", "stft")
+CHROMA_MODE = os.environ.get("CHROMA_MODE", "cqt")
+
+# ======================================
+# FEATURE PROFILES
+# Callers declare what they need; nothing else is computed.
+# ======================================
+ALL_FEATURES = ("tempo", "pitch", "mfcc", "chroma", "embedding")
+
+FEATURE_PROFILES = {
+    "fast": ("tempo", "pitch"),                                  # /analyze scorer
+    "standard": ("tempo", "pitch", "mfcc", "chroma"),            # + timbre / harmony
+    "full": ("tempo", "pitch", "mfcc", "chroma", "embedding"),   # + fused OpenL3/YAMNet
+}
+
+
+def resolve_features(features):
+    """
+    Accept a profile name ("fast" / "standard" / "full") or an explicit
+    iterable of feature names and return the set of features to compute.
+    """
+    if isinstance(features, str):
+        if features not in FEATURE_PROFILES:
+            raise ValueError(f"Unknown feature profile: {features} (expected one of {list(FEATURE_PROFILES)})")
+        return frozenset(FEATURE_PROFILES[features])
+
+    features = frozenset(features)
+    unknown = features - set(ALL_FEATURES)
+    if unknown:
+        raise ValueError(f"Unknown features: {sorted(unknown)} (expected some of {ALL_FEATURES})")
+    return features
+
+
+def extract_crepe_features(y, sr):
+    """
+    y may be a waveform or an AnalysisContext (reuses its 16 kHz audio).
+    """
+    import crepe
 
     # ===== FIXED CREPE =====
-    y_crepe = librosa.resample(y, orig_sr=sr, target_sr=16000)
+    y_crepe = AnalysisContext.wrap(y, sr).y16
     max_samples = 16000 * 20
     if len(y_crepe) > max_samples:
         y_crepe = y_crepe[:max_samples]
@@ -27,13 +63,15 @@ def extract_audio_features(y, sr):
     y_crepe = y_crepe.astype(np.float32)
 
     try:
-        time, frequency, confidence, _ = crepe.predict(
-            audio=y_crepe,
-            sr=16000,
-            model_capacity='small',
-            step_size=5,
-            viterbi=False
-        )
+        get_model("crepe")
+        with timer("crepe"):
+            time, frequency, confidence, _ = crepe.predict(
+                audio=y_crepe,
+                sr=16000,
+                model_capacity=CREPE_CAPACITY,
+                step_size=5,
+                viterbi=False
+            )
     except Exception:
         time = np.array([], dtype=np.float32)
         frequency = np.array([], dtype=np.float32)
@@ -48,9 +86,6 @@ def extract_audio_features(y, sr):
     pitch_median = float(np.median(frequency)) if frequency.size else 0.0
 
     return (
-        tempo,
-        mfcc.astype(np.float32),
-        chroma.astype(np.float32),
         time.astype(np.float32),
         frequency.astype(np.float32),
         confidence.astype(np.float32),
@@ -58,25 +93,102 @@ def extract_audio_features(y, sr):
     )
 
 
+def extract_feature_set(y, sr, features="full", chroma_mode=None):
+    """
+    Compute only the requested features.
+
+    features: profile name or iterable of names from ALL_FEATURES.
+    y may also be an AnalysisContext; either way every extractor shares
+    one, so the 16 kHz resample and spectrograms are computed once
+    (tempo and MFCC both come from the same mel power spectrogram).
+    chroma_mode: "cqt" or "stft" (defaults to CHROMA_MODE).
+    Returns a dict with the keys that were computed:
+        tempo, mfcc, chroma,
+        pitch_times, pitch_freqs, pitch_conf, pitch_median,
+        embedding (1536-d fused vector)
+    """
+    wanted = resolve_features(features)
+    chroma_mode = chroma_mode or CHROMA_MODE
+    if chroma_mode not in CHROMA_MODES:
+        raise ValueError(f"Unknown chroma mode: {chroma_mode} (expected one of {CHROMA_MODES})")
+
+    ctx = AnalysisContext.wrap(y, sr)
+    y, sr = ctx.y, ctx.sr
+    out = {}
+
+    if "tempo" in wanted:
+        onset_env = ctx.onset_env
+        with timer("beat_track"):
+            tempo, _ = librosa.beat.beat_track(onset_envelope=onset_env, sr=sr, hop_length=HOP_LENGTH)
+        out["tempo"] = tempo
+
+    if "mfcc" in wanted:
+        mel_db = ctx.mel_db
+        with timer("mfcc"):
+            out["mfcc"] = librosa.feature.mfcc(S=mel_db, sr=sr, n_mfcc=20).astype(np.float32)
+
+    if "chroma" in wanted:
+        if chroma_mode == "stft":
+            power = ctx.power
+            with timer("chroma_stft"):
+                out["chroma"] = librosa.feature.chroma_stft(
+                    S=power, sr=sr, n_fft=N_FFT, hop_length=HOP_LENGTH
+                ).astype(np.float32)
+        else:
+            with timer("chroma_cqt"):
+                out["chroma"] = librosa.feature.chroma_cqt(y=y, sr=sr, hop_length=HOP_LENGTH).astype(np.float32)
+
+    if "pitch" in wanted:
+        (out["pitch_times"], out["pitch_freqs"],
+         out["pitch_conf"], out["pitch_median"]) = extract_crepe_features(ctx, sr)
+
+    if "embedding" in wanted:
+        # imported here so callers without embeddings never load OpenL3/YAMNet
+        from .extract_embeddings import extract_fused_embedding
+        out["embedding"] = extract_fused_embedding(ctx, sr)
+
+    return out
+
+
+def extract_audio_features(y, sr):
+    """
+    The classic 7-tuple (everything except embeddings).
+    """
+    f = extract_feature_set(y, sr, "standard")
+
+    return (
+        f["tempo"],
+        f["mfcc"],
+        f["chroma"],
+        f["pitch_times"],
+        f["pitch_freqs"],
+        f["pitch_conf"],
+        f["pitch_median"]
+    )
+
+
 
+@timed("db_write")
 def insert_audio_features(db_path, track_id, tempo, mfcc, chroma,
                           pitch_times=None, pitch_freqs=None, pitch_conf=None, pitch_median=0.0):
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path)
     cur = conn.cursor() 
 
     cur.execute("""
         INSERT OR REPLACE INTO audio_features (
-            track_id, tempo, mfcc, chroma, pitch_times, pitch_freqs, pitch_conf, pitch_median
+            track_id, tempo, mfcc, chroma, pitch_times, pitch_freqs, pitch_conf, pitch_median,
+            mfcc_mean, mfcc_std, chroma_mean, chroma_std
         )
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
     """, (track_id,
           float(tempo),
-          mfcc.tobytes(),
-          chroma.tobytes(),
-          (pitch_times.tobytes() if pitch_times is not None else None),
-          (pitch_freqs.tobytes() if pitch_freqs is not None else None),
-          (pitch_conf.tobytes() if pitch_conf is not None else None),
-          float(pitch_median)
+          pack_feature(mfcc),
+          pack_feature(chroma),
+          (pack_array(pitch_times, "float32") if pitch_times is not None else None),
+          (pack_array(pitch_freqs, "float32") if pitch_freqs is not None else None),
+          (pack_array(pitch_conf, "float32") if pitch_conf is not None else None),
+          float(pitch_median),
+          *summary_blobs(mfcc, chroma)
           ))
 
     conn.commit()
@@ -1,47 +1,31 @@
-import tensorflow_hub as hub
+import os
 import numpy as np
 import librosa
-from pathlib import Path
 
-# ------------------------------------------------------
-# Resolve project ROOT dynamically
-# backend/ingest/extract_yamnet.py → parents[2] = project root
-# ------------------------------------------------------
-ROOT = Path(__file__).resolve().parents[2]
-
-# Path to local YAMNet model
-YAMNET_PATH = ROOT / "models" / "yamnet"
-
-print("🔍 Loading YAMNet model from:", YAMNET_PATH)
-
-# Load the TF Hub SavedModel
-YAMNET_MODEL = hub.load(str(YAMNET_PATH))
+# Local YAMNet SavedModel (ROOT/models/yamnet) is loaded lazily on first use
+from .models import get_model, YAMNET_PATH
+from .metrics import timer
+from .context import AnalysisContext
 
 
 def extract_yamnet_embedding(y, sr):
     """
     Extract a single YAMNet embedding (mean over frames).
     Input:
-        y  - waveform (numpy array)
+        y  - waveform (numpy array) or AnalysisContext
         sr - sample rate of y
     Output:
         1024-dim numpy vector
     """
 
-    # Convert to mono if stereo
-    if y.ndim > 1:
-        y = np.mean(y, axis=1)
-
-    # Ensure type float32
-    y = y.astype(np.float32)
-
-    # Resample to 16 kHz because YAMNet requires it
-    if sr != 16000:
-        y = librosa.resample(y, orig_sr=sr, target_sr=16000)
-        sr = 16000
+    # Mono float32 at 16 kHz because YAMNet requires it
+    # (shared with CREPE when called with a context)
+    y = AnalysisContext.wrap(y, sr).y16
 
     # Run YAMNet model (returns frame-level embeddings)
-    scores, embeddings, spectrogram = YAMNET_MODEL(y)
+    model = get_model("yamnet")
+    with timer("yamnet"):
+        scores, embeddings, spectrogram = model(y)
 
     # Convert EagerTensor → numpy
     embeddings = embeddings.numpy()
@@ -50,3 +34,78 @@ def extract_yamnet_embedding(y, sr):
     emb_vector = np.mean(embeddings, axis=0).astype(np.float32)
 
     return emb_vector
+
+
+# -----------------------------------------------------
+# Batched YAMNet (many tracks per model call)
+# -----------------------------------------------------
+# YAMNet frames 16 kHz audio into 0.96 s patches every 0.48 s, and first
+# pads the waveform to PATCH_SAMPLES + k * PATCH_HOP samples. A patch
+# only sees its own 15600 samples, so tracks laid end to end at
+# PATCH_HOP-aligned offsets produce exactly the patches they would alone.
+PATCH_HOP = 7680          # 0.48 s
+PATCH_SAMPLES = 15600     # 0.96 s patch + STFT window - STFT hop
+
+# Cap on one concatenated batch (samples @ 16 kHz, ~10 min by default)
+YAMNET_BATCH_SAMPLES = int(os.environ.get("YAMNET_BATCH_SAMPLES", str(16000 * 600)))
+
+
+def _padded_length(n):
+    """
+    Length YAMNet pads an n-sample waveform to.
+    """
+    extra = max(n, PATCH_SAMPLES) - PATCH_SAMPLES
+    return PATCH_SAMPLES + PATCH_HOP * int(np.ceil(extra / PATCH_HOP))
+
+
+def _yamnet_batch(model, waves):
+    """
+    One model call for several 16 kHz waveforms. Returns per-track
+    mean-pooled embeddings.
+    """
+    offsets, spans = [], []
+    offset = 0
+    for w in waves:
+        padded = _padded_length(len(w))
+        offsets.append(offset)
+        spans.append(1 + (padded - PATCH_SAMPLES) // PATCH_HOP)
+        # next track starts on a patch boundary past this one's padding
+        offset += PATCH_HOP * int(np.ceil(padded / PATCH_HOP))
+
+    joined = np.zeros(offset, dtype=np.float32)
+    for w, o in zip(waves, offsets):
+        joined[o:o + len(w)] = w
+
+    with timer("yamnet"):
+        _, embeddings, _ = model(joined)
+    embeddings = embeddings.numpy()
+
+    out = []
+    for o, n in zip(offsets, spans):
+        first = o // PATCH_HOP
+        out.append(np.mean(embeddings[first:first + n], axis=0).astype(np.float32))
+    return out
+
+
+def extract_yamnet_embeddings(ys, sr, max_samples=YAMNET_BATCH_SAMPLES):
+    """
+    Batched extract_yamnet_embedding: ys is a list of waveforms (or
+    AnalysisContexts), sr one rate or one per track. Tracks are packed
+    into model calls of up to max_samples and the 1024-d embeddings are
+    returned in input order.
+    """
+    waves = [ctx.y16 for ctx in AnalysisContext.wrap_many(ys, sr)]
+    model = get_model("yamnet")
+
+    out = []
+    batch, batch_len = [], 0
+    for w in waves:
+        size = PATCH_HOP * int(np.ceil(_padded_length(len(w)) / PATCH_HOP))
+        if batch and batch_len + size > max_samples:
+            out.extend(_yamnet_batch(model, batch))
+            batch, batch_len = [], 0
+        batch.append(w)
+        batch_len += size
+    if batch:
+        out.extend(_yamnet_batch(model, batch))
+    return out
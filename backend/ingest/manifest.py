@@ -0,0 +1,127 @@
+import os
+import time
+import hashlib
+import argparse
+
+from .db import DB_PATH, connect
+from .summary import ensure_summary_columns
+from .snapshot import ensure_version_tracking
+
+# ------------------------------------------------------
+# Content hashes + ingest manifest
+# tracks.content_hash (indexed) lets ingest recognise the same audio
+# under another path; ingest_manifest records every file a run has
+# seen (pending / done / failed / duplicate) so an interrupted run
+# resumes exactly where it stopped.
+# ------------------------------------------------------
+HASH_CHUNK = 1 << 20
+
+# Statuses a new run skips (failed files are retried only on request)
+FINISHED = ("done", "duplicate")
+
+
+def file_hash(path):
+    """
+    blake2b of the file bytes, streamed in 1 MB chunks.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def ensure_schema(conn):
+    """
+    Bring an existing database up to the current schema (safe to re-run).
+    The one migration: database/init_db.py runs it after creating the
+    tables, and ingest runs it against databases created before content
+    hashes, the manifest or the summary columns existed.
+    """
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(tracks)")}
+    if "content_hash" not in columns:
+        conn.execute("ALTER TABLE tracks ADD COLUMN content_hash TEXT")
+
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS ingest_manifest (
+            file_path TEXT PRIMARY KEY,
+            dataset TEXT NOT NULL,
+            content_hash TEXT,
+            status TEXT NOT NULL,
+            track_id INTEGER,
+            error TEXT,
+            run_id TEXT,
+            updated_at REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_tracks_content_hash ON tracks(content_hash);
+        CREATE INDEX IF NOT EXISTS idx_tracks_file_path ON tracks(file_path);
+        CREATE INDEX IF NOT EXISTS idx_manifest_status ON ingest_manifest(dataset, status);
+    """)
+    ensure_summary_columns(conn)
+    ensure_version_tracking(conn)
+    conn.commit()
+
+
+def load_manifest(conn, dataset):
+    """
+    {file_path: status} for one dataset.
+    """
+    cur = conn.execute("SELECT file_path, status FROM ingest_manifest WHERE dataset = ?", (dataset,))
+    return dict(cur.fetchall())
+
+
+def find_track(conn, content_hash=None, file_path=None):
+    """
+    track_id already stored for this content hash (or path), else None.
+    """
+    if content_hash is not None:
+        row = conn.execute("SELECT id FROM tracks WHERE content_hash = ? LIMIT 1", (content_hash,)).fetchone()
+    else:
+        row = conn.execute("SELECT id FROM tracks WHERE file_path = ? LIMIT 1", (file_path,)).fetchone()
+    return row[0] if row else None
+
+
+def mark(cur, file_path, dataset, status, content_hash=None, track_id=None, error=None, run_id=None):
+    cur.execute("""
+        INSERT INTO ingest_manifest
+            (file_path, dataset, content_hash, status, track_id, error, run_id, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(file_path) DO UPDATE SET
+            dataset = excluded.dataset,
+            content_hash = COALESCE(excluded.content_hash, content_hash),
+            status = excluded.status,
+            track_id = excluded.track_id,
+            error = excluded.error,
+            run_id = excluded.run_id,
+            updated_at = excluded.updated_at
+    """, (file_path, dataset, content_hash, status, track_id, error, run_id, time.time()))
+
+
+# ======================================
+# BACKFILL HASHES FOR OLDER TRACKS
+# ======================================
+def backfill_hashes(db_path=DB_PATH):
+    conn = connect(db_path)
+    ensure_schema(conn)
+    rows = conn.execute("SELECT id, file_path FROM tracks WHERE content_hash IS NULL").fetchall()
+    print(f"\n🔑 Tracks without a content hash: {len(rows)}")
+
+    updates = []
+    for track_id, file_path in rows:
+        if not os.path.exists(file_path):
+            print(f"❌ Track {track_id}: Missing file → {file_path}")
+            continue
+        updates.append((file_hash(file_path), track_id))
+
+    conn.executemany("UPDATE tracks SET content_hash = ? WHERE id = ?", updates)
+    conn.commit()
+    conn.close()
+    print(f"🎉 Hashed {len(updates)} tracks.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute content hashes for tracks that lack one")
+    parser.add_argument("--db", default=DB_PATH)
+    args = parser.parse_args()
+
+    backfill_hashes(args.db)
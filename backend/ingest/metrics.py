@@ -0,0 +1,178 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+# ------------------------------------------------------
+# Tiny in-process metrics registry (counters + histograms),
+# rendered in Prometheus text format. Shared by the API and
+# ingest scripts; worker processes ship their observations back
+# to the parent with drain() / merge().
+# ------------------------------------------------------
+PREFIX = "music_"
+
+# seconds — from a fast DB read up to a full CREPE/OpenL3 pass
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+HELP = {
+    "stage_seconds": "Time spent per processing stage",
+    "request_seconds": "End-to-end API request latency",
+    "model_load_seconds": "Time to load a model",
+    "requests_total": "API requests handled",
+    "request_failures_total": "API requests that failed",
+    "tracks_ingested_total": "Tracks written to the database by ingest",
+    "ingest_failures_total": "Files that failed during ingest",
+    "query_cache_total": "Query cache lookups",
+    "jobs_total": "Background analysis jobs by outcome",
+    "decode_fallbacks_total": "Windowed preprocessing that needed a full resample",
+    "waveform_cache_total": "Preprocessed-waveform cache lookups",
+}
+
+_lock = threading.Lock()
+_counters = {}      # (name, labels) -> value
+_histograms = {}    # (name, labels) -> [bucket counts..., sum, count]
+
+# Worker processes set this so their observations can be sent to the parent
+_export = False
+_outbox = []
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _apply(kind, name, labels, value):
+    key = (name, labels)
+    if kind == "c":
+        _counters[key] = _counters.get(key, 0.0) + value
+        return
+
+    h = _histograms.get(key)
+    if h is None:
+        h = _histograms[key] = [0] * len(DEFAULT_BUCKETS) + [0.0, 0]
+    for i, bound in enumerate(DEFAULT_BUCKETS):
+        if value <= bound:
+            h[i] += 1
+    h[-2] += value
+    h[-1] += 1
+
+
+def _record(kind, name, value, labels):
+    name, labels = _key(name, labels)
+    with _lock:
+        _apply(kind, name, labels, value)
+        if _export:
+            _outbox.append((kind, name, labels, value))
+
+
+def inc(name, value=1, **labels):
+    _record("c", name, float(value), labels)
+
+
+def observe(name, seconds, **labels):
+    _record("h", name, float(seconds), labels)
+
+
+@contextmanager
+def timer(stage, metric="stage_seconds", **labels):
+    """
+    with timer("crepe"): ...   → observes stage_seconds{stage="crepe"}
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(metric, time.perf_counter() - start, stage=stage, **labels)
+
+
+def timed(stage, metric="stage_seconds"):
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(stage, metric):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ======================================
+# CROSS-PROCESS
+# ======================================
+def enable_export():
+    """Call in a worker process: keep observations for drain()."""
+    global _export
+    _export = True
+
+
+def drain():
+    with _lock:
+        events = list(_outbox)
+        _outbox.clear()
+    return events
+
+
+def merge(events):
+    """Apply observations drained from another process."""
+    with _lock:
+        for kind, name, labels, value in events:
+            _apply(kind, name, labels, value)
+
+
+# ======================================
+# EXPORT
+# ======================================
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+def render_prometheus():
+    with _lock:
+        counters = dict(_counters)
+        histograms = {k: list(v) for k, v in _histograms.items()}
+
+    lines = []
+    for name in sorted({n for n, _ in counters}):
+        full = PREFIX + name
+        lines.append(f"# HELP {full} {HELP.get(name, name)}")
+        lines.append(f"# TYPE {full} counter")
+        for (n, labels), value in sorted(counters.items()):
+            if n == name:
+                lines.append(f"{full}{_fmt_labels(labels)} {value:g}")
+
+    for name in sorted({n for n, _ in histograms}):
+        full = PREFIX + name
+        lines.append(f"# HELP {full} {HELP.get(name, name)}")
+        lines.append(f"# TYPE {full} histogram")
+        for (n, labels), h in sorted(histograms.items()):
+            if n != name:
+                continue
+            for bound, count in zip(DEFAULT_BUCKETS, h):
+                lines.append(f"{full}_bucket{_fmt_labels(labels, [('le', f'{bound:g}')])} {count}")
+            lines.append(f"{full}_bucket{_fmt_labels(labels, [('le', '+Inf')])} {h[-1]}")
+            lines.append(f"{full}_sum{_fmt_labels(labels)} {h[-2]:.6f}")
+            lines.append(f"{full}_count{_fmt_labels(labels)} {h[-1]}")
+
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path=None):
+    """
+    Dump metrics for the node_exporter textfile collector (used by ingest
+    scripts). Defaults to $METRICS_TEXTFILE; does nothing if unset.
+    """
+    path = path or os.environ.get("METRICS_TEXTFILE")
+    if not path:
+        return None
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(render_prometheus())
+    os.replace(tmp, path)
+    return path
@@ -0,0 +1,108 @@
+import time
+import threading
+from pathlib import Path
+
+from .metrics import observe
+
+# ------------------------------------------------------
+# Lazy model registry
+# Nothing here imports TensorFlow until a model is first requested,
+# so importing ingest modules stays cheap.
+# ------------------------------------------------------
+ROOT = Path(__file__).resolve().parents[2]
+YAMNET_PATH = ROOT / "models" / "yamnet"
+
+CREPE_CAPACITY = "small"
+
+
+def _load_openl3():
+    import openl3
+    return openl3.models.load_audio_embedding_model(
+        input_repr="mel256",
+        content_type="music",
+        embedding_size=512
+    )
+
+
+def _load_yamnet():
+    import tensorflow_hub as hub
+    print("🔍 Loading YAMNet model from:", YAMNET_PATH)
+    return hub.load(str(YAMNET_PATH))
+
+
+def _load_crepe():
+    import crepe
+    # crepe caches the model per capacity, so crepe.predict() reuses this one
+    return crepe.core.build_and_load_model(CREPE_CAPACITY)
+
+
+_LOADERS = {
+    "openl3": _load_openl3,
+    "yamnet": _load_yamnet,
+    "crepe": _load_crepe,
+}
+
+# Convenience names for groups of models
+MODEL_GROUPS = {
+    "embeddings": ("openl3", "yamnet"),
+    "all": tuple(_LOADERS),
+}
+
+_models = {}
+_status = {name: {"state": "not_loaded", "load_seconds": None, "error": None} for name in _LOADERS}
+_locks = {name: threading.Lock() for name in _LOADERS}
+
+
+def expand_names(names):
+    out = []
+    for name in names:
+        for n in MODEL_GROUPS.get(name, (name,)):
+            if n not in _LOADERS:
+                raise ValueError(f"Unknown model: {n} (expected one of {list(_LOADERS)} or {list(MODEL_GROUPS)})")
+            if n not in out:
+                out.append(n)
+    return out
+
+
+def get_model(name):
+    """
+    Return the loaded model, loading it on first use (thread-safe).
+    """
+    model = _models.get(name)
+    if model is not None:
+        return model
+
+    with _locks[name]:
+        if name in _models:
+            return _models[name]
+
+        _status[name].update(state="loading", error=None)
+        start = time.perf_counter()
+        try:
+            model = _LOADERS[name]()
+        except Exception as e:
+            _status[name].update(state="failed", error=str(e))
+            raise
+
+        elapsed = time.perf_counter() - start
+        _models[name] = model
+        _status[name].update(state="ready", load_seconds=round(elapsed, 3))
+        observe("model_load_seconds", elapsed, model=name)
+        return model
+
+
+def model_status():
+    return {name: dict(s) for name, s in _status.items()}
+
+
+def warm_up(names=("all",)):
+    """
+    Load the given models (or groups) now. Failures are recorded in the
+    status instead of raised, so one broken model doesn't stop the rest.
+    """
+    for name in expand_names(names):
+        try:
+            get_model(name)
+        except Exception as e:
+            print(f"❌ Failed to load {name}: {e}")
+    return model_status()
@@ -1,32 +1,154 @@
 # preprocess.py
 
+import io
+import os
+import tempfile
 import librosa
 import numpy as np
 
+from . import metrics
+from .metrics import timer, timed
+
 TARGET_SR = 48000
 TARGET_DURATION = 60.0  # seconds
+TRIM_TOP_DB = 25
+# librosa.effects.trim framing (its defaults, at TARGET_SR)
+TRIM_FRAME = 2048
+TRIM_HOP = 512
+TARGET_DBFS = -20.0
+RES_TYPE = "kaiser_fast"
+
+# Resampling window: leading silence we're willing to skip, plus a
+# margin past the target so resampler edge effects fall outside it
+LEAD_ALLOWANCE = float(os.environ.get("PREPROCESS_LEAD_SECONDS", "10"))
+DECODE_MARGIN = 1.0
+# Slack on the loudness of the rest of the file, which is measured
+# before resampling (see _windowed)
+PEAK_MARGIN_DB = 3.0
 
-def preprocess_audio(in_path):
+
+@timed("decode")
+def load_audio(source, suffix="", **kwargs):
     """
-    Load audio, resample to 48kHz, convert to mono,
-    trim silence, force 60s length, normalize to -20 dBFS
+    librosa.load for either a path or the raw encoded bytes of a file
+    (e.g. an upload held in memory). Bytes are decoded from a BytesIO;
+    only formats soundfile can't read (mp3 on older libsndfile) fall back
+    to a short-lived temp file, which is always removed.
+    """
+    if not isinstance(source, (bytes, bytearray, memoryview)):
+        return librosa.load(str(source), **kwargs)
+
+    try:
+        return librosa.load(io.BytesIO(source), **kwargs)
+    except Exception:
+        # audioread needs a real path
+        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+        try:
+            tmp.write(source)
+            tmp.close()
+            return librosa.load(tmp.name, **kwargs)
+        finally:
+            tmp.close()
+            os.remove(tmp.name)
+
+
+def _trim(y, ref=np.max):
+    # Trim silence (relative to the loudest frame unless ref is given)
+    with timer("trim_normalize"):
+        return librosa.effects.trim(y, top_db=TRIM_TOP_DB, ref=ref)
+
+
+def _resample(y, sr):
+    # what librosa.load(sr=TARGET_SR, res_type=RES_TYPE) does after decoding
+    with timer("resample"):
+        return librosa.resample(y, orig_sr=sr, target_sr=TARGET_SR, res_type=RES_TYPE)
+
+
+def load_resampler():
+    """
+    Import RES_TYPE's resampler now. librosa loads it on first use,
+    which isn't safe from several decode threads at once.
+    """
+    librosa.resample(np.zeros(TRIM_FRAME, dtype=np.float32), orig_sr=TARGET_SR // 2,
+                     target_sr=TARGET_SR, res_type=RES_TYPE)
+
+
+def _fit(y_trim):
+    with timer("trim_normalize"):
+        # Force EXACT 60 seconds
+        target_samples = int(TARGET_SR * TARGET_DURATION)
+        if len(y_trim) > target_samples:
+            y_out = y_trim[:target_samples]
+        else:
+            y_out = np.pad(y_trim, (0, target_samples - len(y_trim)), mode="constant")
+
+        # Normalize to -20 dBFS
+        rms = np.sqrt(np.mean(y_out**2) + 1e-12)
+        y_out = y_out * (10**(TARGET_DBFS / 20) / rms)
+
+        return np.clip(y_out, -1.0, 1.0).astype(np.float32)
+
+
+def _windowed(y, sr):
+    """
+    Trimmed clip from resampling only the first LEAD_ALLOWANCE + 60s
+    (+ margin) of the native-rate audio y, or None when the window
+    can't stand in for the whole file.
+
+    Trimming is relative to the file's loudest frame. The window's own
+    frames (clear of the margin, where they match a full resample
+    sample for sample) bound that from below, and the rest of the file,
+    measured at its native rate plus PEAK_MARGIN_DB, from above. The
+    start found against either bound must agree; then it is the start
+    a full resample finds too.
     """
-    y, sr = librosa.load(str(in_path), sr=TARGET_SR, mono=True, res_type="kaiser_fast")
+    window = int((LEAD_ALLOWANCE + TARGET_DURATION + DECODE_MARGIN) * sr)
+    y_win = _resample(y[:window], sr)
+    body = int((LEAD_ALLOWANCE + TARGET_DURATION) * TARGET_SR)
+    rms = librosa.feature.rms(y=y_win, frame_length=TRIM_FRAME, hop_length=TRIM_HOP)[0]
+    peak = float(rms[:(body - TRIM_FRAME // 2) // TRIM_HOP + 1].max())
+    if peak <= 0:
+        return None
 
-    # Trim silence
-    y_trim, _ = librosa.effects.trim(y, top_db=25)
+    # rest of the file from one frame before the body ends, so frames
+    # straddling the boundary are covered
+    frame = max(1, round(TRIM_FRAME * sr / TARGET_SR))
+    hop = max(1, round(TRIM_HOP * sr / TARGET_SR))
+    rest = y[int((LEAD_ALLOWANCE + TARGET_DURATION) * sr) - frame:]
+    rest_peak = float(librosa.feature.rms(y=rest, frame_length=frame, hop_length=hop).max())
+    ceiling = max(peak, rest_peak * 10 ** (PEAK_MARGIN_DB / 20))
 
-    # Force EXACT 60 seconds
-    target_samples = int(TARGET_SR * TARGET_DURATION)
-    if len(y_trim) > target_samples:
-        y_out = y_trim[:target_samples]
-    else:
-        y_out = np.pad(y_trim, (0, target_samples - len(y_trim)), mode="constant")
+    # only the body: its frames are silent wherever the full file's are
+    y_body = y_win[:body]
+    y_trim, (start, end) = _trim(y_body, ref=ceiling)
+    if _trim(y_body, ref=peak)[1][0] != start:
+        return None
+    # 60s of audio right after the leading silence
+    if start > LEAD_ALLOWANCE * TARGET_SR or end - start < int(TARGET_SR * TARGET_DURATION):
+        return None
+    return y_trim
 
-    # Normalize to -20 dBFS
-    rms = np.sqrt(np.mean(y_out**2) + 1e-12)
-    y_out = y_out * (10**(-20 / 20) / rms)
 
-    y_out = np.clip(y_out, -1.0, 1.0).astype(np.float32)
+def preprocess_audio(in_path, full_decode=False):
+    """
+    Load audio, resample to 48kHz, convert to mono,
+    trim silence, force 60s length, normalize to -20 dBFS
+
+    in_path may also be the encoded file as bytes.
+
+    The file is decoded once at its native rate, and usually only the
+    first LEAD_ALLOWANCE + 60s (+ margin) are resampled (_windowed).
+    Everything is resampled when the leading silence runs past the
+    allowance, the window ends in silence, or a louder part later in
+    the file could move the trim start, so the result is always the
+    same as a full resample. full_decode=True always resamples everything.
+    """
+    y, sr = load_audio(in_path, sr=None, mono=True)
+
+    if not full_decode and len(y) > int((LEAD_ALLOWANCE + TARGET_DURATION + DECODE_MARGIN) * sr):
+        y_trim = _windowed(y, sr)
+        if y_trim is not None:
+            return _fit(y_trim), TARGET_DURATION, TARGET_SR
+        metrics.inc("decode_fallbacks_total")
 
-    return y_out, TARGET_DURATION, TARGET_SR
+    return _fit(_trim(_resample(y, sr))[0]), TARGET_DURATION, TARGET_SR
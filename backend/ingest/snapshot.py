@@ -0,0 +1,263 @@
+import os
+import json
+import time
+import sqlite3
+import argparse
+import numpy as np
+from pathlib import Path
+
+from .db import DB_PATH, connect
+from .embedding_codec import decode_embedding
+
+# ------------------------------------------------------
+# Embedding matrix snapshots
+# Every row of an embedding table copied into one contiguous (n, dim)
+# .npy file next to the FAISS indexes, plus the matching track ids:
+#   index/<table>.<f32|f16>.npy       matrix, row i = track ids[i]
+#   index/<table>.<f32|f16>.ids.npy   int64 track ids, ascending
+#   index/<table>.<f32|f16>.json      table version it was exported at
+# Opened memory-mapped, so any process gets the whole library zero-copy
+# and all of them share the same pages through the OS cache.
+#
+# Triggers bump a per-table counter in embedding_versions on every
+# insert, update or delete (INSERT OR REPLACE counts once).
+# refresh_snapshot() appends when the counter moved by exactly the
+# number of new tracks, i.e. nothing older was touched; any other
+# change (a vector rewritten in place, a deletion) rebuilds it.
+# ------------------------------------------------------
+SNAPSHOT_DIR = Path(
+    os.environ.get("EMBEDDING_SNAPSHOT_DIR") or Path(__file__).resolve().parents[2] / "index"
+)
+
+# Snapshots kept up to date after ingest ("" disables)
+SNAPSHOT_DTYPES = tuple(
+    d.strip() for d in os.environ.get("EMBEDDING_SNAPSHOT", "float32").split(",") if d.strip()
+)
+
+DTYPE_TAGS = {"float32": "f32", "float16": "f16"}
+TABLES = ("fused_embeddings", "embeddings", "yamnet_embeddings")
+
+# Tables whose snapshots ingest keeps current (the API reads both)
+SNAPSHOT_TABLES = ("fused_embeddings", "embeddings")
+
+# Rows fetched from SQLite per round trip while exporting
+FETCH_ROWS = 4096
+
+
+def ensure_version_tracking(conn):
+    """
+    Create embedding_versions and its triggers (safe to re-run).
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS embedding_versions (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+    """)
+    for table in TABLES:
+        conn.execute(
+            "INSERT OR IGNORE INTO embedding_versions (table_name, version) VALUES (?, 0)", (table,)
+        )
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_{event.lower()}_version
+                AFTER {event} ON {table}
+                BEGIN
+                    UPDATE embedding_versions SET version = version + 1 WHERE table_name = '{table}';
+                END
+            """)
+    conn.commit()
+
+
+def table_version(conn, table):
+    """
+    Change counter of `table`, or None on a database without tracking.
+    """
+    try:
+        row = conn.execute(
+            "SELECT version FROM embedding_versions WHERE table_name = ?", (table,)
+        ).fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else None
+
+
+def snapshot_paths(table="fused_embeddings", dtype="float32", snapshot_dir=SNAPSHOT_DIR):
+    if table not in TABLES:
+        raise ValueError(f"Unknown embedding table: {table} (expected one of {TABLES})")
+    if dtype not in DTYPE_TAGS:
+        raise ValueError(f"Unknown snapshot dtype: {dtype} (expected one of {tuple(DTYPE_TAGS)})")
+    stem = f"{table}.{DTYPE_TAGS[dtype]}"
+    return Path(snapshot_dir) / f"{stem}.npy", Path(snapshot_dir) / f"{stem}.ids.npy"
+
+
+def load_snapshot(table="fused_embeddings", dtype="float32", snapshot_dir=SNAPSHOT_DIR):
+    """
+    (track ids, read-only memmapped matrix), or None if there is no
+    snapshot yet.
+    """
+    mat_path, ids_path = snapshot_paths(table, dtype, snapshot_dir)
+    for _ in range(3):
+        try:
+            ids = np.load(ids_path, mmap_mode="r")
+            mat = np.load(mat_path, mmap_mode="r")
+        except FileNotFoundError:
+            return None
+        # the two files are replaced one after the other; a reader can
+        # land in between, so retry until they agree
+        if ids.shape[0] == mat.shape[0]:
+            return ids, mat
+        time.sleep(0.05)
+    raise RuntimeError(f"Snapshot {mat_path} and {ids_path} disagree on row count")
+
+
+def read_embeddings(conn, table="fused_embeddings", dtype="float32", dim=None, after_id=None):
+    """
+    All rows of `table` (with track_id > after_id) straight into one
+    preallocated (n, dim) array, ascending by track id. Rows whose dim
+    differs from `dim` (default: the most common one), or whose blob
+    doesn't match it, are skipped.
+    """
+    # one read transaction, so the count and the rows agree (a caller
+    # may already hold one that covers more reads)
+    own = not conn.in_transaction
+    if own:
+        conn.execute("BEGIN")
+    try:
+        if dim is None:
+            row = conn.execute(
+                f"SELECT dim FROM {table} GROUP BY dim ORDER BY COUNT(*) DESC LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=dtype)
+            dim = row[0]
+
+        where = "WHERE dim = ?" + ("" if after_id is None else " AND track_id > ?")
+        params = (dim,) if after_id is None else (dim, int(after_id))
+        n = conn.execute(f"SELECT COUNT(*) FROM {table} {where}", params).fetchone()[0]
+
+        ids = np.empty(n, dtype=np.int64)
+        mat = np.empty((n, dim), dtype=dtype)
+        cur = conn.execute(f"SELECT track_id, embedding FROM {table} {where} ORDER BY track_id", params)
+
+        i = 0
+        while True:
+            rows = cur.fetchmany(FETCH_ROWS)
+            if not rows:
+                break
+            for track_id, blob in rows:
+                try:
+                    mat[i] = decode_embedding(blob, dim)
+                except ValueError as e:
+                    print(f"⚠️ Skipping track {track_id}: {e}")
+                    continue
+                ids[i] = track_id
+                i += 1
+        return ids[:i], mat[:i]
+    finally:
+        if own:
+            conn.rollback()
+
+
+def _write_npy(path, arrays, dtype):
+    """
+    Concatenate `arrays` into a new .npy at `path` without building the
+    result in memory; atomic, so open memmaps keep the old file.
+    """
+    rows = sum(a.shape[0] for a in arrays)
+    shape = (rows,) + arrays[0].shape[1:]
+    tmp = path.with_name(path.name[:-len(".npy")] + ".tmp.npy")
+
+    out = np.lib.format.open_memmap(tmp, mode="w+", dtype=dtype, shape=shape)
+    start = 0
+    for a in arrays:
+        out[start:start + a.shape[0]] = a
+        start += a.shape[0]
+    out.flush()
+    del out
+    os.replace(tmp, path)
+
+
+def refresh_snapshot(db_path=DB_PATH, table="fused_embeddings", dtype="float32",
+                     snapshot_dir=SNAPSHOT_DIR, full=False):
+    """
+    Bring the snapshot in line with the DB. Returns the number of rows
+    it holds afterwards.
+    """
+    mat_path, ids_path = snapshot_paths(table, dtype, snapshot_dir)
+    meta_path = mat_path.with_name(mat_path.name[:-len(".npy")] + ".json")
+    mat_path.parent.mkdir(parents=True, exist_ok=True)
+
+    old = None if full else load_snapshot(table, dtype, snapshot_dir)
+    try:
+        old_version = json.loads(meta_path.read_text())["version"]
+    except (OSError, ValueError, KeyError):
+        old_version = None
+
+    conn = connect(db_path)
+    try:
+        # version, counts and rows from one read transaction
+        conn.execute("BEGIN")
+        version = table_version(conn, table)
+
+        if old is not None and old_version is not None and version is not None:
+            old_ids, old_mat = old
+            if version == old_version:
+                return old_ids.shape[0]
+            if old_ids.shape[0]:
+                dim = old_mat.shape[1]
+                last = int(old_ids[-1])
+                added = conn.execute(
+                    f"SELECT COUNT(*) FROM {table} WHERE track_id > ?", (last,)
+                ).fetchone()[0]
+                if version - old_version != added:
+                    # something already exported changed: start over
+                    old = None
+        else:
+            old = None
+
+        if old is None or not old[0].shape[0]:
+            ids, mat = read_embeddings(conn, table, dtype)
+            parts = [(ids, mat)]
+        else:
+            ids, mat = read_embeddings(conn, table, dtype, dim=dim, after_id=last)
+            parts = [old, (ids, mat)]
+    finally:
+        conn.rollback()
+        conn.close()
+
+    # matrix first: a reader between the two replaces sees more rows
+    # than ids and retries (see load_snapshot)
+    _write_npy(mat_path, [m for _, m in parts], dtype)
+    _write_npy(ids_path, [i for i, _ in parts], np.int64)
+    # version last: an interrupted refresh is redone next time
+    tmp = meta_path.with_name(meta_path.name + ".tmp")
+    tmp.write_text(json.dumps({"version": version}))
+    os.replace(tmp, meta_path)
+    return sum(i.shape[0] for i, _ in parts)
+
+
+def refresh_snapshots(db_path=DB_PATH, dtypes=SNAPSHOT_DTYPES, full=False, tables=SNAPSHOT_TABLES):
+    """
+    refresh_snapshot() for every SNAPSHOT_TABLES table in every dtype
+    configured in EMBEDDING_SNAPSHOT; called after ingest and re-embedding.
+    """
+    for table in tables:
+        for dtype in dtypes:
+            start = time.perf_counter()
+            n = refresh_snapshot(db_path, table, dtype, full=full)
+            print(f"🧊 Embedding snapshot {table} ({dtype}): {n} tracks "
+                  f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export an embedding table as a memory-mappable matrix")
+    parser.add_argument("--table", default="fused_embeddings", choices=TABLES)
+    parser.add_argument("--dtype", default="float32", choices=tuple(DTYPE_TAGS))
+    parser.add_argument("--dir", default=SNAPSHOT_DIR, help="output directory (default $EMBEDDING_SNAPSHOT_DIR or index/)")
+    parser.add_argument("--full", action="store_true", help="rebuild instead of appending new tracks")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    n = refresh_snapshot(table=args.table, dtype=args.dtype, snapshot_dir=args.dir, full=args.full)
+    print(f"🎉 Snapshot of {args.table} ({args.dtype}): {n} tracks in {time.perf_counter() - start:.1f}s")
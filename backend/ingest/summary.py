@@ -0,0 +1,134 @@
+import time
+import argparse
+import numpy as np
+
+from .db import DB_PATH, connect
+from .blobs import pack_array, unpack_array, MFCC_ROWS, CHROMA_ROWS
+
+# ------------------------------------------------------
+# Fixed-length feature summaries
+# Stored next to the full arrays at ingest so coarse scoring reads a
+# few dozen floats per track instead of whole MFCC / chroma matrices:
+#   audio_features.mfcc_mean / mfcc_std       20 floats each
+#   audio_features.chroma_mean / chroma_std   12 floats each
+# (per-coefficient statistics over frames, float32 packed blobs).
+# ------------------------------------------------------
+SUMMARY_COLUMNS = ("mfcc_mean", "mfcc_std", "chroma_mean", "chroma_std")
+
+# Tracks per backfill transaction
+BACKFILL_BATCH = 512
+
+
+def ensure_summary_columns(conn):
+    """
+    Add the summary columns to an older database (safe to re-run).
+    """
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(audio_features)")}
+    for name in SUMMARY_COLUMNS:
+        if name not in columns:
+            conn.execute(f"ALTER TABLE audio_features ADD COLUMN {name} BLOB")
+    conn.commit()
+
+
+def feature_summary(mfcc, chroma):
+    """
+    (mfcc_mean, mfcc_std, chroma_mean, chroma_std) over frames, float32.
+    """
+    mfcc = np.asarray(mfcc, dtype=np.float32)
+    chroma = np.asarray(chroma, dtype=np.float32)
+    return (
+        mfcc.mean(axis=1), mfcc.std(axis=1),
+        chroma.mean(axis=1), chroma.std(axis=1),
+    )
+
+
+def summary_blobs(mfcc, chroma):
+    """
+    feature_summary() packed for the SUMMARY_COLUMNS, in that order.
+    """
+    return tuple(pack_array(s, "float32") for s in feature_summary(mfcc, chroma))
+
+
+def summary_vector(mean, std):
+    """
+    mean ‖ std, the vector coarse MFCC / chroma scores compare.
+    """
+    return np.concatenate([np.asarray(mean, dtype=np.float32), np.asarray(std, dtype=np.float32)])
+
+
+def summary_vectors(conn, track_id, stored):
+    """
+    (mfcc, chroma) summary vectors of a DB track from its stored
+    SUMMARY_COLUMNS values, or computed from the full arrays for rows
+    not backfilled yet.
+    """
+    if all(b is not None for b in stored):
+        mfcc_mean, mfcc_std, chroma_mean, chroma_std = (unpack_array(b) for b in stored)
+    else:
+        mfcc, chroma = conn.execute(
+            "SELECT mfcc, chroma FROM audio_features WHERE track_id = ?", (track_id,)
+        ).fetchone()
+        mfcc_mean, mfcc_std, chroma_mean, chroma_std = feature_summary(
+            unpack_array(mfcc, MFCC_ROWS), unpack_array(chroma, CHROMA_ROWS)
+        )
+    return summary_vector(mfcc_mean, mfcc_std), summary_vector(chroma_mean, chroma_std)
+
+
+# ======================================
+# BACKFILL
+# ======================================
+def backfill_summaries(db_path=DB_PATH, full=False, batch=BACKFILL_BATCH):
+    """
+    Fill the summary columns for rows stored before they existed (or
+    every row with full=True, e.g. after features were re-extracted).
+    Returns the number of rows updated.
+    """
+    conn = connect(db_path)
+    ensure_summary_columns(conn)
+
+    where = "" if full else " WHERE mfcc_mean IS NULL OR chroma_mean IS NULL"
+    ids = [r[0] for r in conn.execute(
+        "SELECT track_id FROM audio_features" + where + " ORDER BY track_id"
+    )]
+
+    features = 0
+    start = time.perf_counter()
+    for i in range(0, len(ids), batch):
+        chunk = ids[i:i + batch]
+        rows = conn.execute(f"""
+            SELECT track_id, mfcc, chroma FROM audio_features
+            WHERE track_id IN ({",".join("?" * len(chunk))})
+        """, chunk).fetchall()
+
+        updates = []
+        for track_id, mfcc, chroma in rows:
+            if mfcc is None or chroma is None:
+                continue
+            try:
+                blobs = summary_blobs(unpack_array(mfcc, MFCC_ROWS), unpack_array(chroma, CHROMA_ROWS))
+            except ValueError as e:
+                print(f"⚠️ Skipping track {track_id}: {e}")
+                continue
+            updates.append(blobs + (track_id,))
+
+        conn.executemany("""
+            UPDATE audio_features
+            SET mfcc_mean = ?, mfcc_std = ?, chroma_mean = ?, chroma_std = ?
+            WHERE track_id = ?
+        """, updates)
+        conn.commit()
+        features += len(updates)
+        print(f"✔ Summarized {features}/{len(ids)} feature rows")
+
+    conn.close()
+    print(f"🎉 Backfilled {features} feature summaries in {time.perf_counter() - start:.1f}s")
+    return features
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill summary-feature columns for existing tracks")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--full", action="store_true", help="recompute every row, not just missing ones")
+    args = parser.parse_args()
+
+    backfill_summaries(args.db, full=args.full)
@@ -1,21 +1,97 @@
-import sqlite3
-import librosa
+import os
+import time
+import argparse
+import multiprocessing
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 
+from . import metrics
+from .models import warm_up
+from .waveform_cache import get_preprocessed
 from .extract_crepe_only import (
     preprocess_for_crepe,
-    extract_crepe_pitch,
-    update_crepe_features
+    extract_crepe_pitch_batch
 )
+from .db import DB_PATH, connect
+from .blobs import pack_array
+
+# ------------------------------------------------------
+# Resumable CREPE backfill
+# Workers load a few tracks each (from the waveform cache when it is
+# enabled, otherwise via preprocess_audio) and run all their frames through
+# one CREPE call; the parent writes each finished chunk in a single
+# transaction and then appends its track ids to the checkpoint file.
+# ------------------------------------------------------
+CHECKPOINT_PATH = os.environ.get(
+    "CREPE_CHECKPOINT", str(Path(DB_PATH).with_name("crepe_backfill.ckpt"))
+)
+CREPE_WORKERS = int(os.environ.get("CREPE_WORKERS", os.cpu_count() or 1))
+TRACKS_PER_TASK = int(os.environ.get("CREPE_TRACKS_PER_TASK", "8"))
+
+
+# ======================================
+# CHECKPOINT
+# ======================================
+def load_checkpoint(path):
+    """
+    {track_id: "done" | "failed"} from previous runs.
+    """
+    state = {}
+    if not os.path.exists(path):
+        return state
+    with open(path) as f:
+        for line in f:
+            parts = line.split()
+            # a torn last line from a crash is simply ignored
+            if len(parts) == 2 and parts[0].isdigit():
+                state[int(parts[0])] = parts[1]
+    return state
+
+
+def append_checkpoint(path, entries):
+    with open(path, "a") as f:
+        for track_id, status in entries:
+            f.write(f"{track_id} {status}\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+# ======================================
+# WORKER SIDE
+# ======================================
+def _init_worker():
+    metrics.enable_export()
+    warm_up(("crepe",))
+
+
+def crepe_chunk(items):
+    """
+    items: [(track_id, file_path)]. Returns ([(track_id, pitch tuple or
+    error string)], metrics events).
+    """
+    results = []
+    waves = []
+    for track_id, file_path in items:
+        try:
+            # same preprocessed clip ingest runs CREPE on
+            y, _, sr = get_preprocessed(track_id, file_path)
+            y16, _ = preprocess_for_crepe(y, sr)
+            waves.append((track_id, y16))
+        except Exception as e:
+            results.append((track_id, str(e) or type(e).__name__))
 
-# DATABASE IS IN ROOT/database/music.db
-DB_PATH = str(Path(__file__).resolve().parents[2] / "database" / "music.db")
+    if waves:
+        pitches = extract_crepe_pitch_batch([y16 for _, y16 in waves])
+        results.extend((track_id, p) for (track_id, _), p in zip(waves, pitches))
 
-BATCH_SIZE = 300
+    return results, metrics.drain()
 
 
-def update_all_crepe_features():
-    conn = sqlite3.connect(DB_PATH)
+# ======================================
+# PARENT SIDE
+# ======================================
+def pending_tracks(db_path, checkpoint, retry_failed=False):
+    conn = connect(db_path)
     cur = conn.cursor()
 
     # Fetch only songs where pitch_median is NULL
@@ -24,49 +100,128 @@ def update_all_crepe_features():
         FROM tracks
         JOIN audio_features ON tracks.id = audio_features.track_id
         WHERE audio_features.pitch_median IS NULL
+        ORDER BY tracks.id
     """)
-
-    pending = cur.fetchall()
+    rows = cur.fetchall()
     conn.close()
 
-    total_pending = len(pending)
-    print(f"\n🎵 Songs needing CREPE features: {total_pending}")
+    skip = {"done"} if retry_failed else {"done", "failed"}
+    return [r for r in rows if checkpoint.get(r[0]) not in skip]
 
-    if total_pending == 0:
-        print("✔ All tracks already processed. Nothing to do.")
-        return
-
-    # Take first batch of 5
-    batch = pending[:BATCH_SIZE]
-    print(f"\n🔹 Processing batch of {len(batch)} songs...\n")
 
-    for track_id, file_path in batch:
-        print(f"  ▶ Track {track_id}: {file_path}")
+@metrics.timed("db_write")
+def write_pitches(conn, rows):
+    conn.executemany("""
+        UPDATE audio_features
+        SET pitch_times = ?, pitch_freqs = ?, pitch_conf = ?, pitch_median = ?
+        WHERE track_id = ?
+    """, [
+        (pack_array(times, "float32"), pack_array(freqs, "float32"), pack_array(conf, "float32"),
+         float(median), track_id)
+        for track_id, (times, freqs, conf, median) in rows
+    ])
+    conn.commit()
 
-        try:
-            y, sr = librosa.load(file_path, sr=None, mono=True)
 
-            y16, sr16 = preprocess_for_crepe(y, sr)
+def update_all_crepe_features(db_path=DB_PATH, limit=None, workers=CREPE_WORKERS,
+                              tracks_per_task=TRACKS_PER_TASK, checkpoint_path=CHECKPOINT_PATH,
+                              retry_failed=False):
+    checkpoint = load_checkpoint(checkpoint_path)
+    pending = pending_tracks(db_path, checkpoint, retry_failed)
 
-            pitch_times, pitch_freqs, pitch_conf, pitch_median = \
-                extract_crepe_pitch(y16, sr16)
-
-            update_crepe_features(
-                DB_PATH,
-                track_id,
-                pitch_times,
-                pitch_freqs,
-                pitch_conf,
-                pitch_median
-            )
-
-            print(f"    ✓ Updated pitch (median={pitch_median:.2f})")
-
-        except Exception as e:
-            print(f"    ❌ Error: {e}")
-
-    print("\n🎉 Batch completed! Run again for next 5 songs.\n")
+    print(f"\n🎵 Songs needing CREPE features: {len(pending)}")
+    if not pending:
+        print("✔ All tracks already processed. Nothing to do.")
+        return 0
+
+    if limit is not None:
+        pending = pending[:limit]
+
+    workers = max(1, workers)
+    tracks_per_task = max(1, tracks_per_task)
+    chunks = [pending[i:i + tracks_per_task] for i in range(0, len(pending), tracks_per_task)]
+    print(f"🔹 {len(pending)} tracks in {len(chunks)} chunks across {workers} workers "
+          f"(checkpoint: {checkpoint_path})\n")
+
+    conn = connect(db_path)
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker
+    )
+
+    done_count = 0
+    failed_count = 0
+    start = time.perf_counter()
+    futures = {}
+    remaining = iter(chunks)
+
+    try:
+        while True:
+            # two chunks per worker keep everyone busy without
+            # holding decoded audio for the whole backlog
+            while len(futures) < workers * 2:
+                chunk = next(remaining, None)
+                if chunk is None:
+                    break
+                futures[executor.submit(crepe_chunk, chunk)] = chunk
+
+            if not futures:
+                break
+
+            finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in finished:
+                chunk = futures.pop(future)
+                try:
+                    results, events = future.result()
+                except Exception as e:
+                    # model / worker failure: leave the chunk for the next run
+                    failed_count += len(chunk)
+                    print(f"❌ Chunk {chunk[0][0]}–{chunk[-1][0]} failed: {e}")
+                    continue
+                metrics.merge(events)
+
+                ok = [(tid, r) for tid, r in results if not isinstance(r, str)]
+                bad = [(tid, r) for tid, r in results if isinstance(r, str)]
+
+                write_pitches(conn, ok)
+                append_checkpoint(
+                    checkpoint_path,
+                    [(tid, "done") for tid, _ in ok] + [(tid, "failed") for tid, _ in bad]
+                )
+
+                for tid, err in bad:
+                    print(f"  ❌ Track {tid}: {err}")
+                done_count += len(ok)
+                failed_count += len(bad)
+
+                rate = done_count / (time.perf_counter() - start)
+                print(f"  ✓ {done_count + failed_count}/{len(pending)} tracks "
+                      f"({failed_count} failed) — {rate:.2f} tracks/s")
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        conn.close()
+        metrics.write_textfile()
+
+    elapsed = time.perf_counter() - start
+    print(f"\n🎉 CREPE backfill finished: {done_count} updated, {failed_count} failed "
+          f"in {elapsed:.1f}s ({done_count / elapsed if elapsed > 0 else 0.0:.2f} tracks/s).\n")
+    return done_count
 
 
 if __name__ == "__main__":
-    update_all_crepe_features()
+    parser = argparse.ArgumentParser(description="Backfill CREPE pitch for tracks missing it")
+    parser.add_argument("--limit", type=int, default=None, help="process at most N tracks this run")
+    parser.add_argument("--workers", type=int, default=CREPE_WORKERS)
+    parser.add_argument("--tracks-per-task", type=int, default=TRACKS_PER_TASK)
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    parser.add_argument("--retry-failed", action="store_true", help="retry tracks that failed before")
+    args = parser.parse_args()
+
+    update_all_crepe_features(
+        limit=args.limit,
+        workers=args.workers,
+        tracks_per_task=args.tracks_per_task,
+        checkpoint_path=args.checkpoint,
+        retry_failed=args.retry_failed
+    )
@@ -0,0 +1,120 @@
+import os
+import hashlib
+import argparse
+import numpy as np
+from pathlib import Path
+
+from . import metrics
+from . import preprocess as pp
+from .db import DB_PATH, connect
+
+# ------------------------------------------------------
+# On-disk cache of preprocessed waveforms
+# <WAVEFORM_CACHE_DIR>/<params hash>/<track_id>.npy, one float32 array
+# per track, opened memory-mapped so re-extraction jobs read them
+# without decoding (or copying) anything. Changing any preprocessing
+# parameter changes the hash, so stale entries are never picked up.
+#
+# Off unless WAVEFORM_CACHE_DIR is set: at 48 kHz × 60 s each entry is
+# ~11.5 MB, so opt in where the disk is there for it.
+# ------------------------------------------------------
+WAVEFORM_CACHE_DIR = os.environ.get("WAVEFORM_CACHE_DIR") or None
+
+# Bump when preprocess_audio changes in a way its parameters don't capture
+CACHE_VERSION = 3
+
+
+def params_hash():
+    params = (
+        CACHE_VERSION, pp.TARGET_SR, pp.TARGET_DURATION,
+        pp.TRIM_TOP_DB, pp.TARGET_DBFS, pp.RES_TYPE
+    )
+    return hashlib.blake2b(repr(params).encode(), digest_size=8).hexdigest()
+
+
+def cache_path(track_id, cache_dir=WAVEFORM_CACHE_DIR):
+    return Path(cache_dir) / params_hash() / f"{int(track_id)}.npy"
+
+
+def load_waveform(track_id, cache_dir=WAVEFORM_CACHE_DIR):
+    """
+    Read-only memory-mapped waveform, or None if not cached.
+    """
+    if cache_dir is None:
+        return None
+    path = cache_path(track_id, cache_dir)
+    try:
+        y = np.load(path, mmap_mode="r")
+    except (FileNotFoundError, ValueError):
+        # missing, or a torn write from an interrupted run
+        metrics.inc("waveform_cache_total", result="miss")
+        return None
+    metrics.inc("waveform_cache_total", result="hit")
+    return y
+
+
+def store_waveform(track_id, y, cache_dir=WAVEFORM_CACHE_DIR):
+    if cache_dir is None:
+        return None
+    path = cache_path(track_id, cache_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp.npy")
+    np.save(tmp, np.ascontiguousarray(y, dtype=np.float32))
+    os.replace(tmp, path)
+    return path
+
+
+def get_preprocessed(track_id, file_path, cache_dir=WAVEFORM_CACHE_DIR):
+    """
+    preprocess_audio(file_path) through the cache: (y, duration, sr).
+    """
+    y = load_waveform(track_id, cache_dir)
+    if y is None:
+        y, _, _ = pp.preprocess_audio(file_path)
+        store_waveform(track_id, y, cache_dir)
+    return y, pp.TARGET_DURATION, pp.TARGET_SR
+
+
+# ======================================
+# WARM THE CACHE FOR THE WHOLE LIBRARY
+# ======================================
+def _warm_one(args):
+    track_id, file_path, cache_dir = args
+    if cache_path(track_id, cache_dir).exists():
+        return track_id, None
+    try:
+        get_preprocessed(track_id, file_path, cache_dir)
+        return track_id, None
+    except Exception as e:
+        return track_id, str(e) or type(e).__name__
+
+
+def warm_cache(db_path=DB_PATH, cache_dir=WAVEFORM_CACHE_DIR, workers=os.cpu_count() or 1):
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    if cache_dir is None:
+        raise ValueError("No cache directory (set WAVEFORM_CACHE_DIR or pass --dir)")
+
+    conn = connect(db_path)
+    rows = conn.execute("SELECT id, file_path FROM tracks ORDER BY id").fetchall()
+    conn.close()
+
+    print(f"\n🗃️ Caching {len(rows)} waveforms in {Path(cache_dir) / params_hash()}")
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max(1, workers), mp_context=ctx) as executor:
+        jobs = [(track_id, file_path, cache_dir) for track_id, file_path in rows]
+        for track_id, error in executor.map(_warm_one, jobs, chunksize=4):
+            if error:
+                print(f"❌ Track {track_id}: {error}")
+
+    print("🎉 Waveform cache ready.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Preprocess every track into the waveform cache")
+    parser.add_argument("--dir", default=WAVEFORM_CACHE_DIR, help="cache directory (default $WAVEFORM_CACHE_DIR)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    warm_cache(cache_dir=args.dir, workers=args.workers)
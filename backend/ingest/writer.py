@@ -0,0 +1,198 @@
+import os
+import time
+import queue
+import threading
+
+from . import metrics
+from .manifest import mark
+from .db import DB_PATH, connect
+from .embedding_codec import encode_embedding
+from .blobs import pack_array, pack_feature
+from .summary import summary_blobs
+
+# ------------------------------------------------------
+# Single-writer persistence for ingest
+# One thread owns the only write connection. Every track's three rows
+# (tracks, audio_features, fused_embeddings) plus its ingest_manifest
+# entry go in together, and many tracks share one transaction, so a
+# batch costs a single fsync.
+# ------------------------------------------------------
+# Tracks per transaction
+WRITE_BATCH_SIZE = int(os.environ.get("INGEST_WRITE_BATCH", "64"))
+# Commit at least this often even if the batch isn't full (seconds)
+WRITE_MAX_DELAY = float(os.environ.get("INGEST_WRITE_DELAY", "2.0"))
+# Items waiting for the writer before producers block (default 4 batches)
+WRITE_QUEUE = int(os.environ.get("INGEST_WRITE_QUEUE", "0")) or None
+
+_STOP = object()
+
+
+def _blob(a):
+    return pack_array(a, "float32") if a is not None else None
+
+
+def write_track(cur, title, file_path, duration, dataset, feats, content_hash=None):
+    """
+    Insert one fully extracted track on an open cursor. Returns track_id.
+    """
+    cur.execute("""
+        INSERT INTO tracks (title, file_path, duration, dataset, content_hash)
+        VALUES (?, ?, ?, ?, ?)
+    """, (title, file_path, duration, dataset, content_hash))
+    track_id = cur.lastrowid
+
+    cur.execute("""
+        INSERT OR REPLACE INTO audio_features (
+            track_id, tempo, mfcc, chroma, pitch_times, pitch_freqs, pitch_conf, pitch_median,
+            mfcc_mean, mfcc_std, chroma_mean, chroma_std
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (track_id,
+          float(feats["tempo"]),
+          pack_feature(feats["mfcc"]),
+          pack_feature(feats["chroma"]),
+          _blob(feats.get("pitch_times")),
+          _blob(feats.get("pitch_freqs")),
+          _blob(feats.get("pitch_conf")),
+          float(feats.get("pitch_median", 0.0)),
+          *summary_blobs(feats["mfcc"], feats["chroma"])
+          ))
+
+    embedding = feats["embedding"]
+    cur.execute("""
+        INSERT OR REPLACE INTO fused_embeddings (track_id, embedding, dim)
+        VALUES (?, ?, ?)
+    """, (track_id, encode_embedding(embedding), embedding.shape[0]))
+
+    return track_id
+
+
+class TrackWriter:
+    """
+    Background writer thread fed through a bounded queue.
+
+        writer = TrackWriter(db_path).start()
+        writer.put(title, file_path, duration, dataset, feats)
+        writer.mark(file_path, dataset, "failed", error="...")
+        ...
+        saved, failed = writer.close()
+
+    put() also marks the file done in ingest_manifest. A track that
+    fails to insert is rolled back on its own (savepoint) and marked
+    failed; the rest of its batch still commits.
+    """
+
+    def __init__(self, db_path=DB_PATH, batch_size=WRITE_BATCH_SIZE, max_delay=WRITE_MAX_DELAY,
+                 queue_depth=WRITE_QUEUE):
+        self.db_path = db_path
+        self.batch_size = max(1, batch_size)
+        self.max_delay = max_delay
+        self.saved = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=max(1, queue_depth or self.batch_size * 4))
+        self._thread = None
+        self._error = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="ingest-writer", daemon=True)
+            self._thread.start()
+        return self
+
+    def _put(self, item):
+        # blocks while the writer is behind, but never on a dead thread
+        while True:
+            if self._error is not None:
+                raise RuntimeError(f"Ingest writer stopped: {self._error}")
+            try:
+                self._queue.put(item, timeout=1.0)
+                return
+            except queue.Full:
+                continue
+
+    def put(self, title, file_path, duration, dataset, feats, content_hash=None, run_id=None):
+        self._put(("track", (title, file_path, duration, dataset, feats, content_hash, run_id)))
+
+    def mark(self, file_path, dataset, status, **fields):
+        """
+        Queue a manifest update (see manifest.mark for fields).
+        """
+        self._put(("mark", (file_path, dataset, status, fields)))
+
+    def close(self):
+        """
+        Flush everything queued, stop the thread and return (saved, failed).
+        """
+        if self._thread is not None:
+            try:
+                self._put(_STOP)
+            except RuntimeError:
+                pass
+            self._thread.join()
+            self._thread = None
+        return self.saved, self.failed
+
+    def _run(self):
+        conn = connect(self.db_path, isolation_level=None)
+        try:
+            stopping = False
+            while not stopping:
+                batch = []
+                deadline = None
+                while len(batch) < self.batch_size:
+                    timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                    try:
+                        item = self._queue.get(timeout=timeout)
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                    if deadline is None:
+                        deadline = time.monotonic() + self.max_delay
+
+                if batch:
+                    self._write_batch(conn, batch)
+        except Exception as e:
+            self._error = e
+            print(f"❌ Ingest writer failed — {e}")
+        finally:
+            conn.close()
+
+    def _write_batch(self, conn, batch):
+        cur = conn.cursor()
+        saved = []
+
+        with metrics.timer("db_write"):
+            cur.execute("BEGIN")
+            for kind, item in batch:
+                if kind == "mark":
+                    file_path, dataset, status, fields = item
+                    mark(cur, file_path, dataset, status, **fields)
+                    continue
+
+                title, file_path, duration, dataset, feats, content_hash, run_id = item
+                cur.execute("SAVEPOINT track")
+                try:
+                    track_id = write_track(cur, title, file_path, duration, dataset, feats, content_hash)
+                    mark(cur, file_path, dataset, "done", content_hash=content_hash,
+                         track_id=track_id, run_id=run_id)
+                except Exception as e:
+                    cur.execute("ROLLBACK TO SAVEPOINT track")
+                    cur.execute("RELEASE SAVEPOINT track")
+                    mark(cur, file_path, dataset, "failed", content_hash=content_hash,
+                         error=str(e), run_id=run_id)
+                    self.failed += 1
+                    metrics.inc("ingest_failures_total", dataset=dataset)
+                    print(f"❌ ERROR saving {file_path} — {e}")
+                    continue
+                cur.execute("RELEASE SAVEPOINT track")
+                saved.append((track_id, dataset))
+            cur.execute("COMMIT")
+
+        for track_id, dataset in saved:
+            metrics.inc("tracks_ingested_total", dataset=dataset)
+        self.saved += len(saved)
+        if saved:
+            print(f"✓ Saved {len(saved)} tracks to DB (track_id {saved[0][0]}–{saved[-1][0]})")
@@ -0,0 +1,134 @@
+import argparse
+import numpy as np
+import faiss
+from pathlib import Path
+
+from ingest.db import DB_PATH, connect
+from ingest.snapshot import read_embeddings
+from .cosine import l2_normalize
+
+ROOT = Path(__file__).resolve().parents[2]
+INDEX_DIR = ROOT / "index"
+
+FUSED_DIM = 1536
+INDEX_KINDS = ("flat", "ivf", "hnsw", "fp16", "sq8", "pq")
+
+# Kinds that keep only compressed codes; searched with asymmetric
+# distances (float query vs. codes), then reranked on exact vectors
+COMPRESSED_KINDS = ("fp16", "sq8", "pq")
+
+# HNSW graph degree / build effort, IVF search breadth
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+IVF_NPROBE = 16
+
+# PQ: sub-quantizers (1536 / 96 = 16 dims each) and bits per code,
+# i.e. 96 bytes per track instead of 6 KB
+PQ_M = 96
+PQ_NBITS = 8
+
+
+def index_path_for(kind):
+    # "flat" keeps the original reference_index.faiss name
+    if kind == "flat":
+        return INDEX_DIR / "reference_index.faiss"
+    return INDEX_DIR / f"reference_index_{kind}.faiss"
+
+
+def index_model_name(kind):
+    return f"fused_{kind}"
+
+
+# ======================================
+# LOAD fused_embeddings
+# ======================================
+def load_fused_matrix(db_path=DB_PATH):
+    # rows with another dim are skipped
+    conn = connect(db_path)
+    ids, mat = read_embeddings(conn, "fused_embeddings", dim=FUSED_DIM)
+    conn.close()
+    return ids, mat
+
+
+# ======================================
+# BUILD
+# ======================================
+def make_index(kind, n_vectors, dim=FUSED_DIM):
+    """
+    All variants use inner product on L2-normalised vectors (= cosine).
+    fp16 / sq8 store each dimension in 2 bytes / 1 byte, pq stores PQ_M
+    codes per vector; all three score queries against the codes directly.
+    """
+    if kind == "flat":
+        base = faiss.IndexFlatIP(dim)
+    elif kind == "ivf":
+        # ~4*sqrt(n) lists, but keep >= 39 training points per list
+        nlist = max(1, min(int(4 * np.sqrt(n_vectors)), n_vectors // 39))
+        quantizer = faiss.IndexFlatIP(dim)
+        base = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        base.nprobe = min(IVF_NPROBE, nlist)
+    elif kind == "hnsw":
+        base = faiss.IndexHNSWFlat(dim, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        base.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        base.hnsw.efSearch = HNSW_EF_SEARCH
+    elif kind in ("fp16", "sq8"):
+        qtype = faiss.ScalarQuantizer.QT_fp16 if kind == "fp16" else faiss.ScalarQuantizer.QT_8bit
+        base = faiss.IndexScalarQuantizer(dim, qtype, faiss.METRIC_INNER_PRODUCT)
+    elif kind == "pq":
+        # keep >= 39 training points per centroid (2**nbits per sub-quantizer)
+        nbits = max(1, min(PQ_NBITS, int(np.log2(max(n_vectors // 39, 2)))))
+        base = faiss.IndexPQ(dim, PQ_M, nbits, faiss.METRIC_INNER_PRODUCT)
+    else:
+        raise ValueError(f"Unknown index kind: {kind} (expected one of {INDEX_KINDS})")
+
+    return faiss.IndexIDMap2(base)
+
+
+def record_index_meta(db_path, model, index_path, dim, total_vectors):
+    conn = connect(db_path)
+    cur = conn.cursor()
+    cur.execute("DELETE FROM faiss_index_meta WHERE model = ?", (model,))
+    cur.execute("""
+        INSERT INTO faiss_index_meta (model, index_path, dim, total_vectors)
+        VALUES (?, ?, ?, ?)
+    """, (model, str(index_path), dim, total_vectors))
+    conn.commit()
+    conn.close()
+
+
+def build_index(kind="flat", db_path=DB_PATH, index_path=None):
+    """
+    Build a FAISS index over fused_embeddings, write it to disk and
+    record it in faiss_index_meta. Returns the index path.
+    """
+    ids, mat = load_fused_matrix(db_path)
+    if ids.size == 0:
+        raise RuntimeError("No fused embeddings in the database — run ingestion first.")
+
+    vectors = l2_normalize(mat)
+    index = make_index(kind, len(ids))
+
+    if not index.is_trained:
+        index.train(vectors)
+    index.add_with_ids(vectors, ids)
+
+    index_path = Path(index_path) if index_path else index_path_for(kind)
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    faiss.write_index(index, str(index_path))
+
+    record_index_meta(db_path, index_model_name(kind), index_path, FUSED_DIM, index.ntotal)
+
+    print(f"✔ Built {kind} index: {index.ntotal} vectors → {index_path}")
+    return index_path
+
+
+# ======================================
+# CLI  (run from backend/: python -m search.build_index --kind hnsw)
+# ======================================
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build FAISS index over fused_embeddings")
+    parser.add_argument("--kind", choices=INDEX_KINDS, default="flat")
+    args = parser.parse_args()
+
+    build_index(args.kind)
@@ -0,0 +1,11 @@
+import numpy as np
+
+
+def l2_normalize(x, eps=1e-9):
+    """
+    Row-wise L2 normalisation, so inner product == cosine similarity.
+    Works on a single vector or an (n, d) matrix.
+    """
+    x = np.asarray(x, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / (norms + eps)
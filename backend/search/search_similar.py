@@ -0,0 +1,115 @@
+import os
+import sqlite3
+import threading
+import numpy as np
+import faiss
+from pathlib import Path
+
+from ingest.db import DB_PATH, get_connection
+from ingest.embedding_codec import decode_embedding
+from ingest.snapshot import load_snapshot
+from .build_index import COMPRESSED_KINDS, index_model_name
+from .cosine import l2_normalize
+
+# Compressed indexes return k * RERANK_FACTOR candidates, which are then
+# re-scored on exact vectors (0 keeps the approximate ranking)
+RERANK_FACTOR = int(os.environ.get("EMBEDDING_RERANK", "4"))
+
+
+class EmbeddingIndex:
+    """
+    Query side of the FAISS index recorded in faiss_index_meta.
+
+    The index is read lazily and re-read whenever its file on disk is
+    replaced (e.g. after build_index runs again). Compressed kinds
+    rerank their candidates on exact vectors from the embedding snapshot
+    (or the DB for tracks the snapshot doesn't have yet).
+    """
+
+    def __init__(self, kind="flat", db_path=DB_PATH, rerank=RERANK_FACTOR):
+        self.kind = kind
+        self.db_path = db_path
+        self.rerank = rerank if kind in COMPRESSED_KINDS else 0
+        self._index = None
+        self._index_path = None
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def _lookup_path(self):
+        cur = get_connection(self.db_path).cursor()
+        cur.execute(
+            "SELECT index_path FROM faiss_index_meta WHERE model = ? ORDER BY id DESC LIMIT 1",
+            (index_model_name(self.kind),)
+        )
+        row = cur.fetchone()
+        return Path(row[0]) if row else None
+
+    def load(self):
+        """
+        (Re)load the index if needed. Returns False when no usable index exists.
+        """
+        with self._lock:
+            if self._index_path is None:
+                self._index_path = self._lookup_path()
+            if self._index_path is None or not self._index_path.exists():
+                return False
+
+            mtime = os.path.getmtime(self._index_path)
+            if self._index is None or mtime != self._mtime:
+                self._index = faiss.read_index(str(self._index_path))
+                self._mtime = mtime
+            return self._index.ntotal > 0
+
+    @property
+    def available(self):
+        try:
+            return self.load()
+        except (sqlite3.Error, RuntimeError):
+            return False
+
+    def _exact_vectors(self, track_ids):
+        """
+        {track_id: float32 vector} for a few candidates.
+        """
+        vectors = {}
+        snapshot = load_snapshot("fused_embeddings")
+        if snapshot is not None:
+            snap_ids, mat = snapshot
+            rows = np.searchsorted(snap_ids, track_ids)
+            for track_id, row in zip(track_ids, rows):
+                if row < snap_ids.shape[0] and snap_ids[row] == track_id:
+                    vectors[track_id] = np.asarray(mat[row], dtype=np.float32)
+
+        missing = [t for t in track_ids if t not in vectors]
+        if missing:
+            cur = get_connection(self.db_path).execute(
+                f"SELECT track_id, embedding, dim FROM fused_embeddings "
+                f"WHERE track_id IN ({','.join('?' * len(missing))})",
+                missing
+            )
+            for track_id, blob, dim in cur.fetchall():
+                vectors[track_id] = decode_embedding(blob, dim)
+        return vectors
+
+    def search(self, query_vec, k=5):
+        """
+        Top-k tracks by cosine similarity to query_vec.
+        Returns [(track_id, cosine), ...], best first.
+        """
+        if not self.load():
+            return []
+
+        q = l2_normalize(np.asarray(query_vec, dtype=np.float32).reshape(1, -1))
+        scores, ids = self._index.search(q, k * max(1, self.rerank))
+        found = [(int(t), float(s)) for t, s in zip(ids[0], scores[0]) if t != -1]
+        if not self.rerank:
+            return found
+
+        # exact cosine for the candidates; approximate score if a vector is gone
+        exact = self._exact_vectors([t for t, _ in found])
+        rescored = [
+            (t, float(l2_normalize(exact[t]) @ q[0]) if t in exact else s)
+            for t, s in found
+        ]
+        rescored.sort(key=lambda r: r[1], reverse=True)
+        return rescored[:k]
@@ -1,11 +1,8 @@
-import sqlite3
-import numpy as np
-from pathlib import Path
+from ingest.db import get_connection
 
-DB_PATH = Path(__file__).resolve().parents[1] / "database" / "music.db"
-
-def load_audio_features():
-    conn = sqlite3.connect(DB_PATH)
+def load_audio_features(conn=None):
+    if conn is None:
+        conn = get_connection()
     cur = conn.cursor()
 
     cur.execute("""
@@ -14,6 +11,4 @@ def load_audio_features():
         WHERE pitch_median IS NOT NULL
     """)
 
-    rows = cur.fetchall()
-    conn.close()
-    return rows
+    return cur.fetchall()
@@ -0,0 +1,110 @@
+import threading
+import numpy as np
+
+from ingest.metrics import timer
+from ingest.db import DB_PATH, connect
+from .db_utils import load_audio_features
+from .similarity import (
+    tempo_similarity_batch,
+    pitch_similarity_batch,
+    hybrid_basic_score,
+    top_k_indices
+)
+
+
+class FeatureStore:
+    """
+    Resident, array-backed copy of the (tempo, pitch_median) columns.
+
+    Loaded once, then reloaded only when another connection has
+    committed to the DB (checked with PRAGMA data_version, which is a
+    cheap per-connection counter). Queries score the whole library in
+    one vectorized pass.
+    """
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self._conn = None
+        self._data_version = None
+        self._lock = threading.Lock()
+
+        # bumped on every reload; lets callers tell if cached rankings are stale
+        self.generation = 0
+
+        # (track_ids, ...) — swapped as one tuple on reload
+        self._arrays = self._empty()
+
+    def __len__(self):
+        return self._arrays[0].shape[0]
+
+    def _connect(self):
+        # its own connection, not a pooled one: data_version is only
+        # comparable between calls on the same connection
+        if self._conn is None:
+            self._conn = connect(self.db_path, check_same_thread=False)
+        return self._conn
+
+    def _empty(self):
+        return (
+            np.empty(0, dtype=np.int64),
+            np.empty(0, dtype=np.float64),
+            np.empty(0, dtype=np.float64)
+        )
+
+    def _load(self, conn):
+        rows = load_audio_features(conn)
+        if not rows:
+            return self._empty()
+
+        data = np.array(rows, dtype=np.float64)
+        return (
+            data[:, 0].astype(np.int64),
+            np.ascontiguousarray(data[:, 1]),
+            np.ascontiguousarray(data[:, 2])
+        )
+
+    def refresh(self, force=False):
+        """
+        Reload the arrays if the DB changed since the last load.
+        Returns True when a reload happened.
+        """
+        with self._lock:
+            conn = self._connect()
+            version = conn.execute("PRAGMA data_version").fetchone()[0]
+            if not force and version == self._data_version:
+                return False
+
+            with timer("db_read", store=type(self).__name__):
+                self._arrays = self._load(conn)
+            self._data_version = version
+            self.generation += 1
+            return True
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+                self._data_version = None
+
+    def top_k(self, tempo, pitch_median, k=5):
+        """
+        Score every track against the query and return the best k,
+        in the same shape /analyze has always returned.
+        """
+        self.refresh()
+        track_ids, tempos, pitches = self._arrays
+
+        t_sim = tempo_similarity_batch(float(tempo), tempos)
+        p_sim = pitch_similarity_batch(float(pitch_median), pitches)
+        scores = hybrid_basic_score(t_sim, p_sim)
+
+        return [
+            {
+                "track_id": int(track_ids[i]),
+                "tempo_similarity": round(float(t_sim[i]) * 100, 2),
+                "pitch_similarity": round(float(p_sim[i]) * 100, 2),
+                "overall_score": round(float(scores[i]) * 100, 2)
+            }
+            for i in top_k_indices(scores, k)
+        ]
@@ -0,0 +1,135 @@
+import numpy as np
+
+from ingest.embedding_codec import decode_embedding
+from ingest.summary import SUMMARY_COLUMNS, summary_vectors
+from .feature_store import FeatureStore
+from .similarity import top_k_indices
+
+# Weights of the hybrid score (the /analyze defaults)
+DEFAULT_WEIGHTS = {
+    "cos": 0.45,
+    "euc": 0.25,
+    "mfcc": 0.20,
+    "chroma": 0.10,
+}
+
+
+def cosine_batch(q, mat, norms):
+    """
+    Cosine of q against every row of mat (row norms precomputed).
+    """
+    if mat.shape[0] == 0:
+        return np.empty(0, dtype=np.float64)
+
+    q = np.asarray(q, dtype=np.float32).ravel()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sims = (mat @ q) / (np.linalg.norm(q) * norms)
+    return np.nan_to_num(sims, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+class HybridStore(FeatureStore):
+    """
+    Resident library for the full hybrid score: fused embeddings plus
+    MFCC / chroma summary vectors (mean ‖ std per coefficient, see
+    ingest.summary), scored against a query as matrix ops. Holding the
+    summaries instead of the frame matrices keeps it to ~6 KB a track.
+
+    Reuses FeatureStore's reload-on-DB-change logic; only the arrays
+    it holds differ.
+    """
+
+    def _load(self, conn):
+        # databases not migrated yet have no summary columns: every row
+        # then falls back to its full arrays (one at a time, not kept)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(audio_features)")}
+        summary = ", ".join(f"a.{c}" if c in columns else "NULL" for c in SUMMARY_COLUMNS)
+
+        cur = conn.cursor()
+        cur.execute(f"""
+            SELECT f.track_id, f.embedding, f.dim, {summary}
+            FROM fused_embeddings f
+            JOIN audio_features a ON a.track_id = f.track_id
+            WHERE a.mfcc IS NOT NULL AND a.chroma IS NOT NULL
+            ORDER BY f.track_id
+        """)
+        rows = cur.fetchall()
+        if not rows:
+            return self._empty()
+
+        ids = np.array([r[0] for r in rows], dtype=np.int64)
+        emb = np.array(
+            [decode_embedding(r[1], r[2]) for r in rows], dtype=np.float32
+        ).reshape(len(rows), -1)
+
+        vectors = [summary_vectors(conn, r[0], r[3:]) for r in rows]
+        mfcc = np.array([v[0] for v in vectors], dtype=np.float32)
+        chroma = np.array([v[1] for v in vectors], dtype=np.float32)
+
+        emb_norms = np.linalg.norm(emb, axis=1)
+        return (
+            ids,
+            emb,
+            emb_norms,
+            np.einsum("ij,ij->i", emb, emb),   # squared norms for Euclidean
+            (mfcc, np.linalg.norm(mfcc, axis=1)),
+            (chroma, np.linalg.norm(chroma, axis=1))
+        )
+
+    def _empty(self):
+        return (np.empty(0, dtype=np.int64),)
+
+    def score(self, emb, mfcc, chroma, weights=None):
+        """
+        Per-component similarities + hybrid score for every track; mfcc
+        and chroma are the query's summary vectors. Returns (track_ids,
+        dict of component arrays).
+        """
+        self.refresh()
+        arrays = self._arrays
+        if arrays[0].size == 0:
+            return arrays[0], {}
+
+        w = {**DEFAULT_WEIGHTS, **(weights or {})}
+        ids, db_emb, db_norms, db_sq, mfcc_db, chroma_db = arrays
+
+        q = np.asarray(emb, dtype=np.float32).ravel()
+        dots = db_emb @ q
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cos_emb = dots / (np.linalg.norm(q) * db_norms)
+        cos_emb = np.nan_to_num(cos_emb, nan=0.0, posinf=0.0, neginf=0.0)
+
+        # ||a - b||^2 = |a|^2 + |b|^2 - 2 a.b
+        dist = np.sqrt(np.maximum(float(q @ q) + db_sq - 2 * dots, 0.0))
+        euc_emb = 1 / (1 + dist)
+
+        mfcc_sim = cosine_batch(mfcc, *mfcc_db)
+        chroma_sim = cosine_batch(chroma, *chroma_db)
+
+        overall = (
+            w["cos"] * cos_emb +
+            w["euc"] * euc_emb +
+            w["mfcc"] * mfcc_sim +
+            w["chroma"] * chroma_sim
+        )
+
+        return ids, {
+            "embedding_cosine": cos_emb,
+            "embedding_euclidean": euc_emb,
+            "mfcc_similarity": mfcc_sim,
+            "chroma_similarity": chroma_sim,
+            "overall_score": overall
+        }
+
+    def top_k(self, emb, mfcc, chroma, k=5, weights=None):
+        ids, parts = self.score(emb, mfcc, chroma, weights)
+        if not parts:
+            return []
+
+        return [
+            {
+                "track_id": int(ids[i]),
+                **{name: round(float(values[i]) * 100, 2) for name, values in parts.items()}
+            }
+            for i in top_k_indices(parts["overall_score"], k)
+        ]
@@ -12,3 +12,37 @@ def pitch_similarity(p1, p2):
 
 def hybrid_basic_score(tempo_sim, pitch_sim):
     return (tempo_sim + pitch_sim) / 2
+
+
+# ======================================
+# VECTORIZED VERSIONS (one query vs. whole library)
+# ======================================
+def tempo_similarity_batch(t, db_tempos):
+    diff = np.abs(db_tempos - t)
+    return np.maximum(0.0, 1 - diff / np.maximum(np.maximum(db_tempos, t), 1))
+
+
+def pitch_similarity_batch(p, db_pitches):
+    diff = np.abs(db_pitches - p)
+    return np.maximum(0.0, 1 - diff / np.maximum(np.maximum(db_pitches, p), 1))
+
+
+def top_k_indices(scores, k):
+    """
+    Indices of the k highest scores, best first.
+    Uses a partial selection (O(n)) and only sorts the k winners.
+    """
+    n = scores.shape[0]
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < n:
+        # argpartition finds the k-th best score; which of several tied
+        # at that score it keeps is arbitrary, so take them in DB order
+        kth = scores[np.argpartition(-scores, k - 1)[k - 1]]
+        above = np.flatnonzero(scores > kth)
+        ties = np.flatnonzero(scores == kth)[:k - above.size]
+        idx = np.concatenate((above, ties))
+    else:
+        idx = np.arange(n)
+    # ties keep DB order, like the old stable sort
+    return idx[np.lexsort((idx, -scores[idx]))]
@@ -1,6 +1,5 @@
 # test_similarity.py
 
-import sqlite3
 import numpy as np
 from pathlib import Path
 import librosa
@@ -10,12 +9,10 @@ import librosa
 # -----------------------------
 from backend.ingest.preprocess import preprocess_audio
 from backend.ingest.extract_embeddings import extract_fused_embedding
-from backend.ingest.extract_features import extract_audio_features  # make sure this exists
-
-# -----------------------------
-# Database path
-# -----------------------------
-DB_PATH = Path(__file__).resolve().parent.parent / "database" / "music.db"
+from backend.ingest.extract_features import extract_feature_set
+from backend.ingest.db import DB_PATH, connect
+from backend.ingest.embedding_codec import decode_embedding
+from backend.ingest.summary import SUMMARY_COLUMNS, feature_summary, summary_vector, summary_vectors
 
 # -----------------------------
 # Hybrid score weights
@@ -52,37 +49,45 @@ def compare_song_to_database(test_song_path, db_path=DB_PATH):
     # 2️⃣ Extract fused embeddings
     test_emb = extract_fused_embedding(y, sr)
 
-    # 3️⃣ Extract MFCC / Chroma / Tempo
-    tempo, mfcc, chroma, _, _, _, _ = extract_audio_features(y, sr)
+    # 3️⃣ Extract MFCC / Chroma / Tempo (no CREPE — pitch isn't scored here)
+    feats = extract_feature_set(y, sr, ("tempo", "mfcc", "chroma"))
+    tempo, mfcc, chroma = feats["tempo"], feats["mfcc"], feats["chroma"]
     tempo = float(tempo)  # ⚡ Ensure scalar
 
+    # Coarse MFCC / Chroma vectors: per-coefficient mean ‖ std over frames
+    mfcc_mean, mfcc_std, chroma_mean, chroma_std = feature_summary(mfcc, chroma)
+    test_mfcc = summary_vector(mfcc_mean, mfcc_std)
+    test_chroma = summary_vector(chroma_mean, chroma_std)
+
     # 4️⃣ Connect to DB
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path)
     cur = conn.cursor()
 
     results = []
 
-    # 5️⃣ Fetch all tracks with embeddings & features
-    cur.execute("""
-        SELECT t.id, t.title, f.embedding, a.mfcc, a.chroma, a.tempo
+    # 5️⃣ Fetch all tracks with embeddings & summary features; a DB
+    # without the summary columns falls back to the full arrays
+    columns = {row[1] for row in cur.execute("PRAGMA table_info(audio_features)")}
+    summary = ", ".join(f"a.{c}" if c in columns else "NULL" for c in SUMMARY_COLUMNS)
+    cur.execute(f"""
+        SELECT t.id, t.title, f.embedding, f.dim, {summary}, a.tempo
         FROM tracks t
         JOIN fused_embeddings f ON t.id = f.track_id
         JOIN audio_features a ON t.id = a.track_id
     """)
     rows = cur.fetchall()
 
-    for track_id, title, emb_blob, mfcc_blob, chroma_blob, db_tempo in rows:
-        db_emb = np.frombuffer(emb_blob, dtype=np.float32)
-        db_mfcc = np.frombuffer(mfcc_blob, dtype=np.float32)
-        db_chroma = np.frombuffer(chroma_blob, dtype=np.float32)
+    for track_id, title, emb_blob, dim, *summary, db_tempo in rows:
+        db_emb = decode_embedding(emb_blob, dim)
+        db_mfcc, db_chroma = summary_vectors(conn, track_id, summary)
         db_tempo = float(db_tempo)  # ⚡ Ensure scalar
 
         # 6️⃣ Compute similarities
         embedding_sim = cosine_similarity(test_emb, db_emb)  # 0-1
 
         # ⚡ Use cosine similarity for MFCC & Chroma instead of Euclidean
-        mfcc_sim = cosine_similarity(mfcc.flatten(), db_mfcc.flatten())
-        chroma_sim = cosine_similarity(chroma.flatten(), db_chroma.flatten())
+        mfcc_sim = cosine_similarity(test_mfcc, db_mfcc)
+        chroma_sim = cosine_similarity(test_chroma, db_chroma)
         tempo_sim = 1 / (1 + abs(tempo - db_tempo))  # simple normalization
 
         # 7️⃣ Weighted hybrid score
@@ -2,7 +2,6 @@
 import os
 os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")  # reduce TF info/warning spam
 
-import sqlite3
 import numpy as np
 from pathlib import Path
 import shutil
@@ -12,57 +11,16 @@ import argparse
 from ingest.preprocess import preprocess_audio
 from ingest.extract_features import extract_audio_features
 from ingest.extract_embeddings import extract_openl3_embedding
-
-# ---------- DB auto-detection ----------
-POSSIBLE_DB_PATHS = [
-    Path("../database/music.db"),      # <— correct real DB
-    Path("database/music.db"),         # backend/database/music.db (wrong one)
-    Path("../music.db"),
-    Path("music.db"),
-    Path("../../database/music.db"),
-    Path("../../music.db")
-]
-
-
-def find_db_path():
-    for p in POSSIBLE_DB_PATHS:
-        if p.exists():
-            return str(p)
-    # fallback: search for any file named music.db in project tree (one level)
-    for p in Path(".").rglob("music.db"):
-        return str(p)
-    return None
-
-DB_PATH = find_db_path()
+from ingest.db import DB_PATH, connect
+from ingest.snapshot import read_embeddings
 
 # ---------- Helpers ----------
 def load_all_db_embeddings(db_path):
-    conn = sqlite3.connect(db_path)
-    cur = conn.cursor()
-
-    cur.execute("SELECT track_id, embedding, dim FROM embeddings")
-    rows = cur.fetchall()
+    # one preallocated (n, dim) matrix, no per-row arrays + vstack
+    conn = connect(db_path)
+    ids, mat = read_embeddings(conn, "embeddings")
     conn.close()
-
-    if not rows:
-        return np.array([]), np.empty((0,))
-
-    ids = []
-    vectors = []
-
-    for track_id, blob, dim in rows:
-        vec = np.frombuffer(blob, dtype=np.float32)
-        # safety: if vec length mismatches expected dim, skip
-        if vec.size != dim:
-            print(f"⚠️ Skipping track {track_id}: stored dim={dim}, blob length={vec.size}")
-            continue
-        ids.append(track_id)
-        vectors.append(vec)
-
-    if len(vectors) == 0:
-        return np.array([]), np.empty((0,))
-
-    return np.array(ids), np.vstack(vectors)
+    return ids, mat
 
 
 def cosine_similarity(a, b):
@@ -73,11 +31,9 @@ def cosine_similarity(a, b):
 
 # ---------- Main compare function ----------
 def compare_with_database(user_file_path: str, top_k: int = 10):
-    if DB_PATH is None:
-        print("❌ Could not find music.db. Searched these locations:")
-        for p in POSSIBLE_DB_PATHS:
-            print("   -", p)
-        print("\nPlace your music.db at one of those paths (or pass an explicit path).")
+    if not DB_PATH.exists():
+        print("❌ Could not find music.db at:", DB_PATH)
+        print("\nRun database/init_db.py and ingest first (or set MUSIC_DB_PATH).")
         return
 
     print("ℹ️ Using DB at:", DB_PATH)
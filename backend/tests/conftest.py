@@ -0,0 +1,24 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# modules import each other as ingest.*, similarity.*, api.* (cwd backend/)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from ingest.db import connect
+from ingest.manifest import ensure_schema
+from database.init_db import schema
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """
+    A fresh database with the current schema (never the real music.db).
+    """
+    path = tmp_path / "music.db"
+    conn = connect(path)
+    conn.executescript(schema)
+    ensure_schema(conn)
+    conn.close()
+    return path
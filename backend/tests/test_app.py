@@ -0,0 +1,108 @@
+import os
+import sys
+import asyncio
+import subprocess
+from pathlib import Path
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+from api.query_cache import QueryCache
+from similarity.feature_store import FeatureStore
+from similarity.hybrid import HybridStore
+
+
+@pytest.fixture
+def client():
+    # no lifespan: nothing is loaded or warmed up
+    return TestClient(app_module.app)
+
+
+@pytest.mark.parametrize("state, status", [
+    ("pending", 503), ("warming", 503), ("failed", 503), ("ready", 200), ("lazy", 200),
+])
+def test_ready_reports_warm_up(client, monkeypatch, state, status):
+    monkeypatch.setitem(app_module.WARMUP, "state", state)
+    r = client.get("/ready")
+    assert r.status_code == status
+    assert r.json()["state"] == state and r.json()["ready"] == (status == 200)
+
+
+def test_ready_without_warm_up():
+    # WARMUP_ON_START is read at import, so check a fresh interpreter
+    backend = Path(app_module.__file__).parent
+    code = "import app; print(app.WARMUP['state'])"
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=backend, capture_output=True, text=True, check=True,
+        env={**os.environ, "WARMUP_ON_START": "0"}
+    )
+    assert out.stdout.split()[-1] == "lazy"
+
+
+class FakePool:
+    """
+    Runs nothing: records which extraction was asked for.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    async def run(self, fn, *args):
+        self.calls.append(fn.__name__)
+        if fn.__name__ == "analyze_waveform":
+            return 120.0, 220.0
+        if fn.__name__ == "embed_file":
+            return np.ones(8, dtype=np.float32)
+        return {"embedding": np.ones(8, dtype=np.float32),
+                "mfcc": np.ones(40, dtype=np.float32), "chroma": np.ones(24, dtype=np.float32)}
+
+
+class FakeIndex:
+    available = True
+
+    def __init__(self):
+        self.queries = []
+
+    def search(self, q, k):
+        self.queries.append(q)
+        return [(1, 0.5)]
+
+
+@pytest.fixture
+def analysis(db_path, monkeypatch):
+    pool, index = FakePool(), FakeIndex()
+
+    async def decode_upload(audio_bytes, **kwargs):
+        return np.full(1000, len(audio_bytes) / 100, dtype=np.float32), 22050
+
+    monkeypatch.setattr(app_module, "decode_upload", decode_upload)
+    monkeypatch.setattr(app_module, "EXTRACTION_POOL", pool)
+    monkeypatch.setattr(app_module, "EMBEDDING_INDEX", index)
+    monkeypatch.setattr(app_module, "QUERY_CACHE", QueryCache())
+    monkeypatch.setattr(app_module, "FEATURE_STORE", FeatureStore(db_path))
+    monkeypatch.setattr(app_module, "HYBRID_STORE", HybridStore(db_path))
+    yield pool, index
+    app_module.FEATURE_STORE.close()
+    app_module.HYBRID_STORE.close()
+
+
+def test_hybrid_and_embedding_search_share_one_embedding(analysis):
+    pool, index = analysis
+    out = asyncio.run(app_module.run_analysis(b"clip", use_embeddings=True, scoring="hybrid"))
+    assert pool.calls == ["analyze_waveform", "hybrid_file"]
+    assert len(index.queries) == 1
+    assert out["embedding_matches"] == [{"track_id": 1, "embedding_similarity": 50.0}]
+    assert out["hybrid_matches"] == []
+
+    # the repeat is served from the query cache
+    asyncio.run(app_module.run_analysis(b"clip", use_embeddings=True, scoring="hybrid"))
+    assert pool.calls == ["analyze_waveform", "hybrid_file"]
+
+
+def test_embedding_search_alone(analysis):
+    pool, index = analysis
+    asyncio.run(app_module.run_analysis(b"other clip", use_embeddings=True))
+    assert pool.calls == ["analyze_waveform", "embed_file"]
+    assert len(index.queries) == 1
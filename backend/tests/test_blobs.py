@@ -0,0 +1,142 @@
+import zlib
+import struct
+
+import numpy as np
+import pytest
+
+from ingest import blobs
+from ingest.blobs import pack_array, unpack_array, is_packed, read_header, upgrade_feature_blobs
+from ingest.db import connect
+
+
+@pytest.mark.parametrize("dtype", ["<f4", "<f2", "i1", "<f8", "<i4", "<i8"])
+@pytest.mark.parametrize("shape", [(0,), (7,), (20, 13), (2, 3, 4)])
+def test_round_trip(dtype, shape):
+    a = (np.arange(int(np.prod(shape))) % 100).astype(dtype).reshape(shape)
+    out = unpack_array(pack_array(a))
+    assert out.dtype == np.dtype(dtype)
+    assert out.shape == shape
+    assert np.array_equal(out, a)
+
+
+def test_header_layout_is_stable():
+    # persistent format: pin the exact bytes of a small array
+    blob = pack_array(np.array([[1.0, 2.0]], dtype=np.float32))
+    assert blob[:8] == b"\x93ARR" + bytes([1, 1, 0, 2])
+    assert struct.unpack_from("<2I", blob, 8) == (1, 2)
+    assert len(blob) == 16 + 8
+    assert blob[16:] == np.array([1.0, 2.0], dtype="<f4").tobytes()
+
+
+def test_data_is_aligned_and_zero_copy():
+    a = np.random.rand(20, 33).astype(np.float32)
+    for ndim_shape in [(660,), (20, 33), (2, 10, 33)]:
+        blob = pack_array(a.reshape(ndim_shape))
+        _, _, _, offset = read_header(blob)
+        assert offset % 8 == 0
+
+        out = unpack_array(blob)
+        assert not out.flags.writeable
+        assert not out.flags.owndata   # a view onto the blob
+
+
+def test_dtype_argument_casts_only_when_needed():
+    blob = pack_array(np.ones((2, 3), dtype=np.float16))
+    assert unpack_array(blob).dtype == np.float16
+    assert unpack_array(blob, dtype=np.float32).dtype == np.float32
+
+    same = unpack_array(pack_array(np.ones(4, dtype=np.float32)), dtype=np.float32)
+    assert not same.flags.owndata
+
+
+def test_pack_casts_and_normalises_byte_order():
+    a = np.arange(6, dtype=">f4").reshape(2, 3)
+    out = unpack_array(pack_array(a))
+    assert out.dtype == np.dtype("<f4")
+    assert np.array_equal(out, a)
+
+    f16 = unpack_array(pack_array(np.linspace(0, 1, 10), dtype="float16"))
+    assert f16.dtype == np.float16
+    assert np.allclose(f16, np.linspace(0, 1, 10), atol=1e-3)
+
+
+def test_compressed_round_trip():
+    a = np.zeros((20, 500), dtype=np.float32)
+    blob = pack_array(a, compress=True)
+    assert len(blob) < a.nbytes
+    _, shape, flags, offset = read_header(blob)
+    assert flags & blobs.FLAG_ZLIB and shape == (20, 500)
+    assert zlib.decompress(blob[offset:]) == a.tobytes()
+    assert np.array_equal(unpack_array(blob), a)
+
+
+def test_legacy_blobs():
+    a = np.random.rand(20, 9).astype(np.float32)
+    legacy = a.tobytes()
+    assert not is_packed(legacy)
+    assert np.array_equal(unpack_array(legacy), a.ravel())
+    assert np.array_equal(unpack_array(legacy, blobs.MFCC_ROWS), a)
+    assert unpack_array(None) is None
+
+    with pytest.raises(ValueError):
+        unpack_array(np.zeros(21, dtype=np.float32).tobytes(), blobs.MFCC_ROWS)
+
+
+def test_rejects_unknown_versions_and_dtypes():
+    blob = bytearray(pack_array(np.ones(3, dtype=np.float32)))
+    blob[4] = 2
+    with pytest.raises(ValueError):
+        unpack_array(bytes(blob))
+    with pytest.raises(ValueError):
+        pack_array(np.ones(3, dtype=np.complex64))
+
+
+def test_upgrade_feature_blobs(db_path):
+    mfcc = np.random.rand(20, 40).astype(np.float32)
+    chroma = np.random.rand(12, 40).astype(np.float32)
+    pitch = np.linspace(0, 1, 5, dtype=np.float32)
+
+    conn = connect(db_path)
+    conn.execute("INSERT INTO tracks (id, title, file_path, dataset) VALUES (1, 'a', 'a', 'x')")
+    conn.execute("""
+        INSERT INTO audio_features (track_id, tempo, mfcc, chroma, pitch_times, pitch_freqs, pitch_conf)
+        VALUES (1, 120, ?, ?, ?, NULL, ?)
+    """, (mfcc.tobytes(), chroma.tobytes(), pitch.tobytes(), pack_array(pitch)))
+    conn.commit()
+
+    assert upgrade_feature_blobs(db_path) == 1
+    assert upgrade_feature_blobs(db_path) == 0
+
+    row = conn.execute(
+        "SELECT mfcc, chroma, pitch_times, pitch_freqs, pitch_conf FROM audio_features"
+    ).fetchone()
+    assert all(is_packed(b) for b in row if b is not None)
+    assert row[3] is None
+    assert np.array_equal(unpack_array(row[0]), mfcc)
+    assert np.array_equal(unpack_array(row[1]), chroma)
+    assert np.array_equal(unpack_array(row[2]), pitch)
+    conn.close()
+
+
+def test_upgrade_feature_blobs_in_batches(db_path):
+    mfcc = np.random.rand(20, 8).astype(np.float32)
+    chroma = np.random.rand(12, 8).astype(np.float32)
+    conn = connect(db_path)
+    conn.executemany(
+        "INSERT INTO audio_features (track_id, tempo, mfcc, chroma) VALUES (?, 120, ?, ?)",
+        [(i, (mfcc + i).tobytes(), (chroma + i).tobytes()) for i in range(1, 11)]
+    )
+    # one row already packed
+    conn.execute("UPDATE audio_features SET mfcc = ?, chroma = ? WHERE track_id = 4",
+                 (pack_array(mfcc + 4), pack_array(chroma + 4)))
+    conn.commit()
+
+    assert upgrade_feature_blobs(db_path, batch=3) == 9
+    assert upgrade_feature_blobs(db_path, batch=3) == 0
+
+    rows = conn.execute("SELECT track_id, mfcc, chroma FROM audio_features ORDER BY track_id").fetchall()
+    assert [r[0] for r in rows] == list(range(1, 11))
+    for track_id, m, c in rows:
+        assert np.array_equal(unpack_array(m), mfcc + track_id)
+        assert np.array_equal(unpack_array(c), chroma + track_id)
+    conn.close()
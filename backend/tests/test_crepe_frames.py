@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from ingest.extract_crepe_only import crepe_frames, FRAME_LENGTH, TARGET_SR, STEP_SIZE
+
+
+def reference_frames(y, step_size):
+    # crepe.core.get_activation(center=True), one frame at a time
+    y = np.pad(y, FRAME_LENGTH // 2, mode="constant")
+    hop = int(TARGET_SR * step_size / 1000)
+    frames = []
+    for start in range(0, len(y) - FRAME_LENGTH + 1, hop):
+        f = y[start:start + FRAME_LENGTH].astype(np.float64)
+        f = f - f.mean()
+        frames.append(f / max(f.std(), 1e-8))
+    return np.array(frames)
+
+
+@pytest.fixture
+def audio():
+    t = np.arange(int(TARGET_SR * 0.75)) / TARGET_SR
+    noise = np.random.default_rng(0).standard_normal(t.size)
+    return (0.5 * np.sin(2 * np.pi * 220 * t) + 0.01 * noise).astype(np.float32)
+
+
+@pytest.mark.parametrize("step_size", [5, 10, 17])
+def test_matches_frame_by_frame_reference(audio, step_size):
+    frames = crepe_frames(audio, step_size)
+    expected = reference_frames(audio, step_size)
+    assert frames.dtype == np.float32
+    assert frames.shape == expected.shape == (1 + len(audio) // int(TARGET_SR * step_size / 1000), FRAME_LENGTH)
+    assert np.allclose(frames, expected, atol=1e-4)
+
+
+def test_silence_is_not_divided_by_zero():
+    frames = crepe_frames(np.zeros(TARGET_SR // 10, dtype=np.float32))
+    assert np.isfinite(frames).all() and not frames.any()
+
+
+def test_matches_crepe_get_activation(audio, monkeypatch):
+    crepe = pytest.importorskip("crepe")
+
+    class Echo:
+        # stands in for the network: returns the frames it is fed
+        def predict(self, frames, verbose=0, **kwargs):
+            return frames
+
+    monkeypatch.setattr(crepe.core, "build_and_load_model", lambda capacity: Echo())
+    expected = crepe.get_activation(audio, TARGET_SR, center=True, step_size=STEP_SIZE, verbose=0)
+    assert np.allclose(crepe_frames(audio), expected, atol=1e-5)
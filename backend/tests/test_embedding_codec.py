@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from ingest.db import connect
+from ingest.embedding_codec import (
+    EMBEDDING_ENCODINGS,
+    quantize_int8,
+    encode_embedding,
+    embedding_encoding,
+    decode_embedding,
+    recode_embeddings,
+)
+
+DIM = 1536
+
+
+@pytest.fixture
+def vector():
+    return np.random.default_rng(0).standard_normal(DIM).astype(np.float32)
+
+
+def test_sizes_identify_the_encoding(vector):
+    sizes = {"float32": DIM * 4, "float16": DIM * 2, "int8": DIM + 4}
+    for encoding in EMBEDDING_ENCODINGS:
+        blob = encode_embedding(vector, encoding)
+        assert len(blob) == sizes[encoding]
+        assert embedding_encoding(blob, DIM) == encoding
+
+
+def test_size_mismatch_raises(vector):
+    with pytest.raises(ValueError):
+        embedding_encoding(encode_embedding(vector), DIM - 1)
+    with pytest.raises(ValueError):
+        decode_embedding(b"\0" * 7, DIM)
+    with pytest.raises(ValueError):
+        encode_embedding(vector, "bfloat16")
+
+
+def test_float32_is_exact_and_zero_copy(vector):
+    out = decode_embedding(encode_embedding(vector, "float32"), DIM)
+    assert out.dtype == np.float32
+    assert np.array_equal(out, vector)
+    assert not out.flags.owndata
+
+
+def test_lossy_encodings_stay_close(vector):
+    f16 = decode_embedding(encode_embedding(vector, "float16"), DIM)
+    assert np.allclose(f16, vector, rtol=1e-3, atol=1e-3)
+
+    i8 = decode_embedding(encode_embedding(vector, "int8"), DIM)
+    assert i8.dtype == np.float32
+    # symmetric quantization: error at most half a step of peak / 127
+    assert np.abs(i8 - vector).max() <= np.abs(vector).max() / 127 / 2 + 1e-6
+
+
+def test_int8_layout(vector):
+    blob = encode_embedding(vector, "int8")
+    scale = np.frombuffer(blob[:4], dtype="<f4")[0]
+    codes = np.frombuffer(blob[4:], dtype=np.int8)
+    assert scale == pytest.approx(np.abs(vector).max() / 127)
+    assert np.abs(codes).max() == 127
+
+
+def test_quantize_int8_rows_and_zero_vectors():
+    x = np.array([[0.0, 0.0, 0.0], [1.0, -2.0, 0.5]], dtype=np.float32)
+    codes, scales = quantize_int8(x)
+    assert codes.dtype == np.int8 and scales.shape == (2, 1)
+    assert np.array_equal(codes[0], [0, 0, 0]) and scales[0, 0] == 1.0
+    assert np.allclose(codes[1] * scales[1], x[1], atol=2 / 127)
+
+
+def test_recode_embeddings(db_path):
+    rng = np.random.default_rng(1)
+    vectors = rng.standard_normal((10, 16)).astype(np.float32)
+    conn = connect(db_path)
+    conn.executemany(
+        "INSERT INTO fused_embeddings (track_id, embedding, dim) VALUES (?, ?, 16)",
+        [(i + 1, encode_embedding(v)) for i, v in enumerate(vectors)]
+    )
+    conn.commit()
+
+    assert recode_embeddings(db_path, "float16", batch=3) == 10
+    assert recode_embeddings(db_path, "float16", batch=3) == 0
+
+    rows = conn.execute("SELECT embedding, dim FROM fused_embeddings ORDER BY track_id").fetchall()
+    assert {embedding_encoding(b, d) for b, d in rows} == {"float16"}
+    assert np.allclose([decode_embedding(b, d) for b, d in rows], vectors, atol=1e-2)
+    conn.close()
@@ -0,0 +1,148 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+sf = pytest.importorskip("soundfile")
+
+from ingest import engine, db
+from ingest.db import connect, close_pool
+from ingest.engine import DatasetPlugin, run_ingest
+from ingest.writer import TrackWriter
+
+
+class Plugin(DatasetPlugin):
+    name = "test"
+
+
+class InlineExecutor(ThreadPoolExecutor):
+    # stands in for the worker processes (spawned children wouldn't see the stub)
+    def __init__(self, max_workers, mp_context=None, initializer=None, initargs=()):
+        super().__init__(max_workers)
+
+
+class Extractor:
+    """extract_clips stub: cheap fake features."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, clips):
+        self.calls += 1
+        results = []
+        for y, duration, sr in clips:
+            rng = np.random.default_rng(int(np.abs(y).sum() * 1000))
+            results.append((duration, {
+                "tempo": 100.0,
+                "mfcc": rng.random((20, 4), dtype=np.float32),
+                "chroma": rng.random((12, 4), dtype=np.float32),
+                "pitch_median": 0.0,
+                "embedding": rng.random(8, dtype=np.float32),
+            }))
+        return results, []
+
+
+@pytest.fixture
+def library(tmp_path):
+    """
+    root/a/{0..5}.wav distinct tones, root/b/copy.wav = a/0.wav's bytes,
+    root/b/broken.wav not audio.
+    """
+    a, b = tmp_path / "root" / "a", tmp_path / "root" / "b"
+    a.mkdir(parents=True)
+    b.mkdir()
+    t = np.arange(8000) / 8000
+    for i in range(6):
+        sf.write(a / f"{i}.wav", (0.3 * np.sin(2 * np.pi * (200 + 50 * i) * t)).astype(np.float32), 8000)
+    (b / "copy.wav").write_bytes((a / "0.wav").read_bytes())
+    (b / "broken.wav").write_bytes(b"RIFF not really a wav")
+    return tmp_path / "root"
+
+
+@pytest.fixture
+def ingest(db_path, monkeypatch):
+    snapshots = []
+    monkeypatch.setattr(engine, "ProcessPoolExecutor", InlineExecutor)
+    monkeypatch.setattr(engine, "refresh_snapshots", snapshots.append)
+
+    def run(root, max_songs, extractor=None, **kwargs):
+        monkeypatch.setattr(engine, "extract_clips", extractor or Extractor())
+        return run_ingest(Plugin(), root, max_songs, workers=2, db_path=db_path, preload=(),
+                          batch=2, decode_threads=2, **kwargs)
+
+    yield run, snapshots
+    close_pool()
+
+
+def state(db_path):
+    conn = connect(db_path)
+    manifest = dict(conn.execute("SELECT file_path, status FROM ingest_manifest").fetchall())
+    tracks = [r[0] for r in conn.execute("SELECT file_path FROM tracks ORDER BY file_path")]
+    conn.close()
+    return {str(p).split("root/")[-1]: s for p, s in manifest.items()}, [p.split("root/")[-1] for p in tracks]
+
+
+def test_max_songs_caps_a_run(db_path, library, ingest):
+    run, snapshots = ingest
+    assert run(library, 3) == 3
+
+    manifest, tracks = state(db_path)
+    assert tracks == ["a/0.wav", "a/1.wav", "a/2.wav"]
+    assert manifest == {"a/0.wav": "done", "a/1.wav": "done", "a/2.wav": "done"}
+    assert snapshots == [db_path]
+    # nothing left open on the database once the run returns
+    assert not [key for key in db._pool if key[1] == str(db_path)]
+
+
+def test_statuses_and_resume(db_path, library, ingest):
+    run, _ = ingest
+    assert run(library, 100) == 6
+
+    manifest, tracks = state(db_path)
+    assert tracks == [f"a/{i}.wav" for i in range(6)]
+    assert manifest["b/broken.wav"] == "failed"
+    assert all(manifest[f"a/{i}.wav"] == "done" for i in range(6))
+    # same bytes as a/0.wav, seen while a/0.wav was in flight: skipped
+    # this run, recorded as a duplicate by the next
+    assert manifest["b/copy.wav"] == "pending"
+
+    extractor = Extractor()
+    assert run(library, 100, extractor) == 0 and extractor.calls == 0
+    manifest, tracks = state(db_path)
+    assert manifest["b/copy.wav"] == "duplicate" and len(tracks) == 6
+
+    # failed files only come back on request
+    assert run(library, 100, retry_failed=True) == 0
+    assert state(db_path)[0]["b/broken.wav"] == "failed"
+
+
+class InterruptedWriter(TrackWriter):
+    # Ctrl-C in the main loop while handing over the third track
+    def put(self, *args, **kwargs):
+        if self.puts == 2:
+            raise KeyboardInterrupt
+        self.puts += 1
+        return super().put(*args, **kwargs)
+
+    puts = 0
+
+
+def test_resume_after_interrupted_run(db_path, library, ingest, monkeypatch):
+    run, snapshots = ingest
+    with monkeypatch.context() as m:
+        m.setattr(engine, "TrackWriter", InterruptedWriter)
+        with pytest.raises(KeyboardInterrupt):
+            run(library, 100)
+
+    # what was handed over is committed; the rest waits
+    manifest, first = state(db_path)
+    assert first == ["a/0.wav", "a/1.wav"]
+    assert all(manifest[t] == "done" for t in first)
+    assert "pending" in manifest.values()
+    assert snapshots == []
+
+    assert run(library, 100) == 6 - len(first)
+    manifest, tracks = state(db_path)
+    assert tracks == [f"a/{i}.wav" for i in range(6)]
+    assert manifest["b/copy.wav"] == "duplicate" and manifest["b/broken.wav"] == "failed"
+    assert "pending" not in manifest.values()
@@ -0,0 +1,105 @@
+from functools import partial
+
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+
+from ingest.db import connect, close_pool
+from ingest.embedding_codec import encode_embedding
+from ingest.snapshot import load_snapshot, refresh_snapshot
+from search import search_similar
+from search.build_index import INDEX_KINDS, COMPRESSED_KINDS, FUSED_DIM, build_index, make_index
+from search.search_similar import EmbeddingIndex
+
+N = 300
+
+
+@pytest.fixture
+def library(db_path, tmp_path, monkeypatch):
+    """
+    N random fused embeddings (track ids 1001..), snapshots read from tmp_path.
+    """
+    vectors = np.random.default_rng(0).standard_normal((N, FUSED_DIM)).astype(np.float32)
+    ids = np.arange(1001, 1001 + N)
+    conn = connect(db_path)
+    conn.executemany(
+        "INSERT INTO fused_embeddings (track_id, embedding, dim) VALUES (?, ?, ?)",
+        [(int(t), encode_embedding(v), FUSED_DIM) for t, v in zip(ids, vectors)]
+    )
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(search_similar, "load_snapshot", partial(load_snapshot, snapshot_dir=tmp_path / "snap"))
+    yield db_path, ids, vectors
+    close_pool()
+
+
+def build(kind, db_path, tmp_path):
+    build_index(kind, db_path, tmp_path / f"{kind}.faiss")
+    return EmbeddingIndex(kind, db_path)
+
+
+@pytest.mark.parametrize("kind", INDEX_KINDS)
+def test_query_vector_comes_back_first(library, tmp_path, kind):
+    db_path, ids, vectors = library
+    index = build(kind, db_path, tmp_path)
+    assert index.available
+    assert (index.rerank > 0) == (kind in COMPRESSED_KINDS)
+
+    for row in (0, 57, 299):
+        results = index.search(vectors[row], k=5)
+        assert len(results) == 5
+        assert results[0][0] == ids[row]
+        scores = [s for _, s in results]
+        assert scores == sorted(scores, reverse=True)
+        # exact (or reranked) cosine of the vector with itself
+        assert scores[0] == pytest.approx(1.0, abs=1e-2)
+
+
+@pytest.mark.parametrize("kind", COMPRESSED_KINDS)
+def test_compressed_kinds_rerank_on_exact_vectors(library, tmp_path, kind, monkeypatch):
+    db_path, ids, vectors = library
+    index = build(kind, db_path, tmp_path)
+
+    exact_lookups = []
+    exact_vectors = index._exact_vectors
+    monkeypatch.setattr(index, "_exact_vectors", lambda t: exact_lookups.append(t) or exact_vectors(t))
+
+    q = vectors[10] + 0.1 * np.random.default_rng(1).standard_normal(FUSED_DIM).astype(np.float32)
+    results = index.search(q, k=3)
+    assert len(exact_lookups) == 1 and len(exact_lookups[0]) == 3 * index.rerank
+
+    # reranked scores are exact cosines
+    qn = q / np.linalg.norm(q)
+    for track_id, score in results:
+        v = vectors[track_id - 1001]
+        assert score == pytest.approx(float(v @ qn / np.linalg.norm(v)), abs=1e-5)
+    assert results[0][0] == ids[10]
+
+
+def test_rerank_reads_the_snapshot(library, tmp_path):
+    db_path, ids, vectors = library
+    refresh_snapshot(db_path, snapshot_dir=tmp_path / "snap")
+    index = build("sq8", db_path, tmp_path)
+
+    exact = index._exact_vectors([1001, 1100])
+    assert np.array_equal(exact[1001], vectors[0]) and np.array_equal(exact[1100], vectors[99])
+    assert index.search(vectors[99], k=1)[0][0] == 1100
+
+
+def test_no_index_and_rebuilds(library, tmp_path):
+    db_path, ids, vectors = library
+    index = EmbeddingIndex("hnsw", db_path)
+    assert not index.available and index.search(vectors[0]) == []
+
+    index = build("flat", db_path, tmp_path)
+    assert index.search(vectors[0], k=1)[0][0] == 1001
+    # meta points at the latest build of a kind
+    build_index("flat", db_path, tmp_path / "flat2.faiss")
+    assert EmbeddingIndex("flat", db_path).search(vectors[1], k=1)[0][0] == 1002
+
+
+def test_make_index_rejects_unknown_kinds():
+    with pytest.raises(ValueError):
+        make_index("lsh", 10)
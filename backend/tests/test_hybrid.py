@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+
+from ingest.db import connect
+from ingest.blobs import pack_feature
+from ingest.embedding_codec import encode_embedding
+from ingest.summary import feature_summary, summary_blobs, summary_vector
+from similarity.hybrid import HybridStore, DEFAULT_WEIGHTS
+
+DIM = 32
+
+
+def cosine(a, b):
+    return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+def reference_score(q, row, w):
+    # the per-track hybrid score, one row at a time
+    cos = cosine(q["embedding"], row["embedding"])
+    euc = 1 / (1 + float(np.linalg.norm(q["embedding"] - row["embedding"])))
+    mfcc = cosine(q["mfcc"], row["mfcc"])
+    chroma = cosine(q["chroma"], row["chroma"])
+    return {
+        "embedding_cosine": cos,
+        "embedding_euclidean": euc,
+        "mfcc_similarity": mfcc,
+        "chroma_similarity": chroma,
+        "overall_score": w["cos"] * cos + w["euc"] * euc + w["mfcc"] * mfcc + w["chroma"] * chroma,
+    }
+
+
+def summaries(mfcc, chroma):
+    mfcc_mean, mfcc_std, chroma_mean, chroma_std = feature_summary(mfcc, chroma)
+    return summary_vector(mfcc_mean, mfcc_std), summary_vector(chroma_mean, chroma_std)
+
+
+@pytest.fixture
+def library(db_path):
+    """
+    12 tracks; every third one stored before the summary columns existed.
+    """
+    rng = np.random.default_rng(0)
+    rows = {}
+    conn = connect(db_path)
+    for track_id in range(1, 13):
+        mfcc = rng.standard_normal((20, 50)).astype(np.float32)
+        chroma = rng.random((12, 50), dtype=np.float32)
+        emb = rng.standard_normal(DIM).astype(np.float32)
+        stored = summary_blobs(mfcc, chroma) if track_id % 3 else (None,) * 4
+
+        conn.execute("INSERT INTO tracks (id, title, file_path, dataset) VALUES (?, 't', ?, 'x')",
+                     (track_id, f"{track_id}.wav"))
+        conn.execute("""
+            INSERT INTO audio_features
+                (track_id, tempo, mfcc, chroma, mfcc_mean, mfcc_std, chroma_mean, chroma_std)
+            VALUES (?, 120, ?, ?, ?, ?, ?, ?)
+        """, (track_id, pack_feature(mfcc), pack_feature(chroma), *stored))
+        conn.execute("INSERT INTO fused_embeddings (track_id, embedding, dim) VALUES (?, ?, ?)",
+                     (track_id, encode_embedding(emb), DIM))
+
+        m, c = summaries(mfcc, chroma)
+        rows[track_id] = {"embedding": emb, "mfcc": m, "chroma": c}
+    conn.commit()
+    conn.close()
+
+    store = HybridStore(db_path)
+    yield store, rows
+    store.close()
+
+
+@pytest.fixture
+def query(library):
+    _, rows = library
+    rng = np.random.default_rng(1)
+    # close to track 7, so there is a clear winner
+    return {k: v + 0.05 * rng.standard_normal(v.shape).astype(np.float32) for k, v in rows[7].items()}
+
+
+@pytest.mark.parametrize("weights", [None, {"cos": 0.1, "euc": 0.6, "mfcc": 0.0, "chroma": 0.3}])
+def test_scores_match_per_row_reference(library, query, weights):
+    store, rows = library
+    ids, parts = store.score(query["embedding"], query["mfcc"], query["chroma"], weights)
+    assert ids.tolist() == sorted(rows)
+
+    w = {**DEFAULT_WEIGHTS, **(weights or {})}
+    for i, track_id in enumerate(ids):
+        expected = reference_score(query, rows[int(track_id)], w)
+        for name, value in expected.items():
+            assert parts[name][i] == pytest.approx(value, rel=1e-5, abs=1e-6), (track_id, name)
+
+
+def test_top_k(library, query):
+    store, rows = library
+    w = DEFAULT_WEIGHTS
+    expected = sorted(rows, key=lambda t: -reference_score(query, rows[t], w)["overall_score"])[:3]
+
+    top = store.top_k(query["embedding"], query["mfcc"], query["chroma"], k=3)
+    assert [m["track_id"] for m in top] == expected
+    assert top[0]["track_id"] == 7
+    assert top[0]["overall_score"] == round(reference_score(query, rows[7], w)["overall_score"] * 100, 2)
+
+
+def test_empty_library(db_path):
+    store = HybridStore(db_path)
+    assert store.top_k(np.ones(DIM), np.ones(40), np.ones(24)) == []
+    store.close()
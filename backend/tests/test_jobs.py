@@ -0,0 +1,156 @@
+import time
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+from api.jobs import JobManager, QueueFull
+
+
+class Handler:
+    """
+    Stands in for run_analysis: holds every job until release().
+    """
+
+    def __init__(self, hold=True):
+        self.hold = hold
+        self.gate = None
+
+    async def __call__(self, audio_bytes, *args):
+        if self.hold:
+            self.gate = self.gate or asyncio.Event()
+            await self.gate.wait()
+        return {"bytes": len(audio_bytes)}
+
+    async def release(self):
+        self.gate = self.gate or asyncio.Event()
+        self.gate.set()
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    """
+    serve(manager) -> TestClient on one event loop (so the job workers
+    live across requests), without the app's startup.
+    """
+    @asynccontextmanager
+    async def no_lifespan(app):
+        yield
+
+    monkeypatch.setattr(app_module.app.router, "lifespan_context", no_lifespan)
+    clients = []
+
+    def serve(manager):
+        monkeypatch.setattr(app_module, "JOBS", manager)
+        client = TestClient(app_module.app).__enter__()
+        clients.append((client, manager))
+        return client
+
+    yield serve
+    for client, manager in clients:
+        client.portal.call(manager.stop)
+        client.__exit__(None, None, None)
+
+
+def submit(client, data=b"x" * 100):
+    return client.post("/jobs", files={"file": ("a.wav", data)})
+
+
+def wait_for(client, job_id, status):
+    for _ in range(200):
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] == status:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} never reached {status}: {job}")
+
+
+def test_job_runs_and_returns_its_result(serve):
+    handler = Handler()
+    client = serve(JobManager(handler, workers=1))
+    r = submit(client)
+    assert r.status_code == 202 and r.json()["status"] == "queued"
+
+    job_id = r.json()["job_id"]
+    wait_for(client, job_id, "running")
+    client.portal.call(handler.release)
+    assert wait_for(client, job_id, "done")["result"] == {"bytes": 100}
+
+
+def test_full_queue_is_429(serve):
+    handler = Handler()
+    client = serve(JobManager(handler, workers=1, max_queue=1))
+
+    running = submit(client).json()["job_id"]
+    wait_for(client, running, "running")
+    queued = submit(client)
+    assert queued.status_code == 202
+
+    r = submit(client)
+    assert r.status_code == 429 and "1 waiting" in r.json()["detail"]
+
+    # room again once the backlog drains
+    client.portal.call(handler.release)
+    wait_for(client, queued.json()["job_id"], "done")
+    assert submit(client).status_code == 202
+
+
+def test_queued_bytes_are_bounded(serve):
+    handler = Handler()
+    client = serve(JobManager(handler, workers=1, max_queue=10, max_queue_bytes=150))
+
+    wait_for(client, submit(client).json()["job_id"], "running")
+    # the first waiting job is taken whatever its size...
+    assert submit(client, b"x" * 200).status_code == 202
+    # ...later ones only while the waiting uploads fit
+    r = submit(client, b"x" * 10)
+    assert r.status_code == 429 and "MB of uploads waiting" in r.json()["detail"]
+
+
+def test_unknown_job_is_404(serve):
+    client = serve(JobManager(Handler(hold=False)))
+    r = client.get("/jobs/not-a-job")
+    assert r.status_code == 404 and r.json()["detail"] == "Unknown or expired job id"
+
+
+def test_finished_jobs_expire(serve):
+    client = serve(JobManager(Handler(hold=False), ttl=0.05))
+    first = submit(client).json()["job_id"]
+    wait_for(client, first, "done")
+
+    time.sleep(0.1)
+    # expiry is checked on the next submit
+    second = submit(client).json()["job_id"]
+    assert client.get(f"/jobs/{first}").status_code == 404
+    assert client.get(f"/jobs/{second}").status_code == 200
+
+
+def test_failed_job_reports_the_error():
+    async def handler(audio_bytes):
+        raise ValueError("bad clip")
+
+    async def run():
+        manager = JobManager(handler, workers=1)
+        job_id = manager.submit(b"x")
+        await manager._queue.join()
+        await manager.stop()
+        return manager.get(job_id)
+
+    job = asyncio.run(run())
+    assert job["status"] == "failed" and job["error"] == "bad clip" and "result" not in job
+
+
+def test_submit_raises_queue_full():
+    async def run():
+        manager = JobManager(Handler(), workers=1, max_queue=1)
+        try:
+            # the worker hasn't taken the first job yet: the second is one too many
+            manager.submit(b"x")
+            with pytest.raises(QueueFull):
+                manager.submit(b"x")
+        finally:
+            await manager.stop()
+
+    asyncio.run(run())
@@ -0,0 +1,117 @@
+import pytest
+
+from ingest import engine
+from ingest.db import connect, close_pool
+from ingest.engine import DatasetPlugin, new_files, hash_and_decode
+from ingest.manifest import file_hash, find_track, load_manifest, mark
+
+
+class Plugin(DatasetPlugin):
+    name = "test"
+
+
+class RecordingWriter:
+    def __init__(self):
+        self.marks = []
+
+    def mark(self, file_path, dataset, status, **fields):
+        self.marks.append((file_path, status, fields.get("track_id")))
+
+
+@pytest.fixture
+def library(tmp_path):
+    """
+    root/album/{a,b,c,d}.wav with distinct bytes (not real audio;
+    nothing here decodes them).
+    """
+    album = tmp_path / "root" / "album"
+    album.mkdir(parents=True)
+    for name in "abcd":
+        (album / f"{name}.wav").write_bytes(name.encode() * 1000)
+    (album / "notes.txt").write_text("skipped")
+    return tmp_path / "root"
+
+
+@pytest.fixture
+def conn(db_path):
+    conn = connect(db_path)
+    yield conn
+    conn.close()
+    close_pool()
+
+
+def add_track(conn, path, content_hash=None):
+    cur = conn.execute(
+        "INSERT INTO tracks (title, file_path, dataset, content_hash) VALUES ('t', ?, 'test', ?)",
+        (str(path), content_hash)
+    )
+    conn.commit()
+    return cur.lastrowid
+
+
+def test_file_hash_is_content_only(tmp_path):
+    a, b, c = tmp_path / "a.wav", tmp_path / "b.mp3", tmp_path / "c.wav"
+    a.write_bytes(b"x" * 3_000_000)
+    b.write_bytes(b"x" * 3_000_000)
+    c.write_bytes(b"x" * 2_999_999 + b"y")
+    assert file_hash(a) == file_hash(b) != file_hash(c)
+
+
+def test_mark_upserts_and_keeps_the_hash(conn):
+    mark(conn, "a.wav", "test", "pending", content_hash="h1", run_id="r1")
+    mark(conn, "b.wav", "test", "failed", error="boom", run_id="r1")
+    mark(conn, "a.wav", "test", "done", track_id=7, run_id="r2")
+    mark(conn, "c.wav", "other", "done")
+    conn.commit()
+
+    assert load_manifest(conn, "test") == {"a.wav": "done", "b.wav": "failed"}
+    row = conn.execute(
+        "SELECT content_hash, track_id, run_id FROM ingest_manifest WHERE file_path = 'a.wav'"
+    ).fetchone()
+    assert row == ("h1", 7, "r2")
+
+
+def test_find_track(conn):
+    track_id = add_track(conn, "/music/a.wav", "h1")
+    assert find_track(conn, content_hash="h1") == track_id
+    assert find_track(conn, file_path="/music/a.wav") == track_id
+    assert find_track(conn, content_hash="h2") is None
+    assert find_track(conn, file_path="/music/b.wav") is None
+
+
+def test_new_files_resumes(conn, library):
+    album = library / "album"
+    mark(conn, str(album / "a.wav"), "test", "done")
+    mark(conn, str(album / "b.wav"), "test", "duplicate")
+    mark(conn, str(album / "c.wav"), "test", "failed", error="boom")
+    conn.commit()
+    track_id = add_track(conn, album / "d.wav")
+
+    writer = RecordingWriter()
+    assert list(new_files(Plugin(), library, conn, writer, "r")) == []
+    # stored before the manifest existed: recorded, not re-extracted
+    assert writer.marks == [(str(album / "d.wav"), "done", track_id)]
+
+    retried = list(new_files(Plugin(), library, conn, RecordingWriter(), "r", retry_failed=True))
+    assert retried == [album / "c.wav"]
+
+
+def test_new_files_yields_everything_on_a_fresh_db(conn, library):
+    writer = RecordingWriter()
+    files = list(new_files(Plugin(), library, conn, writer, "r"))
+    assert [f.name for f in files] == ["a.wav", "b.wav", "c.wav", "d.wav"]
+    assert writer.marks == []
+
+
+def test_hash_and_decode_skips_stored_content(conn, db_path, library, monkeypatch):
+    decoded = []
+    monkeypatch.setattr(engine, "preprocess_audio", lambda path: decoded.append(path) or "clip")
+    a, b = library / "album" / "a.wav", library / "album" / "b.wav"
+    # same bytes already ingested under another path
+    track_id = add_track(conn, "/elsewhere/a-copy.wav", file_hash(a))
+
+    assert hash_and_decode(a, db_path) == (file_hash(a), track_id, None)
+    assert decoded == []
+
+    assert hash_and_decode(b, db_path) == (file_hash(b), None, "clip")
+    assert decoded == [str(b)]
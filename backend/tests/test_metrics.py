@@ -0,0 +1,117 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+from ingest import metrics
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    # each test starts from an empty registry
+    monkeypatch.setattr(metrics, "_counters", {})
+    monkeypatch.setattr(metrics, "_histograms", {})
+    monkeypatch.setattr(metrics, "_outbox", [])
+    monkeypatch.setattr(metrics, "_export", False)
+
+
+def series(text):
+    """{'name{labels}': value} for every sample line."""
+    return {
+        line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1])
+        for line in text.splitlines() if line and not line.startswith("#")
+    }
+
+
+def test_counters():
+    metrics.inc("jobs_total", status="done")
+    metrics.inc("jobs_total", 2, status="done")
+    metrics.inc("jobs_total", status="failed")
+    # label order doesn't make a new series
+    metrics.inc("requests_total", path="/ready", status=200)
+    metrics.inc("requests_total", status=200, path="/ready")
+
+    text = metrics.render_prometheus()
+    assert "# HELP music_jobs_total Background analysis jobs by outcome" in text
+    assert "# TYPE music_jobs_total counter" in text
+    assert series(text) == {
+        'music_jobs_total{status="done"}': 3,
+        'music_jobs_total{status="failed"}': 1,
+        'music_requests_total{path="/ready",status="200"}': 2,
+    }
+
+
+def test_histogram_buckets_are_cumulative():
+    for seconds in (0.003, 0.2, 100):
+        metrics.observe("stage_seconds", seconds, stage="crepe")
+
+    text = metrics.render_prometheus()
+    assert "# TYPE music_stage_seconds histogram" in text
+    s = series(text)
+    assert s['music_stage_seconds_bucket{stage="crepe",le="0.005"}'] == 1
+    assert s['music_stage_seconds_bucket{stage="crepe",le="0.1"}'] == 1
+    assert s['music_stage_seconds_bucket{stage="crepe",le="0.25"}'] == 2
+    assert s['music_stage_seconds_bucket{stage="crepe",le="60"}'] == 2
+    assert s['music_stage_seconds_bucket{stage="crepe",le="+Inf"}'] == 3
+    assert s['music_stage_seconds_count{stage="crepe"}'] == 3
+    assert s['music_stage_seconds_sum{stage="crepe"}'] == pytest.approx(100.203)
+
+
+def test_label_values_are_escaped():
+    metrics.inc("request_failures_total", path='a"b\\c\nd')
+    assert 'music_request_failures_total{path="a\\"b\\\\c\\nd"} 1' in metrics.render_prometheus()
+
+
+def test_timer_and_timed():
+    with metrics.timer("trim", store="x"):
+        pass
+
+    @metrics.timed("decode")
+    def decode():
+        return 42
+
+    assert decode() == 42
+    s = series(metrics.render_prometheus())
+    assert s['music_stage_seconds_count{stage="trim",store="x"}'] == 1
+    assert s['music_stage_seconds_count{stage="decode"}'] == 1
+
+
+def test_worker_observations_merge_into_the_parent(monkeypatch):
+    # worker side
+    metrics.enable_export()
+    metrics.inc("tracks_ingested_total", dataset="fma")
+    metrics.observe("stage_seconds", 0.5, stage="openl3")
+    worker = metrics.render_prometheus()
+    events = metrics.drain()
+    assert len(events) == 2 and metrics.drain() == []
+
+    # parent side
+    monkeypatch.setattr(metrics, "_counters", {})
+    monkeypatch.setattr(metrics, "_histograms", {})
+    metrics.merge(events)
+    assert metrics.render_prometheus() == worker
+
+
+def test_write_textfile(tmp_path, monkeypatch):
+    monkeypatch.delenv("METRICS_TEXTFILE", raising=False)
+    assert metrics.write_textfile() is None
+
+    metrics.inc("ingest_failures_total", dataset="gtzan")
+    path = tmp_path / "ingest.prom"
+    monkeypatch.setenv("METRICS_TEXTFILE", str(path))
+    assert metrics.write_textfile() == str(path)
+    assert path.read_text() == metrics.render_prometheus()
+
+
+def test_requests_are_labelled_with_the_route_template():
+    client = TestClient(app_module.app)
+    for job_id in ("abc", "def"):
+        assert client.get(f"/jobs/{job_id}").status_code == 404
+    client.get("/no-such-page")
+
+    text = client.get("/metrics").text
+    s = series(text)
+    # one series for every job id, none per URL
+    assert s['music_requests_total{path="/jobs/{job_id}",status="404"}'] == 2
+    assert s['music_request_seconds_count{path="/jobs/{job_id}"}'] == 2
+    assert s['music_requests_total{path="unmatched",status="404"}'] == 1
+    assert "abc" not in text and "no-such-page" not in text
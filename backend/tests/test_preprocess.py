@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+sf = pytest.importorskip("soundfile")
+
+from ingest import preprocess
+from ingest.preprocess import preprocess_audio, TARGET_SR, TARGET_DURATION
+
+SR = 22050
+
+
+def write(tmp_path, segments):
+    """
+    WAV of (seconds, amplitude) tone segments; amplitude 0 is silence.
+    """
+    parts = []
+    for seconds, amplitude in segments:
+        t = np.arange(int(seconds * SR)) / SR
+        parts.append(amplitude * np.sin(2 * np.pi * 330 * t))
+    path = tmp_path / "clip.wav"
+    sf.write(path, np.concatenate(parts).astype(np.float32), SR)
+    return path
+
+
+@pytest.fixture
+def resampled(monkeypatch):
+    """
+    Lengths (in seconds) preprocess_audio resamples.
+    """
+    lengths = []
+    resample = preprocess._resample
+    monkeypatch.setattr(preprocess, "_resample", lambda y, sr: lengths.append(len(y) / sr) or resample(y, sr))
+    return lengths
+
+
+@pytest.mark.parametrize("segments, windowed", [
+    ([(2, 0.0), (80, 0.5)], True),                    # silence, then a long track
+    ([(90, 0.008)], True),                            # low-level recording
+    ([(3, 0.004), (2, 0.8), (80, 0.3)], True),        # quiet intro before a loud passage
+    ([(20, 0.02), (60, 0.1), (60, 0.9)], False),      # loudest part after the window
+    ([(15, 0.0), (70, 0.5)], False),                  # silence past the allowance
+    ([(2, 0.0), (20, 0.5)], False),                   # shorter than the target
+])
+def test_window_matches_full_decode(tmp_path, resampled, segments, windowed):
+    path = write(tmp_path, segments)
+    out, duration, sr = preprocess_audio(path)
+    assert (duration, sr) == (TARGET_DURATION, TARGET_SR)
+    assert out.shape == (int(TARGET_SR * TARGET_DURATION),) and out.dtype == np.float32
+
+    # just the window, or the whole file (after the window, when long enough)
+    total = sum(s for s, _ in segments)
+    assert (resampled[-1] < total) == windowed
+    assert len(resampled) == 1 or resampled[0] < resampled[1] == total
+
+    full, _, _ = preprocess_audio(path, full_decode=True)
+    assert np.array_equal(out, full)
+
+
+def test_low_level_input_is_normalized(tmp_path):
+    out, _, _ = preprocess_audio(write(tmp_path, [(90, 0.008)]))
+    assert np.count_nonzero(out) > 0.99 * out.size
+    assert np.sqrt(np.mean(out ** 2)) == pytest.approx(10 ** (preprocess.TARGET_DBFS / 20), rel=1e-3)
+
+
+def test_trim_is_relative_to_the_loudest_part(tmp_path):
+    # the -48 dBFS intro is silence next to the 0.8 passage, so the clip starts there
+    out, _, _ = preprocess_audio(write(tmp_path, [(3, 0.004), (2, 0.8), (80, 0.3)]))
+    loud, rest = np.abs(out[:TARGET_SR]).max(), np.abs(out[3 * TARGET_SR:4 * TARGET_SR]).max()
+    assert loud / rest == pytest.approx(0.8 / 0.3, rel=0.01)
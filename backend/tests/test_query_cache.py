@@ -0,0 +1,81 @@
+import pickle
+
+import numpy as np
+
+from api import query_cache
+from api.query_cache import QueryCache, make_key
+
+
+def test_make_key_hashes_audio_and_params():
+    y = np.linspace(-1, 1, 1000, dtype=np.float32)
+    key = make_key(y, 22050, ("mfcc", 20))
+    assert key == make_key(y.copy(), 22050, ("mfcc", 20))
+    assert key != make_key(y, 16000, ("mfcc", 20))
+    assert key != make_key(y, 22050, ("mfcc", 13))
+    assert key != make_key(y[::-1].copy(), 22050, ("mfcc", 20))
+
+
+def test_features_hit_and_miss():
+    cache = QueryCache(max_entries=4)
+    assert cache.get_features("a") is None
+    cache.put_features("a", {"tempo": 120})
+    assert cache.get_features("a") == {"tempo": 120}
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_results_are_dropped_when_the_generation_changes():
+    cache = QueryCache()
+    cache.put_features("a", {})
+    cache.put_results("a", "hybrid", 3, [(1, 0.9)])
+
+    assert cache.get_results("a", "hybrid", 3) == [(1, 0.9)]
+    assert cache.get_results("a", "hybrid", 4) is None
+    assert cache.get_results("a", "basic", 3) is None
+    # features outlive the DB change
+    assert cache.get_features("a") == {}
+
+    cache.put_results("a", "hybrid", 4, [(2, 0.8)])
+    assert cache.get_results("a", "hybrid", 4) == [(2, 0.8)]
+    assert cache.get_results("a", "hybrid", 3) is None
+
+
+def test_results_need_cached_features():
+    cache = QueryCache()
+    cache.put_results("a", "hybrid", 1, [(1, 0.5)])
+    assert cache.get_results("a", "hybrid", 1) is None
+    assert len(cache) == 0
+
+
+def test_lru_eviction():
+    cache = QueryCache(max_entries=2)
+    cache.put_features("a", 1)
+    cache.put_features("b", 2)
+    cache.get_features("a")          # a is now the most recent
+    cache.put_features("c", 3)
+    assert len(cache) == 2
+    assert cache.get_features("b") is None
+    assert cache.get_features("a") == 1 and cache.get_features("c") == 3
+
+
+def test_persistence_keeps_features_only(tmp_path):
+    path = tmp_path / "query_cache.pkl"
+    cache = QueryCache(persist_path=path)
+    cache.put_features("a", {"tempo": 100})
+    cache.put_results("a", "hybrid", 1, [(1, 0.9)])
+    cache.save()
+
+    loaded = QueryCache(persist_path=path)
+    assert loaded.load() == 1
+    assert loaded.get_features("a") == {"tempo": 100}
+    assert loaded.get_results("a", "hybrid", 1) is None
+
+
+def test_load_ignores_other_versions_and_bad_files(tmp_path):
+    path = tmp_path / "query_cache.pkl"
+    with open(path, "wb") as f:
+        pickle.dump((query_cache.CACHE_VERSION - 1, {"a": {"features": 1, "results": {}}}), f)
+    assert QueryCache(persist_path=path).load() == 0
+
+    path.write_bytes(b"not a pickle")
+    assert QueryCache(persist_path=path).load() == 0
+    assert QueryCache(persist_path=tmp_path / "missing.pkl").load() == 0
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from similarity.similarity import top_k_indices
+
+
+def stable_top_k(scores, k):
+    # what the full stable sort used to return
+    return np.argsort(-scores, kind="stable")[:max(k, 0)]
+
+
+def test_best_first():
+    scores = np.array([0.1, 0.9, 0.5, 0.7, 0.3])
+    assert top_k_indices(scores, 3).tolist() == [1, 3, 2]
+
+
+def test_ties_keep_db_order():
+    scores = np.array([0.5, 0.9, 0.5, 0.5, 0.9, 0.1])
+    assert top_k_indices(scores, 4).tolist() == [1, 4, 0, 2]
+    assert top_k_indices(np.ones(10), 3).tolist() == [0, 1, 2]
+
+
+@pytest.mark.parametrize("k", [0, -1])
+def test_empty_for_non_positive_k(k):
+    out = top_k_indices(np.array([0.3, 0.2]), k)
+    assert out.size == 0 and out.dtype == np.int64
+
+
+def test_k_at_least_n_and_empty_scores():
+    scores = np.array([0.2, 0.8, 0.8])
+    assert top_k_indices(scores, 3).tolist() == [1, 2, 0]
+    assert top_k_indices(scores, 10).tolist() == [1, 2, 0]
+    assert top_k_indices(np.empty(0), 5).size == 0
+
+
+def test_matches_stable_sort_with_many_ties():
+    rng = np.random.default_rng(0)
+    for _ in range(500):
+        n = int(rng.integers(1, 200))
+        k = int(rng.integers(0, n + 3))
+        scores = rng.integers(0, 4, n).astype(np.float32)
+        assert np.array_equal(top_k_indices(scores, k), stable_top_k(scores, k))
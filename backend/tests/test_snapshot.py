@@ -0,0 +1,97 @@
+import numpy as np
+
+from ingest.db import connect
+from ingest.embedding_codec import encode_embedding
+from ingest.snapshot import refresh_snapshot, load_snapshot, table_version, snapshot_paths
+
+DIM = 8
+
+
+def execute(db_path, sql, rows):
+    conn = connect(db_path)
+    conn.executemany(sql, rows)
+    conn.commit()
+    conn.close()
+
+
+def put(db_path, rows):
+    execute(db_path, "INSERT INTO fused_embeddings (track_id, embedding, dim) VALUES (?, ?, ?)",
+            [(i, encode_embedding(v), DIM) for i, v in rows])
+
+
+def rewrite(db_path, rows):
+    execute(db_path, "UPDATE fused_embeddings SET embedding = ? WHERE track_id = ?",
+            [(encode_embedding(v), i) for i, v in rows])
+
+
+def vec(i):
+    return np.full(DIM, i, dtype=np.float32)
+
+
+def refresh(db_path, tmp_path, dtype="float32"):
+    n = refresh_snapshot(db_path, "fused_embeddings", dtype, snapshot_dir=tmp_path / "snap")
+    ids, mat = load_snapshot("fused_embeddings", dtype, snapshot_dir=tmp_path / "snap")
+    assert ids.shape[0] == n == mat.shape[0]
+    return ids, mat
+
+
+def test_version_counts_writes(db_path):
+    conn = connect(db_path)
+    v0 = table_version(conn, "fused_embeddings")
+    conn.close()
+    put(db_path, [(1, vec(1)), (2, vec(2))])
+    conn = connect(db_path)
+    assert table_version(conn, "fused_embeddings") == v0 + 2
+    conn.close()
+
+
+def test_build_append_and_no_op(db_path, tmp_path):
+    put(db_path, [(i, vec(i)) for i in (1, 2, 3)])
+    ids, mat = refresh(db_path, tmp_path)
+    assert ids.tolist() == [1, 2, 3] and mat.dtype == np.float32
+    assert np.array_equal(mat[:, 0], [1, 2, 3])
+
+    mat_path, _ = snapshot_paths("fused_embeddings", "float32", tmp_path / "snap")
+    mtime = mat_path.stat().st_mtime_ns
+    refresh(db_path, tmp_path)
+    assert mat_path.stat().st_mtime_ns == mtime      # unchanged version: nothing rewritten
+
+    put(db_path, [(4, vec(4)), (5, vec(5))])
+    ids, mat = refresh(db_path, tmp_path)
+    assert ids.tolist() == [1, 2, 3, 4, 5]
+    assert np.array_equal(mat[:, 0], [1, 2, 3, 4, 5])
+
+
+def test_rewritten_rows_rebuild(db_path, tmp_path):
+    put(db_path, [(i, vec(i)) for i in (1, 2, 3)])
+    refresh(db_path, tmp_path)
+
+    # same row count, an old row changed
+    rewrite(db_path, [(2, vec(20))])
+    ids, mat = refresh(db_path, tmp_path)
+    assert np.array_equal(mat[:, 0], [1, 20, 3])
+
+    # an old row deleted and a new one added: the counts alone would match
+    execute(db_path, "DELETE FROM fused_embeddings WHERE track_id = ?", [(1,)])
+    put(db_path, [(6, vec(6))])
+    ids, mat = refresh(db_path, tmp_path)
+    assert ids.tolist() == [2, 3, 6]
+    assert np.array_equal(mat[:, 0], [20, 3, 6])
+
+
+def test_missing_version_file_rebuilds(db_path, tmp_path):
+    put(db_path, [(1, vec(1))])
+    refresh(db_path, tmp_path)
+    mat_path, _ = snapshot_paths("fused_embeddings", "float32", tmp_path / "snap")
+    mat_path.with_name(mat_path.name[:-len(".npy")] + ".json").unlink()
+
+    rewrite(db_path, [(1, vec(10))])
+    ids, mat = refresh(db_path, tmp_path)
+    assert np.array_equal(mat[:, 0], [10])
+
+
+def test_float16_snapshot(db_path, tmp_path):
+    put(db_path, [(i, vec(i) / 10) for i in (1, 2)])
+    ids, mat = refresh(db_path, tmp_path, "float16")
+    assert mat.dtype == np.float16
+    assert np.allclose(mat[:, 0], [0.1, 0.2], atol=1e-3)
@@ -0,0 +1,64 @@
+import sqlite3
+
+import numpy as np
+
+from ingest.db import connect
+from ingest.blobs import unpack_array, pack_feature
+from ingest.summary import (
+    SUMMARY_COLUMNS,
+    ensure_summary_columns,
+    summary_blobs,
+    summary_vector,
+    summary_vectors,
+    backfill_summaries,
+)
+
+
+def features(seed):
+    rng = np.random.default_rng(seed)
+    return rng.random((20, 30), dtype=np.float32), rng.random((12, 30), dtype=np.float32)
+
+
+def test_summary_blobs_are_frame_statistics():
+    mfcc, chroma = features(0)
+    mfcc_mean, mfcc_std, chroma_mean, chroma_std = (unpack_array(b) for b in summary_blobs(mfcc, chroma))
+    assert mfcc_mean.dtype == np.float32 and mfcc_mean.shape == (20,)
+    assert np.allclose(mfcc_mean, mfcc.mean(axis=1)) and np.allclose(mfcc_std, mfcc.std(axis=1))
+    assert np.allclose(chroma_mean, chroma.mean(axis=1)) and np.allclose(chroma_std, chroma.std(axis=1))
+    assert summary_vector(mfcc_mean, mfcc_std).shape == (40,)
+
+
+def test_ensure_summary_columns_upgrades_an_old_db(tmp_path):
+    conn = sqlite3.connect(tmp_path / "old.db")
+    conn.executescript("""
+        CREATE TABLE audio_features (track_id INTEGER PRIMARY KEY, mfcc BLOB, chroma BLOB);
+    """)
+    ensure_summary_columns(conn)
+    ensure_summary_columns(conn)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(audio_features)")}
+    assert set(SUMMARY_COLUMNS) <= columns
+    conn.close()
+
+
+def test_backfill_and_vectors_fall_back(db_path):
+    conn = connect(db_path)
+    # track 1: legacy headerless blobs, track 2: packed
+    for track_id, (mfcc, chroma), pack in ((1, features(1), np.ndarray.tobytes), (2, features(2), pack_feature)):
+        conn.execute(
+            "INSERT INTO audio_features (track_id, tempo, mfcc, chroma) VALUES (?, 120, ?, ?)",
+            (track_id, pack(mfcc), pack(chroma))
+        )
+    conn.commit()
+
+    select = f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM audio_features WHERE track_id = ?"
+    before = summary_vectors(conn, 1, conn.execute(select, (1,)).fetchone())
+
+    assert backfill_summaries(db_path) == 2
+    assert backfill_summaries(db_path) == 0
+
+    after = summary_vectors(conn, 1, conn.execute(select, (1,)).fetchone())
+    for a, b in zip(before, after):
+        assert np.allclose(a, b)
+    mfcc, chroma = features(1)
+    assert np.allclose(after[0], np.concatenate([mfcc.mean(axis=1), mfcc.std(axis=1)]))
+    conn.close()
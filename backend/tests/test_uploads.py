@@ -0,0 +1,89 @@
+import io
+
+import numpy as np
+import pytest
+import soundfile as sf
+from fastapi import FastAPI, UploadFile, File
+from fastapi.testclient import TestClient
+
+import app as app_module
+from api.uploads import BodyLimitMiddleware, BODY_OVERHEAD, read_upload, decode_upload
+
+LIMIT = 1024 * 1024
+
+
+@pytest.fixture
+def client():
+    # the upload path of /analyze with a 1 MB cap
+    api = FastAPI()
+    api.add_middleware(BodyLimitMiddleware, max_bytes=LIMIT)
+    api.state.calls = 0
+
+    @api.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        api.state.calls += 1
+        y, sr = await decode_upload(await read_upload(file, max_bytes=LIMIT), sr=None)
+        return {"samples": len(y), "sr": sr}
+
+    return TestClient(api)
+
+
+def wav_bytes(seconds=0.5, sr=8000):
+    buf = io.BytesIO()
+    sf.write(buf, np.zeros(int(seconds * sr), dtype=np.float32), sr, format="WAV")
+    return buf.getvalue()
+
+
+def multipart(data, boundary="limit-test"):
+    return (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.wav\"\r\n"
+        f"Content-Type: audio/wav\r\n\r\n".encode() + data + f"\r\n--{boundary}--\r\n".encode(),
+        {"content-type": f"multipart/form-data; boundary={boundary}"}
+    )
+
+
+def test_upload_is_decoded(client):
+    r = client.post("/upload", files={"file": ("a.wav", wav_bytes())})
+    assert r.status_code == 200 and r.json() == {"samples": 4000, "sr": 8000}
+
+
+def test_oversized_body_is_refused_from_content_length(client):
+    body, headers = multipart(b"\0" * (LIMIT + BODY_OVERHEAD))
+    r = client.post("/upload", content=body, headers=headers)
+    assert r.status_code == 413 and "limit 1 MB" in r.json()["detail"]
+    assert client.app.state.calls == 0
+
+
+def test_oversized_body_is_refused_without_content_length(client):
+    body, headers = multipart(b"\0" * (LIMIT + BODY_OVERHEAD))
+
+    def chunked():
+        # a generator body goes out chunked, with no Content-Length
+        for i in range(0, len(body), 64 * 1024):
+            yield body[i:i + 64 * 1024]
+
+    r = client.post("/upload", content=chunked(), headers=headers)
+    assert r.status_code == 413
+    # refused while the form was parsed, before the endpoint ran
+    assert client.app.state.calls == 0
+
+
+def test_file_over_the_limit_within_the_overhead(client):
+    # passes the body check (multipart overhead), not the file check
+    r = client.post("/upload", files={"file": ("a.wav", b"\0" * (LIMIT + 1))})
+    assert r.status_code == 413 and client.app.state.calls == 1
+
+
+@pytest.mark.parametrize("data, detail", [
+    (b"", "Empty upload"),
+    (b"RIFF not really a wav", "Could not decode audio"),
+])
+def test_bad_upload_is_400(client, data, detail):
+    r = client.post("/upload", files={"file": ("a.wav", data)})
+    assert r.status_code == 400 and r.json()["detail"].startswith(detail)
+
+
+def test_analyze_rejects_undecodable_audio():
+    # decoding comes before any extraction or DB access
+    r = TestClient(app_module.app).post("/analyze", files={"file": ("a.mp3", b"\xff\xfb not an mp3")})
+    assert r.status_code == 400 and r.json()["detail"].startswith("Could not decode audio")
@@ -0,0 +1,98 @@
+import time
+
+import numpy as np
+import pytest
+
+from ingest.db import connect
+from ingest.writer import TrackWriter
+
+
+def feats(seed=0):
+    rng = np.random.default_rng(seed)
+    return {
+        "tempo": 120.0,
+        "mfcc": rng.random((20, 10), dtype=np.float32),
+        "chroma": rng.random((12, 10), dtype=np.float32),
+        "pitch_median": 220.0,
+        "embedding": rng.random(16, dtype=np.float32),
+    }
+
+
+def count(db_path, table):
+    conn = connect(db_path)
+    n = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    conn.close()
+    return n
+
+
+def manifest(db_path):
+    conn = connect(db_path)
+    rows = conn.execute("SELECT file_path, status, track_id, error FROM ingest_manifest").fetchall()
+    conn.close()
+    return {path: (status, track_id, error) for path, status, track_id, error in rows}
+
+
+def wait_for(condition, timeout=5.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_failed_track_rolls_back_alone(db_path):
+    writer = TrackWriter(db_path, batch_size=10, max_delay=60).start()
+    writer.put("a", "a.wav", 60.0, "x", feats(1), content_hash="ha", run_id="r")
+    # fails after its tracks / audio_features rows are written
+    broken = feats(2)
+    del broken["embedding"]
+    writer.put("b", "b.wav", 60.0, "x", broken, content_hash="hb", run_id="r")
+    writer.put("c", "c.wav", 60.0, "x", feats(3), run_id="r")
+    assert writer.close() == (2, 1)
+
+    conn = connect(db_path)
+    titles = [r[0] for r in conn.execute("SELECT title FROM tracks ORDER BY id")]
+    assert titles == ["a", "c"]
+    assert count(db_path, "audio_features") == count(db_path, "fused_embeddings") == 2
+    conn.close()
+
+    entries = manifest(db_path)
+    assert entries["a.wav"][:2] == ("done", 1) and entries["c.wav"][:2] == ("done", 2)
+    status, track_id, error = entries["b.wav"]
+    assert status == "failed" and track_id is None and "embedding" in error
+
+
+def test_done_commits_with_the_track_rows(db_path):
+    writer = TrackWriter(db_path, batch_size=10, max_delay=60).start()
+    writer.put("a", "a.wav", 60.0, "x", feats(), run_id="r")
+    # a manifest write outside any track's savepoint fails the whole batch
+    writer.mark("bad.wav", None, "failed")
+    writer.close()
+
+    # neither the track nor its "done" entry made it: never one without the other
+    assert count(db_path, "tracks") == 0
+    assert manifest(db_path) == {}
+    with pytest.raises(RuntimeError):
+        writer.put("b", "b.wav", 60.0, "x", feats())
+
+
+def test_commits_when_the_batch_is_full(db_path):
+    writer = TrackWriter(db_path, batch_size=2, max_delay=60).start()
+    writer.put("a", "a.wav", 60.0, "x", feats(1))
+    time.sleep(0.2)
+    assert count(db_path, "tracks") == 0
+
+    writer.put("b", "b.wav", 60.0, "x", feats(2))
+    assert wait_for(lambda: count(db_path, "tracks") == 2)
+    writer.close()
+
+
+def test_commits_after_max_delay(db_path):
+    writer = TrackWriter(db_path, batch_size=100, max_delay=0.3).start()
+    writer.put("a", "a.wav", 60.0, "x", feats())
+    writer.mark("gone.wav", "x", "failed", error="decode")
+    assert count(db_path, "tracks") == 0
+    assert wait_for(lambda: count(db_path, "tracks") == 1)
+    assert manifest(db_path)["gone.wav"] == ("failed", None, "decode")
+    assert writer.close() == (1, 0)
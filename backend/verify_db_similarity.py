@@ -1,24 +1,20 @@
-import sqlite3
 import numpy as np
 from pathlib import Path
 
 # ----------------------------------------
 # IMPORT FIX (use relative package import)
 # ----------------------------------------
-from backend.ingest.preprocess import preprocess_audio
-
-# ----------------------------------------
-# ALWAYS use database from project root
-# ----------------------------------------
-ROOT = Path(__file__).resolve().parent.parent
-DB_PATH = ROOT / "database" / "music.db"
+from backend.ingest.waveform_cache import get_preprocessed
+from backend.ingest.db import DB_PATH, connect
+from backend.ingest.embedding_codec import decode_embedding
+from backend.ingest.blobs import unpack_array
 
 
 # ----------------------------------------
 # Count rows
 # ----------------------------------------
 def count_rows():
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH)
     cur = conn.cursor()
 
     tables = ["tracks", "audio_features", "embeddings", "yamnet_embeddings", "fused_embeddings"]
@@ -38,7 +34,7 @@ def count_rows():
 # Verify track files
 # ----------------------------------------
 def verify_tracks():
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH)
     cur = conn.cursor()
 
     print("\n========= VERIFY TRACKS =========")
@@ -52,7 +48,8 @@ def verify_tracks():
             print(f"❌ Track {track_id}: Missing file → {file_path}")
             continue
 
-        y, duration, sr = preprocess_audio(file_path)
+        # cached waveform if WAVEFORM_CACHE_DIR is set, else a fresh decode
+        y, duration, sr = get_preprocessed(track_id, file_path)
 
         issues = []
         if round(duration, 1) != 60.0:
@@ -74,7 +71,7 @@ def verify_tracks():
 # Verify MFCC / Chroma / Tempo
 # ----------------------------------------
 def verify_audio_features():
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH)
     cur = conn.cursor()
 
     print("\n========= VERIFY AUDIO FEATURES =========")
@@ -82,8 +79,8 @@ def verify_audio_features():
     rows = cur.fetchall()
 
     for track_id, tempo, mfcc_blob, chroma_blob in rows:
-        mfcc = np.frombuffer(mfcc_blob, dtype=np.float32)
-        chroma = np.frombuffer(chroma_blob, dtype=np.float32)
+        mfcc = unpack_array(mfcc_blob)
+        chroma = unpack_array(chroma_blob)
 
         if mfcc.size % 20 != 0:
             print(f"❌ Track {track_id}: Broken MFCC shape ({mfcc.size})")
@@ -101,7 +98,7 @@ def verify_audio_features():
 # Verify embeddings
 # ----------------------------------------
 def verify_embeddings():
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH)
     cur = conn.cursor()
 
     print("\n========= VERIFY EMBEDDINGS =========")
@@ -117,10 +114,10 @@ def verify_embeddings():
         rows = cur.fetchall()
 
         for track_id, emb_blob, dim in rows:
-            emb = np.frombuffer(emb_blob, dtype=np.float32)
-
-            if emb.size != dim:
-                print(f"❌ Track {track_id} in {table}: Blob size mismatch ({emb.size} != {dim})")
+            try:
+                decode_embedding(emb_blob, dim)
+            except ValueError as e:
+                print(f"❌ Track {track_id} in {table}: {e}")
 
             if dim != expected_dim:
                 print(f"⚠️ Track {track_id} in {table}: Unexpected embedding dim {dim} (expected {expected_dim})")
@@ -1,15 +1,14 @@
 # dataset_builder/generate_pairs.py
 
 import random
-import sqlite3
-from dataset_builder.load_db import load_all_track_ids, DB_PATH
+from dataset_builder.load_db import load_all_track_ids, DB_PATH, connect
 
 
 def generate_positive_pairs():
     """
     Positive pairs = Covers80 (each song has 2 versions: a/b)
     """
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH)
     cur = conn.cursor()
 
     cur.execute("SELECT id, title FROM tracks WHERE dataset='covers80'")
@@ -1,22 +1,23 @@
-import sqlite3
 import numpy as np
 
-DB_PATH = 'database/music.db'
+from backend.ingest.db import DB_PATH, connect
+from backend.ingest.embedding_codec import decode_embedding
+from backend.ingest.blobs import unpack_array
 
 
 def load_fused_embedding(track_id):
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH)
     cur = conn.cursor()
-    cur.execute("SELECT embedding FROM fused_embeddings WHERE track_id=?", (track_id,))
+    cur.execute("SELECT embedding, dim FROM fused_embeddings WHERE track_id=?", (track_id,))
     row = cur.fetchone()
     conn.close()
     if row is None:
         return None
-    return np.frombuffer(row[0], dtype=np.float32)
+    return decode_embedding(row[0], row[1])
 
 
 def load_audio_features(track_id):
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH)
     cur = conn.cursor()
     cur.execute("""
         SELECT tempo, mfcc, chroma, pitch_freqs, pitch_conf, pitch_median
@@ -31,13 +32,13 @@ def load_audio_features(track_id):
 
     tempo = float(row[0])
 
-    mfcc = np.frombuffer(row[1], dtype=np.float32)
-    chroma = np.frombuffer(row[2], dtype=np.float32)
+    mfcc = unpack_array(row[1], dtype=np.float32).ravel()
+    chroma = unpack_array(row[2], dtype=np.float32).ravel()
 
-    pitch_freqs = np.frombuffer(row[3], dtype=np.float32) if row[3] else np.array([], dtype=np.float32)
+    pitch_freqs = unpack_array(row[3]) if row[3] else np.array([], dtype=np.float32)
 
     if row[4]:
-        pitch_conf_arr = np.frombuffer(row[4], dtype=np.float32)
+        pitch_conf_arr = unpack_array(row[4])
         pitch_conf_mean = float(pitch_conf_arr.mean()) if pitch_conf_arr.size else 0.0
     else:
         pitch_conf_mean = 0.0
@@ -48,7 +49,7 @@ def load_audio_features(track_id):
 
 
 def load_all_track_ids():
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH)
     cur = conn.cursor()
     cur.execute("SELECT id FROM tracks")
     rows = cur.fetchall()
@@ -1,3 +1,21 @@
+const POLL_INTERVAL_MS = 1000;
+
+// Submit as a background job and poll until it finishes
+async function waitForAnalysis(formData, status) {
+  const { job_id } = await window.api.submitAnalysis(formData);
+
+  while (true) {
+    const job = await window.api.getJob(job_id);
+    if (job.status === "done") return job.result;
+    if (job.status === "failed") throw new Error(job.error);
+
+    status.innerText = job.status === "queued"
+      ? `Queued (${job.queue_depth} waiting)...`
+      : "Analyzing...";
+    await new Promise((resolve) => setTimeout(resolve, POLL_INTERVAL_MS));
+  }
+}
+
 async function analyze() {
   const fileInput = document.getElementById("audioFile");
   const status = document.getElementById("status");
@@ -14,7 +32,7 @@ async function analyze() {
   status.innerText = "Analyzing...";
 
   try {
-    const res = await window.api.analyzeSong(formData);
+    const res = await waitForAnalysis(formData, status);
 
     let text = `Query Song\n`;
     text += `Tempo: ${res.query.tempo}\n`;
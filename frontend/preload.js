@@ -1,13 +1,30 @@
 const { contextBridge } = require("electron");
 const axios = require("axios");
 
+const API = "http://127.0.0.1:8000";
+
 contextBridge.exposeInMainWorld("api", {
   analyzeSong: async (formData) => {
     const res = await axios.post(
-      "http://127.0.0.1:8000/analyze",
+      `${API}/analyze`,
       formData,
       { headers: { "Content-Type": "multipart/form-data" } }
     );
     return res.data;
+  },
+
+  // Async variant: returns { job_id, status } immediately
+  submitAnalysis: async (formData) => {
+    const res = await axios.post(
+      `${API}/jobs`,
+      formData,
+      { headers: { "Content-Type": "multipart/form-data" } }
+    );
+    return res.data;
+  },
+
+  getJob: async (jobId) => {
+    const res = await axios.get(`${API}/jobs/${jobId}`);
+    return res.data;
   }
 });
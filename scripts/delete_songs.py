@@ -1,10 +1,11 @@
-import sqlite3
+import sys
 from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[1] / "backend"))
 
-DB_PATH = Path("database/music.db")  # adjust if needed
+from ingest.db import DB_PATH, connect
 
 def delete_last_n_tracks(n=2):
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH)
     cur = conn.cursor()
 
     # 1. Get last N track IDs
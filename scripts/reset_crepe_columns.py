@@ -1,8 +1,10 @@
-import sqlite3
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[1] / "backend"))
 
-DB_PATH = "database/music.db"
+from ingest.db import DB_PATH, connect
 
-conn = sqlite3.connect(DB_PATH)
+conn = connect(DB_PATH)
 cur = conn.cursor()
 
 print("Resetting CREPE pitch columns...")
@@ -6,13 +6,14 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parents[1] / "backend"))
 
-from backend.ingest.preprocess import preprocess_audio
+from ingest.preprocess import preprocess_audio
+from ingest.db import DB_PATH, connect
+from ingest.embedding_codec import decode_embedding
+from ingest.blobs import unpack_array
 
 
-DB_PATH = "database/music.db"
-
 def count_rows():
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH)
     cur = conn.cursor()
 
     tables = ["tracks", "audio_features", "embeddings", "yamnet_embeddings", "fused_embeddings"]
@@ -29,7 +30,7 @@ def count_rows():
 
 
 def verify_tracks():
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH)
     cur = conn.cursor()
 
     print("\n========= VERIFY TRACKS =========")
@@ -63,7 +64,7 @@ def verify_tracks():
 
 
 def verify_audio_features():
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH)
     cur = conn.cursor()
 
     print("\n========= VERIFY AUDIO FEATURES =========")
@@ -71,8 +72,8 @@ def verify_audio_features():
     rows = cur.fetchall()
 
     for track_id, tempo, mfcc_blob, chroma_blob in rows:
-        mfcc = np.frombuffer(mfcc_blob, dtype=np.float32)
-        chroma = np.frombuffer(chroma_blob, dtype=np.float32)
+        mfcc = unpack_array(mfcc_blob)
+        chroma = unpack_array(chroma_blob)
 
         if mfcc.size % 20 != 0:
             print(f"❌ Track {track_id}: MFCC shape broken")
@@ -87,7 +88,7 @@ def verify_audio_features():
 
 
 def verify_embeddings():
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH)
     cur = conn.cursor()
 
     tables_expected_dims = {
@@ -102,10 +103,10 @@ def verify_embeddings():
         rows = cur.fetchall()
 
         for track_id, emb_blob, dim in rows:
-            emb = np.frombuffer(emb_blob, dtype=np.float32)
-
-            if emb.shape[0] != dim:
-                print(f"❌ Track {track_id} in {table}: Embedding dimension mismatch {emb.shape[0]} != {dim}")
+            try:
+                decode_embedding(emb_blob, dim)
+            except ValueError as e:
+                print(f"❌ Track {track_id} in {table}: {e}")
 
             if dim != expected_dim:
                 print(f"⚠️ Track {track_id} in {table}: Unexpected embedding size {dim} (expected {expected_dim})")
@@ -1,18 +1,21 @@
-import sqlite3
 import numpy as np
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[1] / "backend"))
 
-DB_PATH = 'database/music.db'
+from ingest.db import DB_PATH, connect
+from ingest.blobs import unpack_array
 
 
 def bytes_to_array(blob):
     """Convert BLOB from DB to numpy array."""
     if blob is None:
         return np.array([], dtype=np.float32)
-    return np.frombuffer(blob, dtype=np.float32)
+    return unpack_array(blob)
 
 
 def verify_crepe_data(limit=None):
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect(DB_PATH)
     cur = conn.cursor()
 
     # Total tracks
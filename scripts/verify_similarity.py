@@ -1,9 +1,15 @@
 # similarity/similarity_checker.py
 
-import sqlite3
+import sys
 import numpy as np
 import librosa
+from pathlib import Path
 from scipy.spatial.distance import cosine, euclidean
+sys.path.append(str(Path(__file__).resolve().parents[1] / "backend"))
+
+from ingest.db import DB_PATH, connect
+from ingest.embedding_codec import decode_embedding
+from ingest.blobs import unpack_array, MFCC_ROWS, CHROMA_ROWS
 
 # -----------------------------
 # Settings
@@ -54,26 +60,36 @@ def extract_features(y, sr):
 # Load fused embeddings and features from DB
 # -----------------------------
 def load_db_features(db_path):
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path)
     cur = conn.cursor()
 
-    cur.execute("""
-        SELECT t.id, f.embedding, a.mfcc, a.chroma, a.tempo
+    # stored per-coefficient means; the full arrays only for rows not
+    # backfilled yet (python -m ingest.summary) or a DB without the columns
+    columns = {row[1] for row in cur.execute("PRAGMA table_info(audio_features)")}
+    means = ", ".join(f"a.{c}" if c in columns else "NULL" for c in ("mfcc_mean", "chroma_mean"))
+    cur.execute(f"""
+        SELECT t.id, f.embedding, f.dim, {means}, a.tempo
         FROM tracks t
         JOIN fused_embeddings f ON t.id = f.track_id
         JOIN audio_features a ON t.id = a.track_id
     """)
     rows = cur.fetchall()
-    conn.close()
 
     db_data = []
     for row in rows:
         track_id = row[0]
-        fused_emb = np.frombuffer(row[1], dtype=np.float32)
-
-        mfcc_db = np.frombuffer(row[2], dtype=np.float32).reshape(20, -1).mean(axis=1)
-        chroma_db = np.frombuffer(row[3], dtype=np.float32).reshape(12, -1).mean(axis=1)
-        tempo_db = row[4]
+        fused_emb = decode_embedding(row[1], row[2])
+
+        if row[3] is not None and row[4] is not None:
+            mfcc_db = unpack_array(row[3])
+            chroma_db = unpack_array(row[4])
+        else:
+            mfcc_blob, chroma_blob = cur.execute(
+                "SELECT mfcc, chroma FROM audio_features WHERE track_id = ?", (track_id,)
+            ).fetchone()
+            mfcc_db = unpack_array(mfcc_blob, MFCC_ROWS, np.float32).mean(axis=1)
+            chroma_db = unpack_array(chroma_blob, CHROMA_ROWS, np.float32).mean(axis=1)
+        tempo_db = row[5]
 
         db_data.append({
             "track_id": track_id,
@@ -83,6 +99,7 @@ def load_db_features(db_path):
             "tempo": tempo_db
         })
 
+    conn.close()
     return db_data
 
 # -----------------------------
@@ -160,7 +177,7 @@ def compare_song_to_database(wav_path, db_path):
 # Example usage
 # -----------------------------
 if __name__ == "__main__":
-    db_path = "database/music.db"
+    db_path = DB_PATH
     test_song_path = "D:\Downloads\test1.mp3"
 
     results = compare_song_to_database(test_song_path, db_path)